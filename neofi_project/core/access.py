@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Exists, F, FilteredRelation, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import NotFound, PermissionDenied
+from .models import Event, EventPermission
+
+ALL_ROLES = ['OWNER', 'EDITOR', 'VIEWER']
+
+
+class RoleCache:
+    """
+    Process-wide LRU of user id -> {event id: role} with a TTL per entry.
+
+    Disabled unless EVENT_ROLE_CACHE_TTL is set. Entries are dropped by the
+    EventPermission signals in this process; the TTL bounds staleness caused
+    by writes made in other processes.
+    """
+
+    def __init__(self):
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'EVENT_ROLE_CACHE_TTL', 0)
+
+    @property
+    def max_users(self):
+        return getattr(settings, 'EVENT_ROLE_CACHE_MAX_USERS', 10000)
+
+    def get(self, user_id, event_id):
+        if not self.ttl:
+            return None
+        with self._lock:
+            roles = self._users.get(user_id)
+            if roles is None:
+                return None
+            self._users.move_to_end(user_id)
+            entry = roles.get(event_id)
+            if entry is None:
+                return None
+            role, expires_at = entry
+            if expires_at < time.monotonic():
+                del roles[event_id]
+                return None
+            return role
+
+    def set(self, user_id, event_id, role):
+        if not self.ttl or role is None:
+            return
+        with self._lock:
+            roles = self._users.setdefault(user_id, {})
+            self._users.move_to_end(user_id)
+            roles[event_id] = (role, time.monotonic() + self.ttl)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+role_cache = RoleCache()
+
+
+def events_with_role(user, roles=ALL_ROLES):
+    """
+    Events the user holds one of `roles` on, annotated with that role.
+
+    One LEFT JOIN on the (user, event) unique index attaches the role; events
+    created before owner rows existed default to OWNER.
+    """
+    queryset = Event.objects.annotate(
+        user_permission=FilteredRelation('permissions', condition=Q(permissions__user=user)),
+    ).filter(
+        Q(created_by=user) | Q(user_permission__isnull=False)
+    ).annotate(role=Coalesce(F('user_permission__role'), Value('OWNER')))
+    if set(roles) != set(ALL_ROLES):
+        queryset = queryset.filter(role__in=roles)
+    return queryset
+
+
+def calendar_peers(user, user_ids):
+    """
+    Ids among `user_ids` of the users whose free/busy times `user` may see:
+    everyone holding a role on at least one event that `user` holds a role on.
+    """
+    events = events_with_role(user).values('pk')
+    return User.objects.filter(pk__in=user_ids).filter(
+        Exists(EventPermission.objects.filter(user=OuterRef('pk'), event__in=events))
+        | Exists(Event.objects.filter(created_by=OuterRef('pk'), pk__in=events))
+    ).values_list('pk', flat=True)
+
+
+def with_user_role(queryset, user):
+    """Annotate events with the user's role (or None) as `user_role`."""
+    role = EventPermission.objects.filter(event=OuterRef('pk'), user_id=user.pk).values('role')[:1]
+    return queryset.annotate(user_role=Subquery(role))
+
+
+def resolve_event_access(request, event_id):
+    """
+    Return (event, role) for the requesting user, or (None, None) if the event
+    does not exist. The event and the user's role are read in one query and
+    memoized on the request.
+    """
+    memo = request.__dict__.setdefault('_event_access', {})
+    if event_id not in memo:
+        user = request.user
+        event = with_user_role(Event.objects.filter(pk=event_id), user).first()
+        if event is None:
+            memo[event_id] = (None, None)
+        else:
+            memo[event_id] = (event, event.user_role)
+            role_cache.set(user.pk, event.pk, event.user_role)
+    return memo[event_id]
+
+
+def memoized_event(request, event_id):
+    """The event already loaded for this request, if any, without querying."""
+    return request.__dict__.get('_event_access', {}).get(event_id, (None, None))[0]
+
+
+def get_event_with_role(request, event_id, roles, message):
+    event, role = resolve_event_access(request, event_id)
+    if event is None:
+        raise NotFound("Event not found.")
+    if role not in roles:
+        raise PermissionDenied(message)
+    return event
+
+
+def check_event_role(request, event_id, roles, message):
+    """
+    Like get_event_with_role, for callers that only need the role. Served
+    from the request memo or the process-wide cache when possible.
+    """
+    role = role_cache.get(request.user.pk, event_id)
+    if role is None:
+        return get_event_with_role(request, event_id, roles, message).user_role
+    if role not in roles:
+        raise PermissionDenied(message)
+    return role
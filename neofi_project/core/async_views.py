@@ -0,0 +1,133 @@
+"""
+Async (ASGI) variants of the hot read endpoints.
+
+They share query building and serializers with the DRF views in
+core.views but run on Django's async ORM. The ORM still executes each
+query in its one sync thread, one after another, so the queries of a
+request are awaited in turn; what the event loop gains is the freedom to
+serve other requests meanwhile. Served under /api/async/.
+"""
+import functools
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework.exceptions import APIException, MethodNotAllowed, NotAuthenticated, NotFound, PermissionDenied
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .access import ALL_ROLES, calendar_peers, role_cache, with_user_role
+from .models import Event, EventVersion
+from .pagination import VersionCursorPagination
+from .serializers import EventSerializer, EventVersionSerializer, ValuesRowSerializer
+from .utils import busy_intervals, busy_rows, compute_diff
+from .views import EventListCreateView, EventVersionList, FreeBusyView
+
+
+async def authenticate(request):
+    # JWT only, like the DRF views: a session cookie alone is not enough
+    result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    if result is None:
+        raise NotAuthenticated()
+    return result[0]
+
+
+async def alist(queryset):
+    return [row async for row in queryset]
+
+
+def async_api_view(func):
+    """Authenticate like the DRF views and render their error format."""
+
+    @functools.wraps(func)
+    async def view(request, *args, **kwargs):
+        try:
+            if request.method != 'GET':
+                raise MethodNotAllowed(request.method)
+            request.user = await authenticate(request)
+            payload = await func(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return JsonResponse(detail, status=exc.status_code, encoder=JSONEncoder, safe=False)
+        return JsonResponse(payload, encoder=JSONEncoder, safe=False)
+
+    return view
+
+
+async def check_event_role(user, event_id, roles, message):
+    role = role_cache.get(user.pk, event_id)
+    if role is None:
+        event = await with_user_role(Event.objects.filter(pk=event_id), user).afirst()
+        if event is None:
+            raise NotFound("Event not found.")
+        role = event.user_role
+        role_cache.set(user.pk, event_id, role)
+    if role not in roles:
+        raise PermissionDenied(message)
+    return role
+
+
+async def attach_snapshots(versions):
+    """Async counterpart of EventVersion.attach_snapshots."""
+    versions = [version for version in versions if 'snapshot' not in version.__dict__]
+    if not versions:
+        return
+    by_number = {version.version_number: version for version in versions}
+    chain = [version async for version in EventVersion.chain(versions[0].event_id, min(by_number), max(by_number))]
+    for version, snapshot in EventVersion.replay(chain):
+        if version.version_number in by_number:
+            by_number[version.version_number].snapshot = snapshot
+
+
+@async_api_view
+async def event_list(request):
+    # Reuse the sync view's filtering, projection and cursor handling
+    view = EventListCreateView(request=Request(request), kwargs={}, format_kwarg=None)
+    view.request.user = request.user
+    if view.is_occurrence_window():
+        # Topping up materialized occurrences writes, so take the sync path
+        return await sync_to_async(view.occurrence_page)()
+    paginator = view.paginator
+    rows, queryset = view.get_rows()
+    page = paginator.set_page([row async for row in paginator.page_queryset(queryset, view.request)])
+    return paginator.get_paginated_data(rows.render(page))
+
+
+@async_api_view
+async def event_detail(request, pk):
+    try:
+        event = await Event.objects.aget(pk=pk, created_by=request.user)
+    except Event.DoesNotExist:
+        raise NotFound("No Event matches the given query.")
+    return EventSerializer(event).data
+
+
+@async_api_view
+async def event_history(request, id):
+    await check_event_role(request.user, id, ALL_ROLES, "You do not have permission to view this event's versions.")
+    paginator = VersionCursorPagination()
+    page = paginator.page_queryset(
+        EventVersion.objects.filter(event_id=id).values(*EventVersionList.row_fields), Request(request),
+    )
+    rows = paginator.set_page(await alist(page))
+    chain = EventVersion.row_chain(id, rows)
+    EventVersion.attach_row_snapshots(rows, None if chain is None else await alist(chain))
+    return paginator.get_paginated_data(ValuesRowSerializer(EventVersionSerializer()).render(rows))
+
+
+@async_api_view
+async def event_diff(request, id, version_id1, version_id2):
+    await check_event_role(request.user, id, ALL_ROLES, "You do not have permission to view diffs for this event.")
+    versions = await EventVersion.objects.ain_bulk([version_id1, version_id2])
+    v1, v2 = versions.get(version_id1), versions.get(version_id2)
+    if v1 is None or v2 is None or v1.event_id != id or v2.event_id != id:
+        raise NotFound("Version not found.")
+    await attach_snapshots([v1, v2])
+    return compute_diff(v1.snapshot, v2.snapshot)
+
+
+@async_api_view
+async def free_busy(request):
+    window_start, window_end, user_ids, min_duration = FreeBusyView.parse_params(request.GET)
+    FreeBusyView.check_users(request.user, user_ids, await alist(calendar_peers(request.user, user_ids)))
+    rows = await alist(busy_rows(user_ids, window_start, window_end))
+    busy = busy_intervals(user_ids, window_start, window_end, rows=rows)
+    return FreeBusyView.build_payload(busy, window_start, window_end, min_duration)
@@ -0,0 +1,182 @@
+from contextlib import nullcontext
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone as django_timezone
+from rest_framework.exceptions import ValidationError
+from .access import events_with_role, role_cache
+from .models import Event, EventOccurrence, EventPermission, EventVersion
+from .rollups import RollupDelta, rollup_state
+from .search import index_events
+from .serializers import EventSerializer
+from .utils import RESTORED_FIELDS, candidate_recurrence, find_conflicts, restore_event_fields
+
+
+class BatchAborted(Exception):
+    """Raised inside the import transaction to roll back an all-or-nothing batch."""
+
+
+class EventBatchImporter:
+    """
+    Import events in fixed-size chunks.
+
+    Each chunk is validated, conflict-checked with a single range query and
+    written with three bulk inserts: the events, their OWNER permissions and
+    their initial versions. In the default all-or-nothing mode the whole
+    import runs in one transaction and the first failing chunk rolls it back;
+    with `partial=True` every chunk commits on its own, invalid or conflicting
+    items are skipped, and a result is recorded for every item. Very large
+    imports can pass `report_created=False` to only keep results for
+    failed items.
+    """
+
+    def __init__(self, user, partial=False, chunk_size=None, report_created=True):
+        self.user = user
+        self.partial = partial
+        self.report_created = report_created
+        self.chunk_size = chunk_size or getattr(settings, 'EVENT_BATCH_CHUNK_SIZE', 1000)
+        self.created = 0
+        self.errors = []
+        self.conflicts = []
+        self.results = []
+
+    def run(self, items):
+        items = iter(items)
+        try:
+            with nullcontext() if self.partial else transaction.atomic():
+                offset = 0
+                while True:
+                    chunk = list(islice(items, self.chunk_size))
+                    if not chunk:
+                        break
+                    if self.partial:
+                        with transaction.atomic():
+                            self.import_chunk(chunk, offset)
+                    else:
+                        self.import_chunk(chunk, offset)
+                        if self.errors or self.conflicts:
+                            raise BatchAborted
+                    offset += len(chunk)
+        except BatchAborted:
+            self.created = 0
+        if self.created:
+            role_cache.invalidate_user(self.user.pk)
+        self.results.sort(key=lambda result: result['index'])
+        return self
+
+    @property
+    def ok(self):
+        return not self.errors and not self.conflicts
+
+    def response(self):
+        """The (payload, status code) the batch endpoint answers with."""
+        if self.partial:
+            return {
+                'created': self.created,
+                'failed': sum(result['status'] != 'created' for result in self.results),
+                'results': self.results,
+            }, 200
+        if self.errors:
+            return {'detail': 'One or more events are invalid.', 'errors': self.errors}, 400
+        if self.conflicts:
+            return {'detail': 'One or more events conflict with existing ones.', 'conflicts': self.conflicts}, 400
+        return {'detail': 'Batch created successfully', 'created': self.created}, 201
+
+    def validate_chunk(self, chunk, offset):
+        serializer = EventSerializer()
+        valid = []
+        for position, item in enumerate(chunk):
+            try:
+                valid.append((offset + position, serializer.run_validation(item)))
+            except ValidationError as exc:
+                self.errors.append({'index': offset + position, 'errors': exc.detail})
+                self.results.append({'index': offset + position, 'status': 'invalid', 'errors': exc.detail})
+        return valid
+
+    def reject_conflicts(self, valid):
+        conflicts = find_conflicts(
+            self.user, [(data['start_time'], data['end_time'], candidate_recurrence(data)) for _, data in valid],
+        )
+        rejected = set()
+        for conflict in conflicts:
+            # Report with batch-wide indexes rather than positions in the chunk
+            index = valid[conflict['index']][0]
+            if 'event_id' in conflict:
+                self.conflicts.append({'index': index, 'event_id': conflict['event_id']})
+                rejected.add(conflict['index'])
+            else:
+                other_index = valid[conflict['other_index']][0]
+                self.conflicts.append({'index': index, 'other_index': other_index})
+                if conflict['index'] not in rejected:
+                    rejected.add(conflict['other_index'])
+        for position in sorted(rejected):
+            self.results.append({'index': valid[position][0], 'status': 'conflict'})
+        return [entry for position, entry in enumerate(valid) if position not in rejected]
+
+    def import_chunk(self, chunk, offset):
+        valid = self.validate_chunk(chunk, offset)
+        if valid:
+            valid = self.reject_conflicts(valid)
+        if not valid or (not self.partial and not self.ok):
+            return
+
+        # New events start at version 1, so no counter round trip is needed
+        events = Event.objects.bulk_create(
+            [Event(**data, created_by=self.user, version_counter=1) for _, data in valid],
+            batch_size=self.chunk_size,
+        )
+        EventPermission.objects.bulk_create(
+            [EventPermission(user=self.user, event=event, role='OWNER') for event in events],
+            batch_size=self.chunk_size,
+        )
+        EventVersion.objects.bulk_create(
+            [
+                EventVersion(event=event, version_number=1, data=EventVersion.snapshot_of(event, event.updated_at), is_keyframe=True)
+                for event in events
+            ],
+            batch_size=self.chunk_size,
+        )
+        index_events(events)
+        RollupDelta().add_events(events).apply()
+
+        self.created += len(events)
+        if self.report_created:
+            for (index, _), event in zip(valid, events):
+                self.results.append({'index': index, 'status': 'created', 'id': event.pk})
+
+
+def rollback_events(user, when, event_ids=None):
+    """
+    Restore every event the user may edit (or the given subset) to its state
+    as of `when`, in one transaction. Returns the response payload.
+    """
+    events = events_with_role(user, ['OWNER', 'EDITOR'])
+    if event_ids is not None:
+        events = events.filter(pk__in=event_ids)
+
+    with transaction.atomic():
+        events = list(events.select_for_update(of=('self',)))
+        states = EventVersion.as_of([event.pk for event in events], when)
+        now = django_timezone.now()
+        restored = []
+        rollups = RollupDelta()
+        for event in events:
+            if event.pk in states:
+                rollups.add(rollup_state(event), -1)
+                restore_event_fields(event, states[event.pk][1])
+                event.updated_at = now
+                event.occurrences_until = None
+                restored.append(event)
+
+        # bulk_update skips the save signals, so do their work here in bulk
+        Event.objects.bulk_update(restored, RESTORED_FIELDS + ['updated_at', 'occurrences_until'], batch_size=500)
+        EventOccurrence.objects.filter(event__in=restored).delete()
+        EventVersion.create_versions(restored)
+        index_events(restored)
+        rollups.add_events(restored).apply()
+
+    return {
+        "detail": f"{len(restored)} events rolled back to {when.isoformat()}",
+        "rolled_back": [{'event_id': event.pk, 'version_number': states[event.pk][0].version_number} for event in restored],
+        "skipped": [event.pk for event in events if event.pk not in states],
+    }
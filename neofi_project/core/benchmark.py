@@ -0,0 +1,213 @@
+"""
+Benchmark harness for the event API.
+
+Seeds synthetic users, events, shares and versions, then drives the real
+URL routes through the Django test client and reports latency percentiles,
+throughput and query counts per scenario. Run it with `manage.py benchmark`.
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from django.test import Client
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+from .batch import EventBatchImporter
+from .models import Event, EventPermission, EventVersion, User
+
+BENCHMARK_START = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def summarize(timings, queries, errors, elapsed):
+    timings = sorted(timings)
+    milliseconds = [value * 1000 for value in timings]
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'throughput_rps': round(len(timings) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(milliseconds) / len(milliseconds), 3) if milliseconds else None,
+            'p50': round(percentile(milliseconds, 0.50), 3) if milliseconds else None,
+            'p95': round(percentile(milliseconds, 0.95), 3) if milliseconds else None,
+            'p99': round(percentile(milliseconds, 0.99), 3) if milliseconds else None,
+            'max': round(milliseconds[-1], 3) if milliseconds else None,
+        },
+        'queries': {
+            'mean': round(sum(queries) / len(queries), 2) if queries else None,
+            'max': max(queries) if queries else None,
+        },
+    }
+
+
+class EventBenchmark:
+    """
+    Seed a dataset at the given scale and time each scenario against it.
+
+    Scenarios cycle through the seeded users and events, so write scenarios
+    (create, batch, share, rollback) change the dataset as they go; they run
+    after the read-only ones.
+    """
+    scenarios = ['list', 'history', 'diff', 'create', 'batch', 'share', 'rollback']
+
+    def __init__(self, users=10, events_per_user=50, share_fanout=3, versions_per_event=5,
+                 iterations=200, warmup=10, batch_size=50, seed=0):
+        self.user_count = users
+        self.events_per_user = events_per_user
+        self.share_fanout = min(share_fanout, users - 1)
+        self.versions_per_event = versions_per_event
+        self.iterations = iterations
+        self.warmup = warmup
+        self.batch_size = batch_size
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.next_slot = 0
+
+    @property
+    def scale(self):
+        return {
+            'users': self.user_count,
+            'events_per_user': self.events_per_user,
+            'share_fanout': self.share_fanout,
+            'versions_per_event': self.versions_per_event,
+            'batch_size': self.batch_size,
+        }
+
+    def slot(self):
+        # A fresh one-hour slot after every seeded event, so creates never conflict
+        start = BENCHMARK_START + timedelta(hours=self.next_slot)
+        self.next_slot += 1
+        return start.isoformat(), (start + timedelta(hours=1)).isoformat()
+
+    def seed_data(self):
+        self.users = User.objects.bulk_create(
+            [User(username=f'bench{index}', email=f'bench{index}@example.com') for index in range(self.user_count)]
+        )
+        for user in self.users:
+            items = []
+            for _ in range(self.events_per_user):
+                start_time, end_time = self.slot()
+                items.append({'title': 'Benchmark event', 'description': 'Seeded', 'start_time': start_time, 'end_time': end_time})
+            EventBatchImporter(user).run(items)
+
+        self.events = list(Event.objects.order_by('pk'))
+        for event in self.events:
+            # Updates go through save() so versions are recorded exactly as in production
+            for number in range(2, self.versions_per_event + 1):
+                event.title = f'Benchmark event v{number}'
+                event.description = self.random.choice(['Seeded', 'Moved', 'Renamed', 'Updated'])
+                event.save()
+
+        shares = []
+        for event in self.events:
+            others = [user for user in self.users if user.pk != event.created_by_id]
+            for user in self.random.sample(others, self.share_fanout):
+                shares.append(EventPermission(user=user, event=event, role=self.random.choice(['EDITOR', 'VIEWER'])))
+        EventPermission.objects.bulk_create(shares, ignore_conflicts=True)
+
+        self.versions = {}
+        for event_id, version_id in EventVersion.objects.order_by('event_id', 'version_number').values_list('event_id', 'id'):
+            self.versions.setdefault(event_id, []).append(version_id)
+
+        self.clients = {}
+        for user in self.users:
+            token = RefreshToken.for_user(user).access_token
+            self.clients[user.pk] = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def owner_client(self, iteration):
+        event = self.events[iteration % len(self.events)]
+        return event, self.clients[event.created_by_id]
+
+    def request_list(self, iteration):
+        user = self.users[iteration % len(self.users)]
+        return self.clients[user.pk].get(reverse('event-list-create'), {'scope': 'all'})
+
+    def request_history(self, iteration):
+        event, client = self.owner_client(iteration)
+        return client.get(reverse('event-version-list', args=[event.pk]))
+
+    def request_diff(self, iteration):
+        event, client = self.owner_client(iteration)
+        versions = self.versions[event.pk]
+        return client.get(reverse('event-diff', args=[event.pk, versions[0], versions[-1]]))
+
+    def request_create(self, iteration):
+        client = self.clients[self.users[iteration % len(self.users)].pk]
+        start_time, end_time = self.slot()
+        payload = {'title': 'Benchmark create', 'description': '', 'start_time': start_time, 'end_time': end_time}
+        return client.post(reverse('event-list-create'), payload, content_type='application/json')
+
+    def request_batch(self, iteration):
+        client = self.clients[self.users[iteration % len(self.users)].pk]
+        items = []
+        for _ in range(self.batch_size):
+            start_time, end_time = self.slot()
+            items.append({'title': 'Benchmark batch', 'description': '', 'start_time': start_time, 'end_time': end_time})
+        return client.post(reverse('event-batch-create'), items, content_type='application/json')
+
+    def request_share(self, iteration):
+        event, client = self.owner_client(iteration)
+        target = self.random.choice([user for user in self.users if user.pk != event.created_by_id])
+        payload = {'user_id': target.pk, 'role': self.random.choice(['EDITOR', 'VIEWER'])}
+        return client.post(reverse('share-event', args=[event.pk]), payload, content_type='application/json')
+
+    def request_rollback(self, iteration):
+        event, client = self.owner_client(iteration)
+        version_id = self.random.choice(self.versions[event.pk])
+        return client.post(reverse('event-rollback', args=[event.pk, version_id]))
+
+    def run_scenario(self, name):
+        request = getattr(self, f'request_{name}')
+        for iteration in range(self.warmup):
+            request(iteration)
+        timings, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for iteration in range(self.warmup, self.warmup + self.iterations):
+            request_started = time.perf_counter()
+            response = request(iteration)
+            timings.append(time.perf_counter() - request_started)
+            if response.status_code >= 400:
+                errors += 1
+            if 'X-Query-Count' in response:
+                queries.append(int(response['X-Query-Count']))
+        return summarize(timings, queries, errors, time.perf_counter() - started)
+
+    def run(self, scenarios=None):
+        seed_started = time.perf_counter()
+        self.seed_data()
+        report = {
+            'scale': self.scale,
+            'iterations': self.iterations,
+            'warmup': self.warmup,
+            'seed': self.seed,
+            'seed_seconds': round(time.perf_counter() - seed_started, 3),
+            'scenarios': {},
+        }
+        for name in scenarios or self.scenarios:
+            report['scenarios'][name] = self.run_scenario(name)
+        return report
+
+
+def compare_reports(baseline, current):
+    """Per-scenario relative change of p50/p95/p99 latency and mean queries."""
+    changes = {}
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        change = {}
+        for key in ('p50', 'p95', 'p99'):
+            old, new = before['latency_ms'].get(key), result['latency_ms'].get(key)
+            if old and new is not None:
+                change[key] = f'{(new - old) / old:+.1%}'
+        old, new = before['queries'].get('mean'), result['queries'].get('mean')
+        if old is not None and new is not None:
+            change['queries'] = round(new - old, 2)
+        changes[name] = change
+    return changes
@@ -0,0 +1,63 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from .renderers import render_json
+
+
+def get_cache():
+    return caches[getattr(settings, 'EVENT_CACHE_ALIAS', 'default')]
+
+
+def event_detail_key(event_id):
+    return f'event:{event_id}:detail'
+
+
+def event_history_key(event_id):
+    return f'event:{event_id}:history'
+
+
+def event_version_key(event_id, version_id):
+    return f'event:{event_id}:version:{version_id}'
+
+
+def make_etag(payload):
+    return '"%s"' % hashlib.md5(render_json(payload), usedforsecurity=False).hexdigest()
+
+
+def cached_payload(key, stamp, build, timeout=DEFAULT_TIMEOUT):
+    """
+    Read-through cache of a serialized payload and its ETag.
+
+    An entry is only served while its `stamp` (e.g. the event's updated_at)
+    still matches, so stale entries are skipped even if an invalidation was
+    missed. `build` serializes the payload on a miss.
+    """
+    cache = get_cache()
+    entry = cache.get(key)
+    if entry is not None and entry[0] == stamp:
+        return entry[1], entry[2]
+    payload = build()
+    etag = make_etag(payload)
+    cache.set(key, (stamp, etag, payload), timeout)
+    return etag, payload
+
+
+def conditional_response(request, etag, payload):
+    # Polling clients that already hold this representation get an empty 304
+    # Weak comparison: compression middleware hands out W/ copies of the tag
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return Response(payload, headers={'ETag': etag})
+
+
+def invalidate_event(event_id):
+    get_cache().delete_many([event_detail_key(event_id), event_history_key(event_id)])
+
+
+def invalidate_version(event_id, version_id):
+    get_cache().delete_many([event_version_key(event_id, version_id), event_history_key(event_id)])
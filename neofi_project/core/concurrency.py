@@ -0,0 +1,80 @@
+"""
+Optimistic concurrency for event writes.
+
+Event.version_counter is the version of the stored row: every save records
+an EventVersion and bumps it. Clients echo the version they edited, either
+as the detail endpoint's ETag ("v7") in If-Match or as the `version` field
+of the event body. Inside the write's transaction the row is then claimed
+with `UPDATE ... WHERE id = %s AND version_counter IN (...)`. That UPDATE
+waits for a concurrent writer and re-checks the version once it commits,
+so of two edits based on the same version exactly one wins. The other gets
+a 412 with what changed since the version it read. Nothing is locked while
+a client is editing.
+"""
+from django.conf import settings
+from django.db.models import F
+from django.utils.http import parse_etags
+from rest_framework.exceptions import ValidationError
+from .exceptions import PreconditionFailed, PreconditionRequired
+from .models import Event, EventVersion
+from .utils import compute_diff
+
+
+def version_etag(version):
+    return f'"v{version}"'
+
+
+def expected_versions(request):
+    """The versions the client says it edited, or None when it did not say."""
+    if_match = request.headers.get('If-Match')
+    if if_match:
+        if if_match.strip() == '*':
+            return None
+        versions = set()
+        for tag in parse_etags(if_match):
+            tag = tag.removeprefix('W/').strip('"')
+            if tag[:1] == 'v' and tag[1:].isdigit():
+                versions.add(int(tag[1:]))
+        # Tags from elsewhere match nothing, which is a failed precondition
+        return versions
+    version = request.data.get('version') if hasattr(request.data, 'get') else None
+    if version is not None:
+        try:
+            return {int(version)}
+        except (TypeError, ValueError):
+            raise ValidationError({'version': 'A valid integer is required.'})
+    if getattr(settings, 'EVENT_REQUIRE_IF_MATCH', False):
+        raise PreconditionRequired()
+    return None
+
+
+def claim_version(event, versions):
+    """
+    Lock the event row if it is still at one of `versions`, else raise 412.
+    Call inside the transaction that saves the event; None skips the check.
+    """
+    if versions is None:
+        return
+    if Event.objects.filter(pk=event.pk, version_counter__in=versions).update(version_counter=F('version_counter')):
+        return
+    raise version_conflict(event.pk, versions)
+
+
+def version_conflict(event_id, versions):
+    current = Event.objects.filter(pk=event_id).values_list('version_counter', flat=True).first() or 0
+    payload = {
+        'detail': 'The event has changed since it was read.',
+        'current_version': current,
+        'changes': None,
+    }
+    seen = max(versions, default=None)
+    if seen is not None and 0 < seen < current:
+        # One read rebuilds both the client's version and the current one
+        snapshots = {
+            version.version_number: snapshot
+            for version, snapshot in EventVersion.replay(EventVersion.chain(event_id, seen, current))
+        }
+        if seen in snapshots and current in snapshots:
+            payload['detail'] = f'The event has changed since version {seen}.'
+            payload['changes'] = compute_diff(snapshots[seen], snapshots[current])
+    return PreconditionFailed(payload)
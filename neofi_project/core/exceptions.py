@@ -0,0 +1,35 @@
+from django.db import IntegrityError
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from rest_framework.views import exception_handler as drf_exception_handler
+
+# Postgres exclusion constraint added in migration 0008
+EVENT_OVERLAP_CONSTRAINT = 'event_no_overlap'
+
+
+class PreconditionFailed(APIException):
+    """412 whose body is `payload` as given, diff values included."""
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The event has changed since it was read.'
+    default_code = 'precondition_failed'
+
+    def __init__(self, payload=None):
+        super().__init__()
+        if payload is not None:
+            # Set after __init__ so numbers and nulls are not coerced to strings
+            self.detail = payload
+
+
+class PreconditionRequired(APIException):
+    status_code = status.HTTP_428_PRECONDITION_REQUIRED
+    default_detail = "Send the event version being edited in an If-Match header or a 'version' field."
+    default_code = 'precondition_required'
+
+
+def exception_handler(exc, context):
+    # Overlaps that slip past the application-level check (concurrent writers,
+    # rollbacks) are rejected by the database; report them like the check does
+    if isinstance(exc, IntegrityError) and EVENT_OVERLAP_CONSTRAINT in str(exc):
+        return Response({'detail': 'Event conflicts with existing event.'}, status=status.HTTP_400_BAD_REQUEST)
+    return drf_exception_handler(exc, context)
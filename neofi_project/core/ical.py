@@ -0,0 +1,247 @@
+"""
+iCalendar (RFC 5545) export and import.
+
+Both directions stream. The exporter reads events with `.iterator()` and
+yields the calendar in chunks of roughly ICAL_CHUNK_BYTES. The parser reads
+its input one line at a time and yields one batch item per VEVENT, so it
+can feed EventBatchImporter directly, whatever the size of the file.
+
+Recurrence maps onto RRULE FREQ and INTERVAL only. On import, other RRULE
+parts (BYDAY, BYMONTH, ...) are dropped, as are EXDATEs and modified
+instances (VEVENTs with a RECURRENCE-ID), because an Event series cannot
+express them. An RRULE with COUNT or UNTIL is never widened into an
+endless series: like a FREQ/INTERVAL pair with no matching recurrence, it
+is passed through as is, so the importer reports it as an invalid item.
+So are instantaneous events (a DTSTART date-time with no end), since
+events must end after they start.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.utils import timezone as django_timezone
+
+ICAL_CHUNK_BYTES = 64 * 1024
+PRODID = '-//EventMgmtSys//Events//EN'
+
+RRULES = {
+    'DAILY': 'FREQ=DAILY',
+    'WEEKLY': 'FREQ=WEEKLY',
+    'BI-WEEKLY': 'FREQ=WEEKLY;INTERVAL=2',
+    'MONTHLY': 'FREQ=MONTHLY',
+    'BI-MONTHLY': 'FREQ=MONTHLY;INTERVAL=2',
+    'QUARTERLY': 'FREQ=MONTHLY;INTERVAL=3',
+    'SEMI-ANNUALLY': 'FREQ=MONTHLY;INTERVAL=6',
+    'ANNUALLY': 'FREQ=YEARLY',
+}
+
+EXPORT_FIELDS = ['id', 'title', 'description', 'location', 'start_time', 'end_time', 'is_recurring', 'recurrence', 'updated_at']
+
+DURATION_RE = re.compile(r'^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+
+def escape_text(value):
+    return value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def unescape_text(value):
+    return re.sub(r'\\([\\;,nN])', lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value)
+
+
+def fold(line):
+    """Split a content line into CRLF-terminated lines of at most 75 octets."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return encoded + b'\r\n'
+    parts, current, size, limit = [], [], 0, 75
+    for char in line:
+        width = len(char.encode())
+        if size + width > limit:
+            parts.append(''.join(current))
+            current, size, limit = [], 0, 74
+        current.append(char)
+        size += width
+    parts.append(''.join(current))
+    return '\r\n '.join(parts).encode() + b'\r\n'
+
+
+def format_datetime(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_lines(row):
+    yield 'BEGIN:VEVENT'
+    yield f"UID:event-{row['id']}@eventmgmtsys"
+    yield f"DTSTAMP:{format_datetime(row['updated_at'])}"
+    yield f"DTSTART:{format_datetime(row['start_time'])}"
+    yield f"DTEND:{format_datetime(row['end_time'])}"
+    yield f"SUMMARY:{escape_text(row['title'])}"
+    if row['description']:
+        yield f"DESCRIPTION:{escape_text(row['description'])}"
+    if row['location']:
+        yield f"LOCATION:{escape_text(row['location'])}"
+    if row['is_recurring'] and row['recurrence'] in RRULES:
+        yield f"RRULE:{RRULES[row['recurrence']]}"
+    yield 'END:VEVENT'
+
+
+def export_calendar(events, chunk_size=2000):
+    """Yield an .ics body for the events queryset in chunks of about ICAL_CHUNK_BYTES."""
+    buffer, size = [], 0
+    header = ['BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN']
+    for line in header:
+        buffer.append(fold(line))
+    for row in events.order_by('pk').values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        for line in event_lines(row):
+            encoded = fold(line)
+            buffer.append(encoded)
+            size += len(encoded)
+        if size >= ICAL_CHUNK_BYTES:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    buffer.append(fold('END:VCALENDAR'))
+    yield b''.join(buffer)
+
+
+def unfolded_lines(stream):
+    """Logical content lines from an iterable of raw (bytes or str) lines."""
+    current = None
+    for raw in stream:
+        line = raw.decode('utf-8', errors='replace') if isinstance(raw, bytes) else raw
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t'):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_line(line):
+    """Split a content line into (NAME, {PARAM: value}, value)."""
+    quoted, split = False, None
+    for position, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            split = position
+            break
+    if split is None:
+        return line.upper(), {}, ''
+    name, *params = re.split(r';(?=(?:[^"]*"[^"]*")*[^"]*$)', line[:split])
+    parsed = {}
+    for param in params:
+        key, _, value = param.partition('=')
+        parsed[key.upper()] = value.strip('"')
+    return name.upper(), parsed, line[split + 1:]
+
+
+def parse_datetime_value(value, params):
+    """(datetime, is_date) for a DTSTART/DTEND value; raises ValueError if malformed."""
+    value = value.strip()
+    default = django_timezone.get_default_timezone()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime.strptime(value, '%Y%m%d').replace(tzinfo=default), True
+    parsed = datetime.strptime(value.rstrip('Zz'), '%Y%m%dT%H%M%S')
+    if value[-1:] in 'Zz':
+        return parsed.replace(tzinfo=timezone.utc), False
+    zone = default
+    if 'TZID' in params:
+        try:
+            zone = ZoneInfo(params['TZID'])
+        except (ZoneInfoNotFoundError, ValueError):
+            # Custom VTIMEZONE ids are not resolved; treat them as local time
+            pass
+    return parsed.replace(tzinfo=zone), False
+
+
+def parse_duration(value):
+    match = DURATION_RE.match(value.strip())
+    if not match:
+        raise ValueError(value)
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(
+        weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0), minutes=int(minutes or 0), seconds=int(seconds or 0),
+    )
+    return -duration if sign == '-' else duration
+
+
+def rrule_key(value):
+    parts = dict(part.partition('=')[::2] for part in value.upper().split(';') if part)
+    return parts.get('FREQ'), int(parts.get('INTERVAL', 1))
+
+
+RECURRENCES = {rrule_key(rule): name for name, rule in RRULES.items()}
+
+
+def parse_rrule(value):
+    # Event series never end, so a bounded rule cannot be imported faithfully
+    if re.search(r'(^|;)\s*(COUNT|UNTIL)\s*=', value.upper()):
+        return value
+    try:
+        return RECURRENCES.get(rrule_key(value), value)
+    except ValueError:
+        return value
+
+
+def event_item(properties):
+    """Batch item for one VEVENT's properties; bad values are kept for the serializer to reject."""
+    item = {
+        'title': unescape_text(properties.get('SUMMARY', ({}, ''))[1]),
+        'description': unescape_text(properties.get('DESCRIPTION', ({}, ''))[1]),
+        'location': unescape_text(properties.get('LOCATION', ({}, ''))[1]),
+        'recurrence': 'NONE',
+        'is_recurring': False,
+    }
+    start, is_date = None, False
+    if 'DTSTART' in properties:
+        params, value = properties['DTSTART']
+        try:
+            start, is_date = parse_datetime_value(value, params)
+            item['start_time'] = start
+        except ValueError:
+            item['start_time'] = value
+    if 'DTEND' in properties:
+        params, value = properties['DTEND']
+        try:
+            item['end_time'] = parse_datetime_value(value, params)[0]
+        except ValueError:
+            item['end_time'] = value
+    elif start is not None:
+        try:
+            duration = parse_duration(properties['DURATION'][1]) if 'DURATION' in properties else None
+        except ValueError:
+            item['end_time'] = properties['DURATION'][1]
+        else:
+            # RFC 5545: a date lasts the whole day, a date-time without an end is instantaneous
+            item['end_time'] = start + (duration if duration is not None else timedelta(days=1) if is_date else timedelta(0))
+    if 'RRULE' in properties:
+        item['recurrence'] = parse_rrule(properties['RRULE'][1])
+        item['is_recurring'] = True
+    return item
+
+
+def parse_calendar(stream):
+    """Yield a batch item for every VEVENT in an iCalendar stream of raw lines."""
+    depth, properties = 0, None
+    for line in unfolded_lines(stream):
+        name, params, value = parse_line(line)
+        if name == 'BEGIN':
+            if value.upper() == 'VEVENT' and properties is None:
+                properties, depth = {}, 0
+            elif properties is not None:
+                # VALARM and other components nested in the event
+                depth += 1
+        elif name == 'END':
+            if properties is None:
+                continue
+            if depth:
+                depth -= 1
+            elif value.upper() == 'VEVENT':
+                if 'RECURRENCE-ID' not in properties:
+                    yield event_item(properties)
+                properties = None
+        elif properties is not None and not depth:
+            properties.setdefault(name, (params, value))
@@ -0,0 +1,173 @@
+"""
+Database-backed background jobs.
+
+Views enqueue a Job row and answer with its id straight away. Workers
+started with `manage.py run_jobs` claim due jobs with a conditional UPDATE,
+so any number of worker threads or processes can share the table without
+running a job twice, and hand each one to the handler registered for its
+kind. Failed attempts are retried with exponential backoff.
+
+Each claim carries a fresh claim token, and a side thread refreshes the
+job's heartbeat while it runs. Only jobs whose heartbeat has gone quiet
+for EVENT_JOB_TIMEOUT are handed to another worker, and a worker records
+the outcome only while it still holds the token, so a job taken over
+after all is never overwritten by its first worker.
+"""
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import F, Q
+from django.utils import timezone as django_timezone
+from django.utils.dateparse import parse_datetime
+from .batch import EventBatchImporter, rollback_events
+from .models import Job
+from .retention import RetentionPolicy, VersionCompactor
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Register `func(job) -> result` as the handler for jobs of `kind`."""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue_job(kind, user, payload, max_attempts=None):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}.")
+    return Job.objects.create(
+        kind=kind,
+        created_by=user,
+        payload=payload,
+        max_attempts=max_attempts or getattr(settings, 'EVENT_JOB_MAX_ATTEMPTS', 3),
+    )
+
+
+def retry_job(job):
+    """Give a failed job a fresh set of attempts."""
+    job.status = 'PENDING'
+    job.attempts = 0
+    job.error = ''
+    job.result = None
+    job.run_after = django_timezone.now()
+    job.started_at = job.finished_at = job.heartbeat_at = None
+    job.claim_token = None
+    job.save(update_fields=[
+        'status', 'attempts', 'error', 'result', 'run_after', 'started_at', 'finished_at', 'heartbeat_at', 'claim_token',
+    ])
+
+
+def claim_job(worker):
+    """Atomically take the oldest due pending job for `worker`, or return None."""
+    now = django_timezone.now()
+    candidates = Job.objects.filter(status='PENDING', run_after__lte=now).order_by('run_after', 'pk')
+    for pk in candidates.values_list('pk', flat=True)[:10]:
+        # Only one worker's UPDATE can still see the row as PENDING
+        claimed = Job.objects.filter(pk=pk, status='PENDING').update(
+            status='RUNNING', worker=worker, started_at=now, heartbeat_at=now, claim_token=uuid.uuid4(),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.select_related('created_by').get(pk=pk)
+    return None
+
+
+def requeue_stale_jobs():
+    """Release jobs whose worker died mid-run (no heartbeat for EVENT_JOB_TIMEOUT)."""
+    cutoff = django_timezone.now() - timedelta(seconds=getattr(settings, 'EVENT_JOB_TIMEOUT', 600))
+    stale = Job.objects.filter(status='RUNNING').filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    # Dropping the token keeps a worker that was only slow from recording its outcome
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='FAILED', error='Timed out.', finished_at=django_timezone.now(), claim_token=None,
+    )
+    return failed + stale.update(status='PENDING', worker='', claim_token=None)
+
+
+@contextmanager
+def heartbeat(job, interval=None):
+    """Refresh the job's heartbeat_at from a side thread for as long as the block runs."""
+    interval = interval or getattr(settings, 'EVENT_JOB_TIMEOUT', 600) / 3
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                try:
+                    Job.objects.filter(pk=job.pk, claim_token=job.claim_token).update(heartbeat_at=django_timezone.now())
+                except DatabaseError:
+                    # e.g. SQLite busy behind the job's own write; the next beat retries
+                    logger.warning('Heartbeat of job %s failed', job.pk, exc_info=True)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job):
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler for job kind {job.kind!r}.")
+        with heartbeat(job):
+            result = handler(job)
+    except Exception as exc:
+        # The traceback goes to the log only; the API shows the message
+        logger.exception('Job %s (%s) failed on attempt %d', job.pk, job.kind, job.attempts)
+        job.error = f'{type(exc).__name__}: {exc}'
+        if job.attempts < job.max_attempts:
+            delay = getattr(settings, 'EVENT_JOB_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+            job.status = 'PENDING'
+            job.run_after = django_timezone.now() + timedelta(seconds=delay)
+        else:
+            job.status = 'FAILED'
+            job.finished_at = django_timezone.now()
+    else:
+        job.status = 'SUCCEEDED'
+        job.result = result
+        job.error = ''
+        job.finished_at = django_timezone.now()
+    recorded = Job.objects.filter(pk=job.pk, status='RUNNING', claim_token=job.claim_token).update(
+        status=job.status, result=job.result, error=job.error, run_after=job.run_after, finished_at=job.finished_at,
+    )
+    if not recorded:
+        logger.warning('Job %s was requeued while %s ran it; its outcome is discarded', job.pk, job.worker)
+        job.refresh_from_db()
+    return job
+
+
+@job_handler('batch_import')
+def import_batch(job):
+    importer = EventBatchImporter(job.created_by, partial=job.payload.get('partial', False)).run(job.payload['items'])
+    body, status_code = importer.response()
+    return {'status_code': status_code, 'body': body}
+
+
+@job_handler('bulk_rollback')
+def bulk_rollback(job):
+    body = rollback_events(job.created_by, parse_datetime(job.payload['as_of']), job.payload.get('event_ids'))
+    return {'status_code': 200, 'body': body}
+
+
+@job_handler('compact_versions')
+def compact_versions(job):
+    # Safe to retry: every event is compacted in its own transaction
+    policy = RetentionPolicy(**{key: job.payload[key] for key in ('keep_last', 'daily_after', 'weekly_after') if key in job.payload})
+    compactor = VersionCompactor(policy, chunk_size=job.payload.get('chunk_size', 1000)).run(job.payload.get('event_ids'))
+    body = {'events': compactor.events, 'deleted': compactor.deleted, 'rewritten': compactor.rewritten}
+    return {'status_code': 200, 'body': body}
@@ -0,0 +1,78 @@
+import json
+import platform
+import subprocess
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from core.benchmark import EventBenchmark, compare_reports
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway test database and benchmark the event API endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--events-per-user', type=int, default=50)
+        parser.add_argument('--share-fanout', type=int, default=3)
+        parser.add_argument('--versions-per-event', type=int, default=5)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--scenario', action='append', choices=EventBenchmark.scenarios,
+                            help='Scenario to run; repeat for several (default: all)')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--compare', help='Baseline JSON report to compare against')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError('--users must be at least 2.')
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as handle:
+                baseline = json.load(handle)
+
+        benchmark = EventBenchmark(
+            users=options['users'],
+            events_per_user=options['events_per_user'],
+            share_fanout=options['share_fanout'],
+            versions_per_event=options['versions_per_event'],
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+        )
+
+        # Never touch the configured database: seed a fresh test database
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = benchmark.run(options['scenario'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report['environment'] = {
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        }
+        if baseline is not None:
+            report['comparison'] = compare_reports(baseline, report)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}."))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.jobs import enqueue_job
+from core.retention import RetentionPolicy, VersionCompactor
+
+
+class Command(BaseCommand):
+    help = 'Thin out old event versions: keep the last N, then daily and weekly checkpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-last', type=int, default=20, help='Newest versions of each event always kept')
+        parser.add_argument('--daily-after', type=int, default=30, help='Days after which only the last version of each day is kept')
+        parser.add_argument('--weekly-after', type=int, default=180, help='Days after which only the last version of each week is kept')
+        parser.add_argument('--event', type=int, action='append', dest='event_ids', help='Only compact this event; repeat for several')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+        parser.add_argument('--queue', metavar='USERNAME', help='Queue the compaction as a job owned by USERNAME for run_jobs')
+
+    def handle(self, *args, **options):
+        if options['keep_last'] < 1:
+            raise CommandError('--keep-last must be at least 1.')
+        if options['weekly_after'] < options['daily_after']:
+            raise CommandError('--weekly-after must not be shorter than --daily-after.')
+
+        if options['queue']:
+            if options['dry_run']:
+                raise CommandError('--dry-run cannot be queued.')
+            try:
+                user = User.objects.get(username=options['queue'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['queue']!r} does not exist.")
+            payload = {key: options[key] for key in ('keep_last', 'daily_after', 'weekly_after', 'event_ids', 'chunk_size')}
+            job = enqueue_job('compact_versions', user, payload)
+            self.stdout.write(self.style.SUCCESS(f'Queued compaction as job {job.pk}.'))
+            return
+
+        policy = RetentionPolicy(
+            keep_last=options['keep_last'], daily_after=options['daily_after'], weekly_after=options['weekly_after'],
+        )
+        compactor = VersionCompactor(policy, chunk_size=options['chunk_size'], dry_run=options['dry_run']).run(options['event_ids'])
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {compactor.deleted} versions and rewrite {compactor.rewritten} across {compactor.events} events.'
+            if options['dry_run'] else
+            f'{verb} {compactor.deleted} versions and rewrote {compactor.rewritten} across {compactor.events} events.'
+        ))
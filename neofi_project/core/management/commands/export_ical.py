@@ -0,0 +1,38 @@
+import sys
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.access import events_with_role
+from core.ical import export_calendar
+from core.models import Event
+
+
+class Command(BaseCommand):
+    help = "Stream a user's events to an iCalendar (.ics) file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+        parser.add_argument('--all', action='store_true', help='Include events shared with the user')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        events = events_with_role(user) if options['all'] else Event.objects.filter(created_by=user)
+
+        if options['output']:
+            with open(options['output'], 'wb') as handle:
+                size = self.write(handle, events, options['chunk_size'])
+            self.stderr.write(self.style.SUCCESS(f"Wrote {size} bytes to {options['output']}."))
+        else:
+            self.write(sys.stdout.buffer, events, options['chunk_size'])
+
+    def write(self, handle, events, chunk_size):
+        size = 0
+        for chunk in export_calendar(events, chunk_size=chunk_size):
+            handle.write(chunk)
+            size += len(chunk)
+        handle.flush()
+        return size
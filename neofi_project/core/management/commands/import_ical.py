@@ -0,0 +1,45 @@
+import sys
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.batch import EventBatchImporter
+from core.ical import parse_calendar
+
+
+class Command(BaseCommand):
+    help = 'Import an iCalendar (.ics) file for a user through the chunked batch importer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path', help="The .ics file, or '-' for stdin")
+        parser.add_argument('--partial', action='store_true', help='Commit chunk by chunk and skip bad events instead of aborting')
+        parser.add_argument('--chunk-size', type=int, help='Events per bulk insert (default: EVENT_BATCH_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+
+        # Results are only kept for failed events, so memory stays flat on huge files
+        importer = EventBatchImporter(user, partial=options['partial'], chunk_size=options['chunk_size'], report_created=False)
+        if options['path'] == '-':
+            importer.run(parse_calendar(sys.stdin.buffer))
+        else:
+            try:
+                with open(options['path'], 'rb') as handle:
+                    importer.run(parse_calendar(handle))
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        for error in importer.errors[:20]:
+            self.stderr.write(f"Event {error['index']}: {error['errors']}")
+        for conflict in importer.conflicts[:20]:
+            other = f"event {conflict['event_id']}" if 'event_id' in conflict else f"event {conflict['other_index']} in the file"
+            self.stderr.write(f"Event {conflict['index']}: conflicts with {other}")
+        if len(importer.errors) > 20 or len(importer.conflicts) > 20:
+            self.stderr.write(f'... {len(importer.errors)} invalid and {len(importer.conflicts)} conflicting events in total.')
+
+        if importer.partial or importer.ok:
+            self.stdout.write(self.style.SUCCESS(f'Imported {importer.created} events, skipped {len(importer.results)}.'))
+        else:
+            raise CommandError('Nothing imported: fix the events above or rerun with --partial.')
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete sync tombstones older than EVENT_SYNC_TOMBSTONE_DAYS; run it daily'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Tombstones deleted per statement')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        deleted = prune_tombstones(chunk_size=options['chunk_size'])
+        days = getattr(settings, 'EVENT_SYNC_TOMBSTONE_DAYS', 30)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones older than {days} days.'))
@@ -0,0 +1,29 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-user event totals and daily occupancy from the events table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', help='Only rebuild this user; repeat for several')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Users rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+            missing = set(options['usernames']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"No users named {', '.join(sorted(missing))}.")
+
+        rebuilt, last = 0, 0
+        while True:
+            user_ids = list(users.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:options['chunk_size']])
+            if not user_ids:
+                break
+            rebuild_rollups(user_ids)
+            rebuilt += len(user_ids)
+            last = user_ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups for {rebuilt} users.'))
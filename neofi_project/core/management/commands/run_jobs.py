@@ -0,0 +1,55 @@
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.jobs import claim_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs. Start several processes to scale out; claims never overlap.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Worker threads in this process')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no due jobs are left')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.processed = 0
+        self.lock = threading.Lock()
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        concurrency = max(1, options['concurrency'])
+
+        self.stdout.write(f'Job worker {prefix} started with {concurrency} thread(s).')
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [
+                pool.submit(self.work, f'{prefix}:{index}', options['poll_interval'], options['once'])
+                for index in range(concurrency)
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except KeyboardInterrupt:
+                # Let running jobs finish; nothing new is claimed
+                self.stop.set()
+        self.stdout.write(self.style.SUCCESS(f'Job worker {prefix} stopped after {self.processed} job(s).'))
+
+    def work(self, worker, poll_interval, once):
+        while not self.stop.is_set():
+            close_old_connections()
+            try:
+                requeue_stale_jobs()
+                job = claim_job(worker)
+                if job is None:
+                    if once:
+                        return
+                    self.stop.wait(poll_interval)
+                    continue
+                job = run_job(job)
+                with self.lock:
+                    self.processed += 1
+                self.stdout.write(f'{worker} {job.kind} #{job.pk}: {job.status}')
+            finally:
+                close_old_connections()
@@ -0,0 +1,109 @@
+import threading
+import time
+from django.conf import settings
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that counts queries and the time spent in them.
+
+    Install with `connection.execute_wrapper(recorder)`.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class RequestMetrics:
+    """Process-wide per-view totals, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, method, status, queries, db_time, total_time):
+        with self._lock:
+            entry = self._views.setdefault((view, method), {
+                'requests': 0, 'errors': 0, 'queries': 0, 'db_seconds': 0.0,
+                'seconds': 0.0, 'buckets': [0] * len(DURATION_BUCKETS),
+            })
+            entry['requests'] += 1
+            entry['errors'] += status >= 500
+            entry['queries'] += queries
+            entry['db_seconds'] += db_time
+            entry['seconds'] += total_time
+            for position, bound in enumerate(DURATION_BUCKETS):
+                if total_time <= bound:
+                    entry['buckets'][position] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: dict(entry, buckets=list(entry['buckets'])) for key, entry in self._views.items()}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        views = sorted(self.snapshot().items())
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def labels(view, method, **extra):
+            pairs = {'view': view, 'method': method, **extra}
+            return ','.join(f'{key}="{value}"' for key, value in pairs.items())
+
+        family('event_http_requests_total', 'counter', 'Requests handled, by view.')
+        for (view, method), entry in views:
+            lines.append(f'event_http_requests_total{{{labels(view, method)}}} {entry["requests"]}')
+        family('event_http_errors_total', 'counter', 'Requests answered with a 5xx status.')
+        for (view, method), entry in views:
+            lines.append(f'event_http_errors_total{{{labels(view, method)}}} {entry["errors"]}')
+        family('event_db_queries_total', 'counter', 'SQL queries executed while handling requests.')
+        for (view, method), entry in views:
+            lines.append(f'event_db_queries_total{{{labels(view, method)}}} {entry["queries"]}')
+        family('event_db_seconds_total', 'counter', 'Time spent executing SQL while handling requests.')
+        for (view, method), entry in views:
+            lines.append(f'event_db_seconds_total{{{labels(view, method)}}} {entry["db_seconds"]:.6f}')
+        family('event_http_request_duration_seconds', 'histogram', 'Request duration.')
+        for (view, method), entry in views:
+            for bound, count in zip(DURATION_BUCKETS, entry['buckets']):
+                lines.append(f'event_http_request_duration_seconds_bucket{{{labels(view, method, le=bound)}}} {count}')
+            lines.append(f'event_http_request_duration_seconds_bucket{{{labels(view, method, le="+Inf")}}} {entry["requests"]}')
+            lines.append(f'event_http_request_duration_seconds_sum{{{labels(view, method)}}} {entry["seconds"]:.6f}')
+            lines.append(f'event_http_request_duration_seconds_count{{{labels(view, method)}}} {entry["requests"]}')
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+def query_budget(view_name, method='GET', variant=None):
+    """
+    The declared maximum number of queries for a URL name, or None. A
+    'METHOD url-name' entry takes precedence over a plain 'url-name' one.
+    Views that answer in several modes set `budget_variant` on the response;
+    a 'url-name:variant' entry then takes precedence over both.
+    """
+    budgets = getattr(settings, 'EVENT_QUERY_BUDGETS', {})
+    names = [f'{view_name}:{variant}', view_name] if variant else [view_name]
+    for name in names:
+        for key in (f'{method} {name}', name):
+            if key in budgets:
+                return budgets[key]
+    return None
@@ -0,0 +1,91 @@
+import logging
+import re
+import time
+from django.conf import settings
+from django.db import connection
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from .metrics import QueryRecorder, query_budget, request_metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+class QueryMetricsMiddleware:
+    """
+    Record query count, database time and total time for every request.
+
+    The numbers are returned as X-Query-Count, X-DB-Time-ms and
+    X-Response-Time-ms headers, aggregated per URL name for the metrics
+    endpoint, and checked against EVENT_QUERY_BUDGETS. A request over its
+    budget is logged and marked with X-Query-Budget-Exceeded. Queries run
+    while a streaming response is consumed are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        total_time = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+        request_metrics.observe(view, request.method, response.status_code, recorder.count, recorder.duration, total_time)
+
+        response['X-Query-Count'] = str(recorder.count)
+        response['X-DB-Time-ms'] = f'{recorder.duration * 1000:.2f}'
+        response['X-Response-Time-ms'] = f'{total_time * 1000:.2f}'
+        budget = query_budget(view, request.method, getattr(response, 'budget_variant', None))
+        if budget is not None:
+            response['X-Query-Budget'] = str(budget)
+            if recorder.count > budget:
+                response['X-Query-Budget-Exceeded'] = '1'
+                logger.warning('%s %s ran %d queries, budget is %d', request.method, view, recorder.count, budget)
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that prefers Brotli for clients accepting `br`.
+
+    Brotli is used for complete responses when the brotli package is
+    installed; streamed responses and everything else fall back to gzip.
+    Views named in EVENT_UNCOMPRESSED_VIEWS are never compressed: the auth
+    endpoints return tokens next to request-controlled data, which is what
+    BREACH needs to recover a secret from compressed sizes.
+    """
+    accepts_brotli = re.compile(r'\bbr\b')
+    brotli_quality = 5
+
+    def process_response(self, request, response):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.view_name in getattr(settings, 'EVENT_UNCOMPRESSED_VIEWS', ()):
+            return response
+        if (
+            brotli is None
+            or response.streaming
+            or len(response.content) < 200
+            or response.has_header('Content-Encoding')
+            or not self.accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_eventversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['created_by', 'start_time', 'end_time'], name='event_owner_window_idx'),
+        ),
+    ]
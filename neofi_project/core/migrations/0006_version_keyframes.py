@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:54
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def seed_version_counters(apps, schema_editor):
+    Event = apps.get_model('core', 'Event')
+    EventVersion = apps.get_model('core', 'EventVersion')
+    latest = EventVersion.objects.filter(event=OuterRef('pk')).values('event').annotate(
+        latest=Max('version_number'),
+    ).values('latest')
+    Event.objects.update(version_counter=Coalesce(Subquery(latest), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_eventoccurrence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='version_counter',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        # Versions written so far are full snapshots
+        migrations.AddField(
+            model_name='eventversion',
+            name='is_keyframe',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='eventversion',
+            name='is_keyframe',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='eventversion',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(seed_version_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+# Postgres only: reject overlapping events of the same owner in the database.
+# btree_gist provides the equality operator class for created_by_id. The check
+# is deferred to commit so bulk rollbacks may shuffle events within a transaction.
+CREATE_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS btree_gist',
+    """
+    ALTER TABLE core_event ADD CONSTRAINT event_no_overlap EXCLUDE USING gist (
+        created_by_id WITH =,
+        tstzrange(start_time, end_time, '[)') WITH &&
+    ) DEFERRABLE INITIALLY DEFERRED
+    """,
+]
+DROP_SQL = ['ALTER TABLE core_event DROP CONSTRAINT IF EXISTS event_no_overlap']
+
+# Rows the constraint would refuse: reversed intervals (tstzrange raises on
+# them) and overlapping pairs of one owner. Empty intervals overlap nothing.
+INVALID_SQL = "SELECT id, created_by_id, start_time, end_time FROM core_event WHERE end_time < start_time LIMIT 20"
+OVERLAPS_SQL = """
+    SELECT a.created_by_id, a.id, b.id FROM core_event a
+    JOIN core_event b ON b.created_by_id = a.created_by_id AND b.id > a.id
+        AND b.start_time < a.end_time AND a.start_time < b.end_time
+    WHERE a.start_time < a.end_time AND b.start_time < b.end_time
+    ORDER BY a.created_by_id, a.id, b.id LIMIT 20
+"""
+
+
+def check_existing_rows(schema_editor):
+    """Refuse to migrate, naming the offending events, instead of failing mid-ALTER."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(INVALID_SQL)
+        invalid = cursor.fetchall()
+        cursor.execute(OVERLAPS_SQL)
+        overlaps = cursor.fetchall()
+    if not invalid and not overlaps:
+        return
+    lines = [f'event {pk} of user {user_id} ends before it starts ({start} - {end})' for pk, user_id, start, end in invalid]
+    lines += [f'events {first} and {second} of user {user_id} overlap' for user_id, first, second in overlaps]
+    raise RuntimeError(
+        'Cannot add the event_no_overlap constraint. Fix or delete these events (up to 20 of each kind '
+        'are listed) and run migrate again:\n  ' + '\n  '.join(lines)
+    )
+
+
+def run_on_postgres(statements, check=None):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        if check is not None:
+            check(schema_editor)
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_sync_feed'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgres(CREATE_SQL, check_existing_rows), run_on_postgres(DROP_SQL)),
+    ]
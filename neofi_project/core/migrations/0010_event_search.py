@@ -0,0 +1,58 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# Full-text search over title, description and location (see core/search.py).
+# SQLite gets an FTS5 table whose rowid is the event id, filled from the
+# existing events; PostgreSQL gets a GIN index on the weighted tsvector that
+# search queries compute. Other backends, and SQLite builds without FTS5,
+# fall back to unindexed search.
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE core_event_search USING fts5(
+        title, description, location, tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO core_event_search (rowid, title, description, location)
+    SELECT id, title, description, location FROM core_event
+    """,
+]
+SQLITE_DROP = ['DROP TABLE IF EXISTS core_event_search']
+
+POSTGRES_CREATE = [
+    """
+    CREATE INDEX IF NOT EXISTS event_search_idx ON core_event USING gin ((
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(location, '')), 'C')
+    ))
+    """,
+]
+POSTGRES_DROP = ['DROP INDEX IF EXISTS event_search_idx']
+
+
+def run_by_vendor(sqlite, postgres):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        if vendor == 'postgresql':
+            for statement in postgres:
+                schema_editor.execute(statement)
+        elif vendor == 'sqlite':
+            try:
+                for statement in sqlite:
+                    schema_editor.execute(statement)
+            except OperationalError:
+                # No FTS5 in this SQLite build
+                pass
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_by_vendor(SQLITE_CREATE, POSTGRES_CREATE), run_by_vendor(SQLITE_DROP, POSTGRES_DROP)),
+    ]
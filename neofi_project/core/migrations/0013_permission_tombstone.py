@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_tombstone_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PermissionTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='permission_tombstones', to='core.event')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['event', 'created_at'], name='perm_tombstone_event_idx'), models.Index(fields=['created_at'], name='perm_tombstone_created_idx')],
+            },
+        ),
+    ]
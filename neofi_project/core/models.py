@@ -1,6 +1,11 @@
-from datetime import datetime, timezone
-from django.db import models
+from itertools import groupby
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, Max, Subquery, Value, When, Window
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.utils import timezone as django_timezone
+from django.utils.functional import cached_property
 
 User = get_user_model()
 class Event(models.Model):
@@ -27,11 +32,49 @@ class Event(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='events')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # How far ahead EventOccurrence rows have been built; None means not built
+    occurrences_until = models.DateTimeField(null=True, blank=True, editable=False)
+    # Last allocated EventVersion.version_number
+    version_counter = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Covers the per-user overlap window used by conflict detection
+            models.Index(fields=['created_by', 'start_time', 'end_time'], name='event_owner_window_idx'),
+            # Change feed for incremental sync
+            models.Index(fields=['created_by', 'updated_at'], name='event_owner_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.start_time} - {self.created_by.username}"
+
+    def save(self, *args, **kwargs):
+        # version_counter is only written by the atomic bump in
+        # EventVersion.create_version; a stale instance must never write it back
+        if not self._state.adding and not kwargs.get('force_insert'):
+            fields = kwargs.get('update_fields')
+            if fields is None:
+                fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs['update_fields'] = [name for name in fields if name != 'version_counter']
+        super().save(*args, **kwargs)
     
 
+class EventOccurrence(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='occurrences')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='event_occurrences')
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+
+    class Meta:
+        ordering = ['start_time']
+        indexes = [
+            models.Index(fields=['created_by', 'start_time', 'end_time'], name='occurrence_owner_window_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event.title} - {self.start_time}"
+
+
 class EventPermission(models.Model):
     ROLE_CHOICES = [
         ('OWNER', 'Owner'),
@@ -42,6 +85,7 @@ class EventPermission(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='event_permissions')
     event = models.ForeignKey('Event', on_delete=models.CASCADE, related_name='permissions')
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = ('user', 'event')
@@ -50,11 +94,61 @@ class EventPermission(models.Model):
         return f"{self.user.username} - {self.event.title} - {self.role}"
 
 
+class SyncTombstone(models.Model):
+    """Tells a user's sync clients to drop an event they can no longer see."""
+    REASON_CHOICES = [
+        ('DELETED', 'Deleted'),
+        ('REVOKED', 'Revoked'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_tombstones')
+    # Plain id: the event row is gone or no longer visible
+    event_id = models.BigIntegerField()
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='tombstone_user_created_idx'),
+            # For pruning expired tombstones of all users
+            models.Index(fields=['created_at'], name='tombstone_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.event_id} - {self.reason}"
+
+
+class PermissionTombstone(models.Model):
+    """Tells the sync clients of everyone who sees an event that a user lost their role on it."""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='permission_tombstones')
+    # Plain id: only the pair is reported, and it outlives the permission row
+    user_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', 'created_at'], name='perm_tombstone_event_idx'),
+            models.Index(fields=['created_at'], name='perm_tombstone_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} - {self.user_id}"
+
+
 class EventVersion(models.Model):
+    """
+    One saved state of an Event.
+
+    Every K-th version (EVENT_VERSION_KEYFRAME_INTERVAL) is a keyframe holding
+    the full snapshot in `data`; the versions in between only hold the fields
+    that changed since the previous version. Rebuilding any version therefore
+    replays at most K rows, all read in a single query.
+    """
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='versions')
     version_number = models.PositiveIntegerField()
     data = models.JSONField()
-    created_at = models.DateTimeField(default=datetime.now())
+    is_keyframe = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=django_timezone.now)
 
     class Meta:
         unique_together = ('event', 'version_number')
@@ -63,12 +157,13 @@ class EventVersion(models.Model):
     def __str__(self):
         return f"Version {self.version_number} of Event {self.event.title}"
 
-    @classmethod
-    def create_version(cls, event_instance, updated_at):
-        last_version = cls.objects.filter(event=event_instance).order_by('-version_number').first()
-        new_version_number = 1 if not last_version else last_version.version_number + 1
+    @staticmethod
+    def keyframe_interval():
+        return max(1, getattr(settings, 'EVENT_VERSION_KEYFRAME_INTERVAL', 20))
 
-        snapshot = {
+    @staticmethod
+    def snapshot_of(event_instance, updated_at):
+        return {
             'title': event_instance.title,
             'description': event_instance.description,
             'start_time': event_instance.start_time.isoformat(),
@@ -78,12 +173,218 @@ class EventVersion(models.Model):
             'recurrence': event_instance.recurrence,
             'created_by_id': event_instance.created_by_id,
             'created_at': event_instance.created_at.isoformat(),
-            'updated_at': updated_at.isoformat() if updated_at else datetime.now().isoformat(),
+            'updated_at': updated_at.isoformat() if updated_at else django_timezone.now().isoformat(),
         }
 
-        return cls.objects.create(
-            event=event_instance,
-            version_number=new_version_number,
-            data=snapshot,
-            created_at=datetime.now()
-        )
\ No newline at end of file
+    @classmethod
+    def chain(cls, event_id, first_number, last_number):
+        """Versions first..last of an event, preceded by the keyframe they build on."""
+        keyframe = cls.objects.filter(
+            event_id=event_id, is_keyframe=True, version_number__lte=first_number,
+        ).order_by('-version_number').values('version_number')[:1]
+        return cls.objects.filter(
+            event_id=event_id,
+            version_number__gte=Coalesce(Subquery(keyframe), Value(1)),
+            version_number__lte=last_number,
+        ).order_by('version_number')
+
+    @staticmethod
+    def replay(versions):
+        """Yield (version, full snapshot) for versions in ascending order."""
+        snapshot = {}
+        for version in versions:
+            if version.is_keyframe:
+                snapshot = dict(version.data)
+            else:
+                snapshot = {**snapshot, **version.data}
+            yield version, snapshot
+
+    @classmethod
+    def attach_snapshots(cls, versions):
+        """Fill in `snapshot` for versions of one event with a single query."""
+        versions = [version for version in versions if 'snapshot' not in version.__dict__]
+        if not versions:
+            return
+        by_number = {version.version_number: version for version in versions}
+        chain = cls.chain(versions[0].event_id, min(by_number), max(by_number))
+        for version, snapshot in cls.replay(chain):
+            if version.version_number in by_number:
+                by_number[version.version_number].snapshot = snapshot
+
+    @classmethod
+    def row_chain(cls, event_id, rows):
+        """
+        The `.values()` chain that `rows` (newest first, with `data` and
+        `is_keyframe`) replay from, or None when they start at a keyframe.
+        """
+        if not rows or rows[-1]['is_keyframe']:
+            return None
+        return cls.chain(event_id, rows[-1]['version_number'], rows[0]['version_number']).values(
+            'version_number', 'data', 'is_keyframe',
+        )
+
+    @staticmethod
+    def attach_row_snapshots(rows, chain=None):
+        """Set row['snapshot'] on `.values()` rows, replaying `chain` if given."""
+        by_number = {row['version_number']: row for row in rows}
+        snapshot = {}
+        for version in reversed(rows) if chain is None else chain:
+            snapshot = dict(version['data']) if version['is_keyframe'] else {**snapshot, **version['data']}
+            if version['version_number'] in by_number:
+                by_number[version['version_number']]['snapshot'] = snapshot
+
+    @classmethod
+    def as_of(cls, event_ids, when):
+        """
+        Map event id -> (version, snapshot) for the latest version of each event
+        saved at or before `when`. Events with no version by then are left out.
+
+        A single windowed query returns, per event, the target version together
+        with the keyframe and deltas it is rebuilt from.
+        """
+        partition = {'partition_by': [F('event_id')]}
+        rows = cls.objects.filter(event_id__in=event_ids, created_at__lte=when).annotate(
+            latest_keyframe=Window(Max(Case(When(is_keyframe=True, then=F('version_number')))), **partition),
+        ).filter(
+            version_number__gte=Coalesce(F('latest_keyframe'), Value(1)),
+        ).order_by('event_id', 'version_number')
+
+        states = {}
+        for event_id, versions in groupby(rows, key=lambda version: version.event_id):
+            for version, snapshot in cls.replay(versions):
+                version.snapshot = snapshot
+            states[event_id] = (version, snapshot)
+        return states
+
+    @cached_property
+    def snapshot(self):
+        if self.is_keyframe:
+            return self.data
+        chain = self.chain(self.event_id, self.version_number, self.version_number)
+        snapshot = {}
+        for _, snapshot in self.replay(chain):
+            pass
+        return snapshot
+
+    @classmethod
+    def create_versions(cls, events):
+        """
+        Record a keyframe version for each of many saved events in bulk.
+
+        Counters are bumped with one UPDATE and read back with one SELECT, so
+        this costs a fixed number of queries however many events are passed.
+        """
+        events = list(events)
+        if not events:
+            return []
+        with transaction.atomic():
+            ids = [event.pk for event in events]
+            Event.objects.filter(pk__in=ids).update(version_counter=F('version_counter') + 1)
+            numbers = dict(Event.objects.filter(pk__in=ids).values_list('pk', 'version_counter'))
+            versions = []
+            for event in events:
+                event.version_counter = numbers[event.pk]
+                versions.append(cls(
+                    event=event,
+                    version_number=event.version_counter,
+                    data=cls.snapshot_of(event, event.updated_at),
+                    is_keyframe=True,
+                ))
+            return cls.objects.bulk_create(versions, batch_size=500)
+
+    @classmethod
+    def create_version(cls, event_instance, updated_at):
+        from .utils import compute_diff
+
+        with transaction.atomic():
+            # The UPDATE takes the row lock, so concurrent saves get distinct numbers;
+            # Event.save() never writes the counter, so stale instances cannot rewind it
+            Event.objects.filter(pk=event_instance.pk).update(version_counter=F('version_counter') + 1)
+            new_version_number = Event.objects.filter(pk=event_instance.pk).values_list('version_counter', flat=True).get()
+            event_instance.version_counter = new_version_number
+
+            snapshot = cls.snapshot_of(event_instance, updated_at)
+            previous, keyframe_number = None, None
+            if new_version_number > 1:
+                for version, state in cls.replay(cls.chain(event_instance.pk, new_version_number - 1, new_version_number - 1)):
+                    if version.is_keyframe:
+                        keyframe_number = version.version_number
+                    previous = state
+
+            is_keyframe = keyframe_number is None or new_version_number - keyframe_number >= cls.keyframe_interval()
+            if is_keyframe:
+                data = snapshot
+            else:
+                data = {key: change['new'] for key, change in compute_diff(previous, snapshot).items()}
+
+            version = cls.objects.create(
+                event=event_instance,
+                version_number=new_version_number,
+                data=data,
+                is_keyframe=is_keyframe,
+            )
+        version.snapshot = snapshot
+        return version
+
+
+class Job(models.Model):
+    """A unit of background work, claimed and run by `manage.py run_jobs`."""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # Not claimed before this time; pushed back after a failed attempt
+    run_after = models.DateTimeField(default=django_timezone.now)
+    worker = models.CharField(max_length=100, blank=True)
+    # New on every claim; only the holder of the current token may record the outcome
+    claim_token = models.UUIDField(null=True, blank=True)
+    # Refreshed by the running worker; a job silent for EVENT_JOB_TIMEOUT is requeued
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's claim query: oldest due pending job first
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} - {self.status}"
+
+
+class UserEventStats(models.Model):
+    """Running totals of a user's events, maintained by core.rollups."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='event_stats')
+    event_count = models.IntegerField(default=0)
+    recurring_count = models.IntegerField(default=0)
+    busy_minutes = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.event_count} events"
+
+
+class DailyOccupancy(models.Model):
+    """Events touching one local calendar day of a user, and their minutes on it."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_occupancy')
+    day = models.DateField()
+    event_count = models.IntegerField(default=0)
+    busy_minutes = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'day')
+
+    def __str__(self):
+        return f"{self.user_id} - {self.day} - {self.busy_minutes} min"
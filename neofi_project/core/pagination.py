@@ -0,0 +1,161 @@
+import base64
+import json
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on a unique (ordering field, id) pair.
+
+    Each page is a `WHERE (field, id) > (last_field, last_id)` range scan, so
+    latency stays flat however deep the client pages. With `descending` the
+    pages run newest first and the comparison flips.
+    """
+    ordering_field = 'id'
+    descending = False
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def to_cursor_value(self, value):
+        return value
+
+    def from_cursor_value(self, value):
+        return value
+
+    def encode_cursor(self, instance):
+        # Pages are model instances or `.values()` rows
+        if isinstance(instance, dict):
+            value, pk = instance[self.ordering_field], instance['id']
+        else:
+            value, pk = getattr(instance, self.ordering_field), instance.pk
+        payload = json.dumps([self.to_cursor_value(value), pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            value = self.from_cursor_value(value)
+            if value is None:
+                raise ValueError
+            return value, int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def page_queryset(self, queryset, request):
+        """The sliced queryset for the requested page, one row past its end."""
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        field = self.ordering_field
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            value, pk = cursor
+            after = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(Q(**{f'{field}__{after}': value}) | Q(**{field: value, f'pk__{after}': pk}))
+        if self.descending:
+            return queryset.order_by(f'-{field}', '-pk')[:self.page_size_value + 1]
+        return queryset.order_by(field, 'pk')[:self.page_size_value + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.page_size_value
+        self.page = rows[:self.page_size_value]
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_data(self, data):
+        return {'next': self.get_next_link(), 'results': data}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class EventCursorPagination(KeysetPagination):
+    ordering_field = 'start_time'
+
+    def to_cursor_value(self, value):
+        return value.isoformat()
+
+    def from_cursor_value(self, value):
+        return parse_datetime(value)
+
+
+class OccurrencePagination(EventCursorPagination):
+    """
+    Keyset pages over occurrences_in_range(), keyed on (start_time, event id).
+
+    An event has at most one occurrence per start time, so the pair is unique
+    for materialized rows and lazily expanded lists alike.
+    """
+
+    def encode_cursor(self, occurrence):
+        payload = json.dumps([self.to_cursor_value(occurrence.start_time), occurrence.event_id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def paginate_queryset(self, occurrences, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        if isinstance(occurrences, QuerySet):
+            if cursor is not None:
+                start, event_id = cursor
+                occurrences = occurrences.filter(Q(start_time__gt=start) | Q(start_time=start, event_id__gt=event_id))
+            return self.set_page(list(occurrences.order_by('start_time', 'event_id')[:self.page_size_value + 1]))
+        rows = sorted(occurrences, key=lambda occurrence: (occurrence.start_time, occurrence.event_id))
+        if cursor is not None:
+            rows = [occurrence for occurrence in rows if (occurrence.start_time, occurrence.event_id) > cursor]
+        return self.set_page(rows[:self.page_size_value + 1])
+
+
+class VersionCursorPagination(KeysetPagination):
+    ordering_field = 'version_number'
+    descending = True
+
+
+class SearchPagination(KeysetPagination):
+    """Keyset pages over search_events() rows, best match (lowest rank) first."""
+    ordering_field = 'rank'
+
+    def from_cursor_value(self, value):
+        return float(value)
+
+    def paginate_search(self, request, search):
+        """`search(after, limit)` returns ranked {'id', 'rank'} rows after the cursor."""
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        return self.set_page(search(self.decode_cursor(request), self.page_size_value + 1))
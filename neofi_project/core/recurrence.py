@@ -0,0 +1,186 @@
+import calendar
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+# Fixed-length steps, in days
+DAY_STEPS = {
+    'DAILY': 1,
+    'WEEKLY': 7,
+    'BI-WEEKLY': 14,
+}
+
+# Calendar steps, in months
+MONTH_STEPS = {
+    'MONTHLY': 1,
+    'BI-MONTHLY': 2,
+    'QUARTERLY': 3,
+    'SEMI-ANNUALLY': 6,
+    'ANNUALLY': 12,
+}
+
+
+def is_recurring(event):
+    return bool(event.is_recurring) and event.recurrence in DAY_STEPS.keys() | MONTH_STEPS.keys()
+
+
+def add_months(value, months):
+    # Clamp to the last day of the target month (Jan 31 + 1 month -> Feb 28/29)
+    month_index = value.month - 1 + months
+    year = value.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def nth_start(start, recurrence, n):
+    # Always offset from the first occurrence so month clamping never drifts
+    if recurrence in DAY_STEPS:
+        return start + timedelta(days=DAY_STEPS[recurrence] * n)
+    return add_months(start, MONTH_STEPS[recurrence] * n)
+
+
+def _first_index(start, duration, recurrence, window_start):
+    # Lowest n whose occurrence may still end after window_start
+    if recurrence in DAY_STEPS:
+        step = timedelta(days=DAY_STEPS[recurrence])
+        n = (window_start - start - duration) // step
+    else:
+        months = (window_start.year - start.year) * 12 + window_start.month - start.month
+        n = months // MONTH_STEPS[recurrence] - 1
+    return max(n, 0)
+
+
+def expand_occurrences(start, end, recurrence, window_start, window_end):
+    """
+    Yield (start, end) for every occurrence overlapping [window_start, window_end).
+
+    The series is unbounded, so occurrences are generated lazily and the
+    expansion jumps straight to the first index that can touch the window.
+    """
+    duration = end - start
+    if recurrence not in DAY_STEPS and recurrence not in MONTH_STEPS:
+        if start < window_end and end > window_start:
+            yield start, end
+        return
+
+    n = _first_index(start, duration, recurrence, window_start)
+    while True:
+        occurrence_start = nth_start(start, recurrence, n)
+        if occurrence_start >= window_end:
+            return
+        occurrence_end = occurrence_start + duration
+        if occurrence_end > window_start:
+            yield occurrence_start, occurrence_end
+        n += 1
+
+
+def event_occurrences(event, window_start, window_end):
+    recurrence = event.recurrence if is_recurring(event) else 'NONE'
+    return expand_occurrences(event.start_time, event.end_time, recurrence, window_start, window_end)
+
+
+def occurrence_horizon():
+    # EventOccurrence rows are kept materialized this far ahead of now
+    return timezone.now() + timedelta(days=getattr(settings, 'EVENT_OCCURRENCE_HORIZON_DAYS', 365))
+
+
+def occurrence_floor():
+    # ...and from this far back; older windows are expanded on demand
+    return timezone.now() - timedelta(days=getattr(settings, 'EVENT_OCCURRENCE_LOOKBACK_DAYS', 30))
+
+
+def materialize_occurrences(events, until):
+    """
+    Extend the EventOccurrence rows of the given events up to `until`.
+
+    Only occurrences starting after each event's previously built horizon are
+    added, so repeated calls are incremental. A rebuild starts at
+    occurrence_floor(), not at the first occurrence, so a series that began
+    years ago costs no more than a new one. Work is batched across events and
+    written in one transaction. Returns the number of events topped up.
+    """
+    from .models import Event, EventOccurrence
+
+    floor = occurrence_floor()
+    rebuild_ids, horizon_ids, single_ids, rows = [], [], [], []
+    for event in events:
+        since = event.occurrences_until
+        if since is None:
+            rebuild_ids.append(event.pk)
+        elif since >= until or (not is_recurring(event) and since >= event.end_time):
+            continue
+
+        window_start = max(event.start_time, floor) if since is None else since
+        rows.extend(
+            EventOccurrence(event=event, created_by_id=event.created_by_id, start_time=start, end_time=end)
+            for start, end in event_occurrences(event, window_start, until)
+            if since is None or start >= since
+        )
+        if is_recurring(event) or event.start_time >= until:
+            # A one-off event beyond `until` has no row yet; it stays stale
+            # until a later horizon reaches it
+            horizon_ids.append(event.pk)
+            event.occurrences_until = until
+        else:
+            # Non-recurring events are fully built by their single row
+            single_ids.append(event.pk)
+            event.occurrences_until = event.end_time
+
+    if not (rebuild_ids or horizon_ids or single_ids):
+        return 0
+    with transaction.atomic():
+        if rebuild_ids:
+            EventOccurrence.objects.filter(event_id__in=rebuild_ids).delete()
+        EventOccurrence.objects.bulk_create(rows, batch_size=1000)
+        if horizon_ids:
+            Event.objects.filter(pk__in=horizon_ids).update(occurrences_until=until)
+        if single_ids:
+            Event.objects.filter(pk__in=single_ids).update(occurrences_until=F('end_time'))
+    return len(horizon_ids) + len(single_ids)
+
+
+def occurrences_in_range(user, window_start, window_end):
+    """
+    Occurrences of the user's events overlapping [window_start, window_end).
+
+    Windows between occurrence_floor() and the materialization horizon are
+    answered from the EventOccurrence table after topping up any stale events;
+    windows reaching further out or further back are expanded lazily in
+    Python and returned as a list.
+    """
+    return occurrence_window(user, window_start, window_end)[0]
+
+
+def occurrence_window(user, window_start, window_end):
+    """occurrences_in_range() and the number of events it had to top up first."""
+    from .models import Event, EventOccurrence
+
+    horizon = occurrence_horizon()
+    if window_end > horizon or window_start < occurrence_floor():
+        events = Event.objects.filter(created_by=user, start_time__lt=window_end).filter(
+            Q(end_time__gt=window_start) | Q(is_recurring=True)
+        )
+        occurrences = [
+            EventOccurrence(event=event, created_by_id=event.created_by_id, start_time=start, end_time=end)
+            for event in events
+            for start, end in event_occurrences(event, window_start, window_end)
+        ]
+        occurrences.sort(key=lambda occurrence: occurrence.start_time)
+        return occurrences, 0
+
+    stale = Event.objects.filter(created_by=user).filter(
+        Q(occurrences_until__isnull=True)
+        | (Q(is_recurring=True, occurrences_until__lt=window_end) & ~Q(recurrence='NONE'))
+        # One-off events whose row was not built yet
+        | (Q(occurrences_until__lt=window_end) & Q(occurrences_until__lt=F('end_time')))
+    )
+    topped_up = materialize_occurrences(stale, horizon)
+
+    return EventOccurrence.objects.filter(
+        created_by=user,
+        start_time__lt=window_end,
+        end_time__gt=window_start,
+    ).select_related('event'), topped_up
@@ -0,0 +1,91 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson, producing the same compact output.
+
+    Datetimes and anything else orjson cannot encode natively go through
+    DRF's encoder, so timestamps keep DRF's format. Falls back to the stock
+    renderer when orjson is not installed or indented output is requested.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        rendered = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # DRF escapes U+2028 and U+2029, which are line breaks in JavaScript
+        if b'\xe2\x80' in rendered:
+            rendered = rendered.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return rendered
+
+
+def render_json(data):
+    return ORJSONRenderer().render(data)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack bodies for clients that send `Accept: application/msgpack`.
+
+    Values msgpack cannot pack go through DRF's JSON encoder, so a decoded
+    body equals the JSON one. Only listed in the renderer classes when msgpack
+    is installed.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=JSONRenderer.encoder_class().default)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON, one object per line.
+
+    Views stream their rows themselves; this renderer only makes the
+    `application/x-ndjson` media type negotiable and covers error bodies.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return b''.join(render_json(row) + b'\n' for row in rows)
+
+
+class ICalendarRenderer(BaseRenderer):
+    """
+    Makes `text/calendar` negotiable for the .ics export. The body is
+    streamed by the view, and any other payload (errors, import results) is
+    rendered as JSON by the view, so this renderer only ever sees None.
+    """
+    media_type = 'text/calendar'
+    format = 'ics'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''
@@ -0,0 +1,152 @@
+from dataclasses import dataclass
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone as django_timezone
+from .cache import event_version_key, get_cache, invalidate_event
+from .models import Event, EventVersion
+from .signals import done_in_bulk, invalidate_cached_version
+from .utils import compute_diff
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    Which versions of an event survive compaction.
+
+    The newest `keep_last` versions and everything saved in the last
+    `daily_after` days are kept. Older versions are thinned to the last one
+    of each day, and versions older than `weekly_after` days to the last one
+    of each ISO week.
+    """
+    keep_last: int = 20
+    daily_after: int = 30
+    weekly_after: int = 180
+
+    def __post_init__(self):
+        self.keep_last = max(1, self.keep_last)
+        self.now = django_timezone.now()
+        self.daily_cutoff = self.now - timedelta(days=self.daily_after)
+        self.weekly_cutoff = self.now - timedelta(days=max(self.daily_after, self.weekly_after))
+
+    def bucket(self, created_at):
+        """Checkpoint bucket of a version, or None if it is recent enough to keep."""
+        if created_at >= self.daily_cutoff:
+            return None
+        if created_at >= self.weekly_cutoff:
+            return ('day', created_at.date())
+        return ('week',) + tuple(created_at.isocalendar()[:2])
+
+
+class VersionCompactor:
+    """
+    Apply a RetentionPolicy to stored EventVersion rows.
+
+    Each event is compacted in its own transaction, reading its versions in
+    keyset chunks of `chunk_size`, so memory stays bounded however long a
+    history is. Dropped rows are deleted in chunks of `chunk_size`. Surviving rows
+    are rewritten as keyframes or deltas against the previous survivor,
+    because a delta is only valid relative to the version right before it.
+    """
+
+    def __init__(self, policy, chunk_size=1000, dry_run=False):
+        self.policy = policy
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.events = 0
+        self.deleted = 0
+        self.rewritten = 0
+
+    def candidate_events(self, event_ids=None):
+        """Ids of events with more than keep_last versions, some old enough to thin."""
+        groups = EventVersion.objects.values('event_id').annotate(
+            count=Count('id'), oldest=Min('created_at'),
+        ).filter(count__gt=self.policy.keep_last, oldest__lt=self.policy.daily_cutoff)
+        if event_ids is not None:
+            groups = groups.filter(event_id__in=event_ids)
+        last = 0
+        while True:
+            chunk = list(groups.filter(event_id__gt=last).order_by('event_id').values_list('event_id', flat=True)[:self.chunk_size])
+            if not chunk:
+                return
+            yield from chunk
+            last = chunk[-1]
+
+    def run(self, event_ids=None):
+        for event_id in self.candidate_events(event_ids):
+            self.compact_event(event_id)
+        return self
+
+    def versions(self, event_id):
+        # Keyset chunks rather than one open cursor, since rows are written between reads
+        last = 0
+        while True:
+            chunk = list(
+                EventVersion.objects.filter(event_id=event_id, version_number__gt=last)
+                .order_by('version_number')
+                .only('id', 'version_number', 'data', 'is_keyframe', 'created_at')[:self.chunk_size]
+            )
+            if not chunk:
+                return
+            yield from chunk
+            last = chunk[-1].version_number
+
+    def compact_event(self, event_id):
+        with transaction.atomic():
+            # Holds off create_version, which bumps the counter on this row first
+            if not Event.objects.select_for_update().filter(pk=event_id).exists():
+                return
+            protected_from = EventVersion.objects.filter(event_id=event_id).order_by('-version_number').values_list(
+                'version_number', flat=True,
+            )[self.policy.keep_last - 1:self.policy.keep_last].first() or 0
+
+            self.pending_deletes, self.pending_updates = [], []
+            self.kept_snapshot, self.since_keyframe = None, 0
+            previous = None
+            for version, snapshot in EventVersion.replay(self.versions(event_id)):
+                if previous is not None:
+                    kept, kept_state = previous
+                    bucket = self.policy.bucket(kept.created_at)
+                    keep = kept.version_number >= protected_from or bucket is None or bucket != self.policy.bucket(version.created_at)
+                    self.settle(event_id, kept, kept_state, keep)
+                previous = (version, snapshot)
+            if previous is not None:
+                self.settle(event_id, *previous, True)
+            self.flush(event_id)
+            self.events += 1
+        if not self.dry_run:
+            transaction.on_commit(lambda: invalidate_event(event_id))
+
+    def settle(self, event_id, version, snapshot, keep):
+        if not keep:
+            self.pending_deletes.append(version.pk)
+        else:
+            interval = EventVersion.keyframe_interval()
+            if self.kept_snapshot is None or self.since_keyframe + 1 >= interval:
+                data, is_keyframe = snapshot, True
+                self.since_keyframe = 0
+            else:
+                data = {key: change['new'] for key, change in compute_diff(self.kept_snapshot, snapshot).items()}
+                is_keyframe = False
+                self.since_keyframe += 1
+            if data != version.data or is_keyframe != version.is_keyframe:
+                version.data, version.is_keyframe = data, is_keyframe
+                self.pending_updates.append(version)
+            self.kept_snapshot = snapshot
+        if len(self.pending_deletes) + len(self.pending_updates) >= self.chunk_size:
+            self.flush(event_id)
+
+    def flush(self, event_id):
+        self.deleted += len(self.pending_deletes)
+        self.rewritten += len(self.pending_updates)
+        if not self.dry_run:
+            if self.pending_updates:
+                EventVersion.objects.bulk_update(self.pending_updates, ['data', 'is_keyframe'], batch_size=self.chunk_size)
+            if self.pending_deletes:
+                # One cache round trip per chunk after commit, instead of one
+                # per row from invalidate_cached_version
+                with done_in_bulk(invalidate_cached_version):
+                    EventVersion.objects.filter(pk__in=self.pending_deletes).only('id', 'event_id').delete()
+                keys = [event_version_key(event_id, pk) for pk in self.pending_deletes]
+                transaction.on_commit(lambda: get_cache().delete_many(keys))
+        self.pending_deletes, self.pending_updates = [], []
@@ -0,0 +1,130 @@
+"""
+Per-user event totals and daily occupancy, kept up to date incrementally.
+
+Every write path turns the events it touches into a RollupDelta: +1 event
+and its minutes on each local day it spans when an event appears, the
+negation when it goes away. `apply` folds a whole delta into
+UserEventStats and DailyOccupancy with a handful of UPDATEs per user, so a
+bulk import costs about as much as a single save. `manage.py
+rebuild_rollups` recomputes everything from the events table.
+
+Days are calendar days in TIME_ZONE. Only the stored interval of an event
+is counted; later occurrences of a recurring series are not expanded. The
+serializer refuses events longer than EVENT_MAX_DURATION_DAYS, and
+`day_minutes` clamps to the same length, so rows written before the limit
+or restored from old versions add at most that many days of rows.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone as django_timezone
+from .models import DailyOccupancy, Event, UserEventStats
+
+# What an event contributes depends on these columns only
+ROLLUP_FIELDS = ['created_by_id', 'start_time', 'end_time', 'is_recurring']
+ROLLUP_TRIGGER_FIELDS = {'created_by', 'created_by_id', 'start_time', 'end_time', 'is_recurring'}
+
+
+def rollup_state(event):
+    return tuple(getattr(event, field) for field in ROLLUP_FIELDS)
+
+
+def day_minutes(start, end):
+    """
+    (local date, minutes of [start, end) on that date) for each day the
+    interval touches, counting at most EVENT_MAX_DURATION_DAYS from start.
+    """
+    zone = django_timezone.get_default_timezone()
+    day = django_timezone.localtime(start, zone).date()
+    if end <= start:
+        return [(day, 0)]
+    end = min(end, start + timedelta(days=getattr(settings, 'EVENT_MAX_DURATION_DAYS', 366)))
+    last = django_timezone.localtime(end, zone).date()
+    spans = []
+    while day <= last:
+        # In UTC, so a DST day really is 23 or 25 hours long
+        day_start = datetime.combine(day, time.min, tzinfo=zone).astimezone(timezone.utc)
+        day_end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=zone).astimezone(timezone.utc)
+        overlap = min(end, day_end) - max(start, day_start)
+        if overlap > timedelta(0):
+            spans.append((day, int(overlap.total_seconds() // 60)))
+        day += timedelta(days=1)
+    return spans
+
+
+class RollupDelta:
+    """Accumulated changes to the rollup tables, written by `apply`."""
+    update_batch_size = 500
+
+    def __init__(self):
+        self.users = defaultdict(lambda: [0, 0, 0])
+        self.days = defaultdict(lambda: [0, 0])
+
+    def add(self, state, sign=1):
+        """Count an event in (sign=1) or out (sign=-1), given its rollup_state()."""
+        user_id, start, end, is_recurring = state
+        spans = day_minutes(start, end)
+        totals = self.users[user_id]
+        totals[0] += sign
+        totals[1] += sign * bool(is_recurring)
+        totals[2] += sign * sum(minutes for _, minutes in spans)
+        for day, minutes in spans:
+            entry = self.days[(user_id, day)]
+            entry[0] += sign
+            entry[1] += sign * minutes
+
+    def add_events(self, events, sign=1):
+        for event in events:
+            self.add(rollup_state(event), sign)
+        return self
+
+    def apply(self):
+        users = {user_id: totals for user_id, totals in self.users.items() if any(totals)}
+        days = defaultdict(dict)
+        for (user_id, day), entry in self.days.items():
+            if any(entry):
+                days[user_id][day] = entry
+
+        # A row can only be missing where an event starts to count; removals and
+        # resizes always touch rows that an earlier delta created
+        UserEventStats.objects.bulk_create(
+            [UserEventStats(user_id=user_id) for user_id, totals in users.items() if totals[0] > 0], ignore_conflicts=True,
+        )
+        DailyOccupancy.objects.bulk_create(
+            [
+                DailyOccupancy(user_id=user_id, day=day)
+                for user_id, entries in days.items() for day, entry in entries.items() if entry[0] > 0
+            ],
+            ignore_conflicts=True, batch_size=self.update_batch_size,
+        )
+
+        for user_id, (count, recurring, minutes) in users.items():
+            UserEventStats.objects.filter(user_id=user_id).update(
+                event_count=F('event_count') + count,
+                recurring_count=F('recurring_count') + recurring,
+                busy_minutes=F('busy_minutes') + minutes,
+            )
+        for user_id, entries in days.items():
+            entries = list(entries.items())
+            for offset in range(0, len(entries), self.update_batch_size):
+                batch = entries[offset:offset + self.update_batch_size]
+                DailyOccupancy.objects.filter(user_id=user_id, day__in=[day for day, _ in batch]).update(
+                    event_count=F('event_count') + Case(*[When(day=day, then=Value(entry[0])) for day, entry in batch], default=Value(0)),
+                    busy_minutes=F('busy_minutes') + Case(*[When(day=day, then=Value(entry[1])) for day, entry in batch], default=Value(0)),
+                )
+        self.users.clear()
+        self.days.clear()
+
+
+def rebuild_rollups(user_ids, chunk_size=2000):
+    """Recompute the rollups of the given users from their events."""
+    with transaction.atomic():
+        UserEventStats.objects.filter(user_id__in=user_ids).delete()
+        DailyOccupancy.objects.filter(user_id__in=user_ids).delete()
+        delta = RollupDelta()
+        events = Event.objects.filter(created_by_id__in=user_ids).values_list(*ROLLUP_FIELDS)
+        for state in events.iterator(chunk_size=chunk_size):
+            delta.add(state)
+        delta.apply()
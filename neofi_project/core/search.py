@@ -0,0 +1,123 @@
+"""
+Ranked full-text search over event titles, descriptions and locations.
+
+SQLite keeps an FTS5 shadow table, core_event_search, whose rowid is the
+event id; the Event signals and the bulk write paths keep it current.
+PostgreSQL needs no shadow table: migration 0010 adds a GIN index on
+SEARCH_VECTOR_SQL and queries repeat that exact expression. Without either
+(e.g. an SQLite build lacking FTS5) search falls back to unranked
+`icontains` filters.
+"""
+import re
+from django.db import connection
+from django.db.models import Q
+from .models import Event
+
+SEARCH_TABLE = 'core_event_search'
+
+# Must stay identical to the expression indexed in migration 0010
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(e.title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(e.description, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(e.location, '')), 'C')"
+)
+
+# bm25 column weights for title, description, location
+FTS_WEIGHTS = (10.0, 1.0, 5.0)
+
+VISIBLE_SQL = (
+    "(e.created_by_id = %s OR EXISTS ("
+    "SELECT 1 FROM core_eventpermission p WHERE p.event_id = e.id AND p.user_id = %s))"
+)
+
+# Whether each SQLite database file has the FTS5 table, keyed by NAME
+_fts_tables = {}
+
+
+def tokens(text):
+    # Word characters only, so nothing the user types can reach query syntax
+    return re.findall(r'\w+', text or '')
+
+
+def search_backend():
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    if connection.vendor == 'sqlite':
+        name = connection.settings_dict['NAME']
+        if name not in _fts_tables:
+            _fts_tables[name] = SEARCH_TABLE in connection.introspection.table_names()
+        return 'fts5' if _fts_tables[name] else None
+    return None
+
+
+def index_events(events):
+    """Write events into the FTS5 table; a no-op on other backends."""
+    if search_backend() != 'fts5':
+        return
+    rows = [(event.pk, event.title, event.description, event.location) for event in events]
+    if rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, title, description, location) VALUES (%s, %s, %s, %s)', rows,
+            )
+
+
+def unindex_events(event_ids):
+    if search_backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(event_id,) for event_id in event_ids])
+
+
+def search_events(user, text='', location='', after=None, limit=100):
+    """
+    Up to `limit` {'id', 'rank'} rows for events the user can see that match
+    every word of `text` (any column) and of `location` (location only), as
+    prefixes. Best match first; lower rank is better. `after` is the
+    (rank, id) of the last row of the previous page.
+    """
+    words, place = tokens(text), tokens(location)
+    if not words and not place:
+        return []
+    backend = search_backend()
+    if backend is None:
+        return fallback_search(user, words, place, after, limit)
+
+    params = []
+    if backend == 'fts5':
+        terms = [f'"{word}"*' for word in words] + [f'location : "{word}"*' for word in place]
+        rank = f'bm25({SEARCH_TABLE}, {", ".join(map(str, FTS_WEIGHTS))})'
+        sql = (
+            f'SELECT * FROM (SELECT e.id, {rank} AS rank FROM {SEARCH_TABLE} '
+            f'JOIN core_event e ON e.id = {SEARCH_TABLE}.rowid '
+            f'WHERE {SEARCH_TABLE} MATCH %s AND {VISIBLE_SQL}) ranked'
+        )
+        params += [' '.join(terms), user.pk, user.pk]
+    else:
+        # ':*' is a prefix match, and ':*C' restricts a term to the location weight
+        query = ' & '.join([f'{word}:*' for word in words] + [f'{word}:*C' for word in place])
+        sql = (
+            f"SELECT * FROM (SELECT e.id, -ts_rank_cd({SEARCH_VECTOR_SQL}, to_tsquery('simple', %s)) AS rank "
+            f"FROM core_event e WHERE ({SEARCH_VECTOR_SQL}) @@ to_tsquery('simple', %s) AND {VISIBLE_SQL}) ranked"
+        )
+        params += [query, query, user.pk, user.pk]
+
+    if after is not None:
+        sql += ' WHERE (rank > %s OR (rank = %s AND id > %s))'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY rank, id LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [{'id': pk, 'rank': rank} for pk, rank in cursor.fetchall()]
+
+
+def fallback_search(user, words, place, after, limit):
+    events = Event.objects.filter(Q(created_by=user) | Q(permissions__user=user)).distinct()
+    for word in words:
+        events = events.filter(Q(title__icontains=word) | Q(description__icontains=word) | Q(location__icontains=word))
+    for word in place:
+        events = events.filter(location__icontains=word)
+    if after is not None:
+        events = events.filter(pk__gt=after[1])
+    return [{'id': pk, 'rank': 0.0} for pk in events.order_by('pk').values_list('pk', flat=True)[:limit]]
@@ -1,6 +1,9 @@
+from datetime import timedelta
+from django.conf import settings
 from django.contrib.auth.models import User
 from rest_framework.exceptions import ValidationError, PermissionDenied
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from .models import *
 
 class UserRegisterSerializer(serializers.ModelSerializer):
@@ -17,11 +20,48 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         )
         return user
 
-class EventSerializer(serializers.ModelSerializer):
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """Accepts a `fields` kwarg restricting which fields are rendered."""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class EventSerializer(DynamicFieldsModelSerializer):
+    # Echoed back (or sent as If-Match) to guard updates against lost writes
+    version = serializers.IntegerField(source='version_counter', read_only=True)
+
     class Meta:
         model = Event
-        fields = '__all__'
+        exclude = ['occurrences_until', 'version_counter']
         read_only_fields = ['created_by', 'created_at', 'updated_at']
+
+    def validate(self, attrs):
+        # Partial updates compare against the stored times
+        start = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        if start is not None and end is not None:
+            if end <= start:
+                raise ValidationError({'end_time': "Must be after start_time."})
+            limit = getattr(settings, 'EVENT_MAX_DURATION_DAYS', 366)
+            if end - start > timedelta(days=limit):
+                raise ValidationError({'end_time': f"Events may last at most {limit} days."})
+        return attrs
+
+class SharedEventSerializer(EventSerializer):
+    role = serializers.CharField(read_only=True)
+
+class EventOccurrenceSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='event.title', read_only=True)
+    location = serializers.CharField(source='event.location', read_only=True)
+    recurrence = serializers.CharField(source='event.recurrence', read_only=True)
+
+    class Meta:
+        model = EventOccurrence
+        fields = ['event', 'title', 'location', 'recurrence', 'start_time', 'end_time']
             
 class EventShareSerializer(serializers.Serializer):
     user_id = serializers.IntegerField()
@@ -51,11 +91,46 @@ class EventPermissionSerializer(serializers.ModelSerializer):
         fields = ['user_id', 'username', 'role']
     
 class EventVersionSerializer(serializers.ModelSerializer):
+    # Always the full state, whether the row is a keyframe or a delta
+    data = serializers.JSONField(source='snapshot', read_only=True)
+
     class Meta:
         model = EventVersion
         fields = ['id', 'version_number', 'data', 'created_at']
 
 
+class EventBulkRevokeSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=10000)
+    event_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+
+    def validate_user_ids(self, value):
+        value = list(dict.fromkeys(value))
+        # One IN query for the whole list rather than an exists() per user
+        existing = set(User.objects.filter(id__in=value).values_list('id', flat=True))
+        missing = [user_id for user_id in value if user_id not in existing]
+        if missing:
+            raise ValidationError(f"Users with these IDs do not exist: {', '.join(map(str, missing))}.")
+        return value
+
+    def validate_event_ids(self, value):
+        return list(dict.fromkeys(value))
+
+    def validate(self, attrs):
+        limit = getattr(settings, 'EVENT_BULK_SHARE_MAX_PAIRS', 100000)
+        if len(attrs['user_ids']) * len(attrs['event_ids']) > limit:
+            raise ValidationError(f"At most {limit} user and event pairs per request; split the batch.")
+        return attrs
+
+
+class EventBulkShareSerializer(EventBulkRevokeSerializer):
+    role = serializers.ChoiceField(choices=EventPermission.ROLE_CHOICES)
+
+
+class EventBulkRollbackSerializer(serializers.Serializer):
+    as_of = serializers.DateTimeField()
+    event_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+
+
 class EventRollbackSerializer(serializers.Serializer):
     version_id = serializers.IntegerField()
 
@@ -63,4 +138,70 @@ class EventRollbackSerializer(serializers.Serializer):
         event = self.context.get('event')
         if not EventVersion.objects.filter(event=event, id=value).exists():
             raise serializers.ValidationError("Version does not exist for this event.")
-        return value
\ No newline at end of file
+        return value
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'result', 'error', 'attempts', 'max_attempts', 'created_at', 'started_at', 'finished_at']
+
+
+class ValuesRowSerializer:
+    """
+    Renders `.values()` rows exactly as `serializer` renders model instances.
+
+    Converters are picked once per field, so each row costs one dict lookup
+    and at most one call per field; fields whose representation is the
+    stored value itself are copied as is. `columns` names the `.values()`
+    lookups the rows must contain.
+    """
+    # Fields whose to_representation returns values read from the database unchanged
+    passthrough_fields = (
+        serializers.BooleanField, serializers.CharField, serializers.ChoiceField, serializers.IntegerField,
+        serializers.JSONField, serializers.PrimaryKeyRelatedField, serializers.ReadOnlyField,
+    )
+
+    def __init__(self, serializer):
+        self.fields = [
+            (name, '__'.join(field.source_attrs), self.converter(field))
+            for name, field in serializer.fields.items() if not field.write_only
+        ]
+
+    @property
+    def columns(self):
+        return [column for _, column, _ in self.fields]
+
+    def converter(self, field):
+        if isinstance(field, serializers.DateTimeField):
+            return self.datetime_converter(field)
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is not None:
+            return field.pk_field.to_representation
+        if type(field) in self.passthrough_fields:
+            return None
+        return field.to_representation
+
+    @staticmethod
+    def datetime_converter(field):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if output_format is None or output_format.lower() != 'iso-8601' or field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            # Same steps as DateTimeField.to_representation for aware values
+            if value.tzinfo is None:
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+
+    def to_representation(self, row):
+        data = {}
+        for name, column, convert in self.fields:
+            value = row[column]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+    def render(self, rows):
+        return [self.to_representation(row) for row in rows]
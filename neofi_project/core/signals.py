@@ -0,0 +1,133 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from .access import role_cache
+from .cache import invalidate_event, invalidate_version
+from .models import Event, EventOccurrence, EventPermission, EventVersion, PermissionTombstone, SyncTombstone, User
+from .rollups import ROLLUP_FIELDS, ROLLUP_TRIGGER_FIELDS, RollupDelta, rollup_state
+from .search import index_events, unindex_events
+
+
+_done_in_bulk = ContextVar('done_in_bulk', default=frozenset())
+
+
+@contextmanager
+def done_in_bulk(*receivers):
+    """
+    Inside this block the given receivers do nothing: the caller does their
+    work itself, once per batch rather than once per row. Only receivers that
+    check the flag (record_revocation_tombstone, invalidate_cached_version)
+    can be passed.
+    """
+    token = _done_in_bulk.set(_done_in_bulk.get() | frozenset(receivers))
+    try:
+        yield
+    finally:
+        _done_in_bulk.reset(token)
+
+
+@receiver(pre_save, sender=Event)
+def reset_occurrence_horizon(sender, instance, **kwargs):
+    # Any change to the parent may move or re-time its occurrences
+    if not instance._state.adding:
+        instance.occurrences_until = None
+
+
+@receiver(post_save, sender=Event)
+def invalidate_occurrences(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    EventOccurrence.objects.filter(event=instance).delete()
+    if update_fields is not None and 'occurrences_until' not in update_fields:
+        Event.objects.filter(pk=instance.pk).update(occurrences_until=None)
+
+
+@receiver(post_save, sender=Event)
+def record_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        EventVersion.create_version(instance, instance.updated_at)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_cached_event(sender, instance, **kwargs):
+    invalidate_event(instance.pk)
+
+
+@receiver(post_save, sender=Event)
+def index_event(sender, instance, **kwargs):
+    index_events([instance])
+
+
+@receiver(post_delete, sender=Event)
+def unindex_event(sender, instance, **kwargs):
+    unindex_events([instance.pk])
+
+
+@receiver(pre_save, sender=Event)
+def remember_rollup_state(sender, instance, update_fields=None, **kwargs):
+    # Rollups move by the difference between the stored row and the saved one
+    if instance._state.adding:
+        instance._rollup_previous = None
+    elif update_fields is not None and not ROLLUP_TRIGGER_FIELDS & set(update_fields):
+        instance._rollup_previous = rollup_state(instance)
+    else:
+        instance._rollup_previous = Event.objects.filter(pk=instance.pk).values_list(*ROLLUP_FIELDS).first()
+
+
+@receiver(post_save, sender=Event)
+def update_rollups(sender, instance, **kwargs):
+    state, previous = rollup_state(instance), instance._rollup_previous
+    if state == previous:
+        return
+    delta = RollupDelta()
+    if previous is not None:
+        delta.add(previous, -1)
+    delta.add(state)
+    delta.apply()
+
+
+@receiver(post_delete, sender=Event)
+def remove_from_rollups(sender, instance, origin=None, **kwargs):
+    # A deleted account takes its rollup rows with it
+    if isinstance(origin, User):
+        return
+    delta = RollupDelta()
+    delta.add(rollup_state(instance), -1)
+    delta.apply()
+
+
+@receiver(post_delete, sender=EventVersion)
+def invalidate_cached_version(sender, instance, **kwargs):
+    if invalidate_cached_version not in _done_in_bulk.get():
+        invalidate_version(instance.event_id, instance.pk)
+
+
+@receiver(post_save, sender=EventPermission)
+@receiver(post_delete, sender=EventPermission)
+def invalidate_cached_roles(sender, instance, **kwargs):
+    role_cache.invalidate_user(instance.user_id)
+
+
+@receiver(pre_delete, sender=Event)
+def record_event_tombstones(sender, instance, origin=None, **kwargs):
+    # Runs before the cascade, while the permission rows still name everyone who saw it
+    user_ids = set(EventPermission.objects.filter(event=instance).values_list('user_id', flat=True))
+    user_ids.add(instance.created_by_id)
+    if isinstance(origin, User):
+        # A deleted account has no clients left to sync
+        user_ids.discard(origin.pk)
+    SyncTombstone.objects.bulk_create([
+        SyncTombstone(user_id=user_id, event_id=instance.pk, reason='DELETED') for user_id in user_ids
+    ])
+
+
+@receiver(post_delete, sender=EventPermission)
+def record_revocation_tombstone(sender, instance, origin=None, **kwargs):
+    # Only direct revocations; cascades from deleted events or users are covered elsewhere
+    if getattr(origin, 'model', type(origin)) is not EventPermission or record_revocation_tombstone in _done_in_bulk.get():
+        return
+    SyncTombstone.objects.create(user_id=instance.user_id, event_id=instance.event_id, reason='REVOKED')
+    # ...and everyone else who sees the event drops the user's role
+    PermissionTombstone.objects.create(event_id=instance.event_id, user_id=instance.user_id)
@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from .access import events_with_role
+from .models import EventPermission, PermissionTombstone, SyncTombstone
+
+TOKEN_VERSION = 1
+
+
+def encode_sync_token(moment):
+    payload = json.dumps({'v': TOKEN_VERSION, 't': moment.isoformat()}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_sync_token(token):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        moment = parse_datetime(payload['t']) if payload.get('v') == TOKEN_VERSION else None
+    except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+        moment = None
+    if moment is None:
+        raise ValidationError({'sync_token': "Invalid sync token."})
+    return moment
+
+
+def collect_changes(user, token=None):
+    """
+    Everything a client holding `token` has to apply to catch up.
+
+    Changes are read from slightly before the token (EVENT_SYNC_OVERLAP_SECONDS)
+    so rows committed by transactions still running when the token was cut
+    are not missed; clients apply the feed idempotently. Tokens older than
+    the tombstone retention force a full resync.
+    """
+    now = timezone.now()
+    since = decode_sync_token(token) if token else None
+    retention = timedelta(days=getattr(settings, 'EVENT_SYNC_TOMBSTONE_DAYS', 30))
+    reset = since is None or since < now - retention
+
+    events = events_with_role(user)
+    if not reset:
+        since -= timedelta(seconds=getattr(settings, 'EVENT_SYNC_OVERLAP_SECONDS', 2))
+        # Newly shared events count as changed even if the event itself is not
+        events = events.filter(Q(updated_at__gte=since) | Q(user_permission__updated_at__gte=since))
+
+    visible = events_with_role(user).values('pk')
+    permissions = EventPermission.objects.filter(event__in=visible).exclude(user=user)
+    removed = PermissionTombstone.objects.none()
+    deleted = []
+    if not reset:
+        permissions = permissions.filter(updated_at__gte=since)
+        # Roles revoked from other users; a pair granted again comes through `permissions`
+        granted = EventPermission.objects.filter(event_id=OuterRef('event_id'), user_id=OuterRef('user_id'))
+        removed = PermissionTombstone.objects.filter(event__in=visible, created_at__gte=since).exclude(user_id=user.pk).exclude(
+            Exists(granted)
+        )
+        deleted = sorted(set(
+            SyncTombstone.objects.filter(user=user, created_at__gte=since).values_list('event_id', flat=True)
+        ))
+
+    return {
+        'reset': reset,
+        'events': events.order_by('updated_at', 'pk'),
+        'permissions': permissions.order_by('event_id', 'user_id').values('event_id', 'user_id', 'role'),
+        'removed_permissions': removed.order_by('event_id', 'user_id').values('event_id', 'user_id').distinct(),
+        'deleted': deleted,
+        'sync_token': encode_sync_token(now),
+    }
+
+
+def prune_tombstones(chunk_size=10000):
+    """
+    Delete event and permission tombstones older than EVENT_SYNC_TOMBSTONE_DAYS,
+    in chunks of `chunk_size`. Tokens that old force a full resync, so
+    nothing reads them. Returns the number deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'EVENT_SYNC_TOMBSTONE_DAYS', 30))
+    deleted = 0
+    for model in (SyncTombstone, PermissionTombstone):
+        expired = model.objects.filter(created_at__lt=cutoff)
+        while True:
+            pks = list(expired.values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            deleted += model.objects.filter(pk__in=pks).delete()[0]
+    return deleted
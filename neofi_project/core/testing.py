@@ -0,0 +1,39 @@
+"""
+Test helpers for holding endpoints to their query budgets.
+
+    class EventApiTests(QueryBudgetMixin, APITestCase):
+        def test_list(self):
+            response = self.client.get(reverse('event-list-create'))
+            self.assertWithinQueryBudget(response)
+
+Budgets come from EVENT_QUERY_BUDGETS, keyed by URL name (optionally
+prefixed with the HTTP method, and suffixed with the response's
+`budget_variant`); pass `budget` to check an explicit number instead.
+"""
+from contextlib import contextmanager
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .metrics import query_budget
+
+
+class QueryBudgetMixin:
+
+    def assertWithinQueryBudget(self, response, budget=None):
+        # QueryMetricsMiddleware counts the queries of the whole request
+        if 'X-Query-Count' not in response:
+            self.fail('Response has no X-Query-Count header; is QueryMetricsMiddleware installed?')
+        if budget is None:
+            view_name = response.resolver_match.view_name
+            budget = query_budget(view_name, response.request['REQUEST_METHOD'], getattr(response, 'budget_variant', None))
+            if budget is None:
+                self.fail(f'No query budget declared for {view_name!r} in EVENT_QUERY_BUDGETS.')
+        count = int(response['X-Query-Count'])
+        self.assertLessEqual(count, budget, f'{response.request["PATH_INFO"]} ran {count} queries, budget is {budget}.')
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        # For code under test that is not a full request
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        queries = '\n'.join(query['sql'] for query in context.captured_queries)
+        self.assertLessEqual(len(context), budget, f'{len(context)} queries, budget is {budget}:\n{queries}')
@@ -1,3 +1,1880 @@
-from django.test import TestCase
+import json
+from datetime import datetime, timedelta, timezone
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import patch
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone as django_timezone
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from .access import events_with_role, role_cache
+from .batch import EventBatchImporter, rollback_events
+from .benchmark import EventBenchmark, compare_reports
+from .cache import event_history_key, event_version_key, get_cache
+from .ical import fold, parse_rrule, unfolded_lines
+from .jobs import JOB_HANDLERS, claim_job, enqueue_job, requeue_stale_jobs, run_job
+from .metrics import request_metrics
+from .models import DailyOccupancy, Event, EventOccurrence, EventPermission, EventVersion, Job, PermissionTombstone, SyncTombstone, UserEventStats
+from .recurrence import event_occurrences, occurrences_in_range
+from .renderers import ORJSONRenderer
+from .rollups import day_minutes, rebuild_rollups
+from .retention import RetentionPolicy, VersionCompactor
+from .search import SEARCH_TABLE, search_backend, search_events
+from .serializers import (
+    EventPermissionSerializer, EventSerializer, EventVersionSerializer, SharedEventSerializer, ValuesRowSerializer,
+)
+from .sync import encode_sync_token, prune_tombstones
+from .testing import QueryBudgetMixin
+from .utils import find_conflicts
 
-# Create your tests here.
+START = datetime(2026, 3, 1, 9, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+class ValuesRowSerializerTests(TestCase):
+    """The .values() read path must render byte-identical output to the serializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'pw')
+        for index in range(5):
+            event = Event.objects.create(
+                title=f'Event “{index}”', description='' if index % 2 else 'Notes\nline two',
+                start_time=START + timedelta(days=index), end_time=START + timedelta(days=index, hours=1),
+                location='Room ✓', is_recurring=bool(index % 2), recurrence='WEEKLY' if index % 2 else 'NONE',
+                created_by=cls.owner,
+            )
+            EventPermission.objects.create(user=cls.owner, event=event, role='OWNER')
+            EventPermission.objects.create(user=cls.viewer, event=event, role='VIEWER')
+        cls.event = Event.objects.order_by('pk').first()
+        for title in ['Renamed', 'Renamed again']:
+            cls.event.title = title
+            cls.event.save()
+
+    def assertSameOutput(self, serializer, queryset, rows=None):
+        fast = ValuesRowSerializer(serializer)
+        rows = list(queryset.values(*fast.columns)) if rows is None else rows
+        expected = type(serializer)(list(queryset), many=True, **self.serializer_kwargs(serializer)).data
+        self.assertEqual(JSONRenderer().render(fast.render(rows)), JSONRenderer().render(expected))
+
+    @staticmethod
+    def serializer_kwargs(serializer):
+        if isinstance(serializer, EventSerializer):
+            return {'fields': list(serializer.fields)}
+        return {}
+
+    def test_event_rows(self):
+        self.assertSameOutput(EventSerializer(), Event.objects.order_by('pk'))
+
+    def test_projected_event_rows(self):
+        self.assertSameOutput(EventSerializer(fields=['id', 'title', 'end_time']), Event.objects.order_by('pk'))
+
+    def test_shared_event_rows(self):
+        self.assertSameOutput(SharedEventSerializer(), events_with_role(self.viewer).order_by('pk'))
+
+    @override_settings(TIME_ZONE='Asia/Kolkata')
+    def test_event_rows_in_local_time(self):
+        self.assertSameOutput(EventSerializer(), Event.objects.order_by('pk'))
+
+    def test_permission_rows(self):
+        self.assertSameOutput(EventPermissionSerializer(), EventPermission.objects.filter(event=self.event).order_by('pk'))
+
+    def test_version_rows(self):
+        versions = EventVersion.objects.filter(event=self.event).order_by('-version_number')
+        instances = list(versions)
+        EventVersion.attach_snapshots(instances)
+        rows = list(versions.values('id', 'version_number', 'created_at'))
+        for row, version in zip(rows, instances):
+            row['snapshot'] = version.snapshot
+        expected = EventVersionSerializer(instances, many=True).data
+        self.assertEqual(
+            JSONRenderer().render(ValuesRowSerializer(EventVersionSerializer()).render(rows)),
+            JSONRenderer().render(expected),
+        )
+
+    def test_list_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.viewer)
+        response = client.get('/api/events/', {'scope': 'all', 'page_size': 3})
+        expected = SharedEventSerializer(list(events_with_role(self.viewer).order_by('start_time', 'pk')[:3]), many=True).data
+        self.assertEqual(JSONRenderer().render(response.json()['results']), JSONRenderer().render(expected))
+        self.assertIsNotNone(response.json()['next'])
+
+    def test_history_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.get(f'/api/api/events/{self.event.pk}/history/')
+        instances = list(EventVersion.objects.filter(event=self.event).order_by('-version_number'))
+        EventVersion.attach_snapshots(instances)
+        self.assertEqual(
+            JSONRenderer().render(response.json()['results']),
+            JSONRenderer().render(EventVersionSerializer(instances, many=True).data),
+        )
+
+    @override_settings(EVENT_VERSION_KEYFRAME_INTERVAL=2)
+    def test_history_pages(self):
+        for index in range(5):
+            self.event.title = f'Page {index}'
+            self.event.save()
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        instances = list(EventVersion.objects.filter(event=self.event).order_by('-version_number'))
+        EventVersion.attach_snapshots(instances)
+        results, url = [], f'/api/api/events/{self.event.pk}/history/?page_size=3'
+        while url:
+            page = client.get(url).json()
+            results += page['results']
+            url = page['next']
+        self.assertEqual(
+            JSONRenderer().render(results),
+            JSONRenderer().render(EventVersionSerializer(instances, many=True).data),
+        )
+
+
+class VersionStoreTests(TestCase):
+    """Delta versions with keyframes must rebuild every saved state exactly."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+
+    def create_event(self, **fields):
+        return Event.objects.create(
+            title='Start', start_time=START, end_time=START + timedelta(hours=1), created_by=self.owner, **fields,
+        )
+
+    def test_stale_instance_save_does_not_reuse_version_numbers(self):
+        event = self.create_event()
+        first, second = Event.objects.get(pk=event.pk), Event.objects.get(pk=event.pk)
+        second.title = 'Saved second'
+        second.save()
+        first.title = 'Saved from a stale copy'
+        first.save()
+        self.assertEqual(Event.objects.get(pk=event.pk).version_counter, 3)
+        self.assertEqual(
+            list(EventVersion.objects.filter(event=event).order_by('version_number').values_list('version_number', flat=True)),
+            [1, 2, 3],
+        )
+
+    def test_save_with_update_fields_never_writes_the_counter(self):
+        event = self.create_event()
+        stale = Event.objects.get(pk=event.pk)
+        event.title = 'Bumped'
+        event.save()
+        stale.version_counter = 0
+        stale.save(update_fields=['title', 'version_counter'])
+        self.assertEqual(Event.objects.get(pk=event.pk).version_counter, 3)
+
+    @override_settings(EVENT_VERSION_KEYFRAME_INTERVAL=3)
+    def test_replay_across_keyframes(self):
+        event = self.create_event(location='Room 1')
+        expected = {1: EventVersion.objects.get(event=event).data}
+        for index in range(2, 11):
+            event.title = f'Title {index}'
+            if index % 4 == 0:
+                event.location = f'Room {index}'
+            event.save()
+            expected[index] = EventVersion.snapshot_of(event, event.updated_at)
+
+        versions = list(EventVersion.objects.filter(event=event).order_by('version_number'))
+        self.assertEqual([v.version_number for v in versions if v.is_keyframe], [1, 4, 7, 10])
+        self.assertTrue(all(set(v.data) <= {'title', 'location', 'updated_at'} for v in versions if not v.is_keyframe))
+        EventVersion.attach_snapshots(versions)
+        self.assertEqual({v.version_number: v.snapshot for v in versions}, expected)
+        for number in range(1, 11):
+            _, snapshot = list(EventVersion.replay(EventVersion.chain(event.pk, number, number)))[-1]
+            self.assertEqual(snapshot, expected[number])
+
+    @override_settings(EVENT_VERSION_KEYFRAME_INTERVAL=3)
+    def test_chain_starts_at_the_nearest_keyframe(self):
+        event = self.create_event()
+        for index in range(8):
+            event.title = f'Title {index}'
+            event.save()
+        numbers = list(EventVersion.chain(event.pk, 6, 8).values_list('version_number', flat=True))
+        self.assertEqual(numbers, [4, 5, 6, 7, 8])
+
+    def test_chain_without_a_keyframe_falls_back_to_the_first_version(self):
+        event = self.create_event()
+        for index in range(3):
+            event.title = f'Title {index}'
+            event.save()
+        EventVersion.objects.filter(event=event).update(is_keyframe=False)
+        numbers = list(EventVersion.chain(event.pk, 3, 4).values_list('version_number', flat=True))
+        self.assertEqual(numbers, [1, 2, 3, 4])
+
+
+class OptimisticConcurrencyTests(TestCase):
+    """Updates and rollbacks guarded by If-Match or a `version` field."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            title='One', description='d', start_time=START, end_time=START + timedelta(hours=1), created_by=self.owner,
+        )
+        EventPermission.objects.create(user=self.owner, event=self.event, role='OWNER')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f'/api/events/{self.event.pk}'
+
+    def body(self, **fields):
+        data = {'title': 'One', 'description': 'd', 'start_time': START.isoformat(), 'end_time': (START + timedelta(hours=1)).isoformat()}
+        return {**data, **fields}
+
+    def put(self, data, **headers):
+        return self.client.put(self.url, data, format='json', **headers)
+
+    def test_detail_etag_is_the_version(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], '"v1"')
+        self.assertEqual(response.json()['version'], 1)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"v1"').status_code, 304)
+
+    def test_matching_if_match_saves_and_returns_the_new_etag(self):
+        response = self.put(self.body(title='Two'), HTTP_IF_MATCH='"v1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"v2"')
+        self.assertEqual(response.json()['version'], 2)
+
+    def test_weak_if_match_from_compressed_responses_is_accepted(self):
+        self.assertEqual(self.put(self.body(title='Two'), HTTP_IF_MATCH='W/"v1"').status_code, 200)
+
+    def test_stale_if_match_is_rejected_with_the_changes(self):
+        self.assertEqual(self.put(self.body(title='Two'), HTTP_IF_MATCH='"v1"').status_code, 200)
+        # A second client that also read version 1 loses the race
+        response = self.put(self.body(title='Three', location='Elsewhere'), HTTP_IF_MATCH='"v1"')
+        self.assertEqual(response.status_code, 412)
+        body = response.json()
+        self.assertEqual(body['current_version'], 2)
+        self.assertEqual(body['detail'], 'The event has changed since version 1.')
+        self.assertEqual(body['changes']['title'], {'old': 'One', 'new': 'Two'})
+        self.assertNotIn('location', body['changes'])
+        event = Event.objects.get(pk=self.event.pk)
+        self.assertEqual((event.title, event.version_counter), ('Two', 2))
+        self.assertEqual(EventVersion.objects.filter(event=self.event).count(), 2)
+
+    def test_unknown_tag_is_rejected_without_changes(self):
+        response = self.put(self.body(title='Two'), HTTP_IF_MATCH='"0123abcd"')
+        self.assertEqual(response.status_code, 412)
+        self.assertIsNone(response.json()['changes'])
+
+    def test_version_field_in_the_body(self):
+        self.assertEqual(self.put(self.body(title='Two', version=0)).status_code, 412)
+        self.assertEqual(self.put(self.body(title='Two', version=1)).status_code, 200)
+        self.assertEqual(self.put(self.body(title='Three', version='x')).status_code, 400)
+
+    def test_star_and_missing_header_bypass_the_check(self):
+        self.assertEqual(self.put(self.body(title='Two'), HTTP_IF_MATCH='*').status_code, 200)
+        self.assertEqual(self.put(self.body(title='Three')).status_code, 200)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).version_counter, 3)
+
+    @override_settings(EVENT_REQUIRE_IF_MATCH=True)
+    def test_required_header(self):
+        self.assertEqual(self.put(self.body(title='Two')).status_code, 428)
+        self.assertEqual(self.put(self.body(title='Two'), HTTP_IF_MATCH='"v1"').status_code, 200)
+
+    def test_patch_without_times(self):
+        response = self.client.patch(self.url, {'title': 'Patched'}, format='json', HTTP_IF_MATCH='"v1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).title, 'Patched')
+
+    def test_unguarded_writes_from_stale_reads_do_not_collide(self):
+        # Both requests resolved the same row before either saved
+        for title in ['Two', 'Three']:
+            self.assertEqual(self.client.patch(self.url, {'title': title}, format='json').status_code, 200)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).version_counter, 3)
+
+    def test_rollback_is_guarded(self):
+        first = EventVersion.objects.get(event=self.event, version_number=1)
+        self.event.title = 'Two'
+        self.event.save()
+        url = f'/api/api/events/{self.event.pk}/rollback/{first.pk}/'
+        self.assertEqual(self.client.post(url, HTTP_IF_MATCH='"v1"').status_code, 412)
+        response = self.client.post(url, HTTP_IF_MATCH='"v2"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"v3"')
+        self.assertEqual(Event.objects.get(pk=self.event.pk).title, 'One')
+
+
+@override_settings(EVENT_METRICS_ENABLED=True)
+class QueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Every budgeted endpoint stays within EVENT_QUERY_BUDGETS however many rows it returns."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.others = [User.objects.create_user(f'user{n}', f'user{n}@example.com', 'pw') for n in range(3)]
+        cls.events = []
+        for n in range(5):
+            start = START + timedelta(days=n)
+            event = Event.objects.create(
+                title=f'Planning {n}', description='Quarterly planning', location='Room A',
+                start_time=start, end_time=start + timedelta(hours=1), created_by=cls.owner,
+                is_recurring=n % 2 == 0, recurrence='WEEKLY' if n % 2 == 0 else 'NONE',
+            )
+            EventPermission.objects.create(user=cls.owner, event=event, role='OWNER')
+            for user in cls.others:
+                EventPermission.objects.create(user=user, event=event, role='VIEWER')
+            for revision in range(2):
+                event.description = f'Quarterly planning, revision {revision}'
+                event.save()
+            cls.events.append(event)
+
+    def setUp(self):
+        self.client.force_authenticate(self.owner)
+        request_metrics.reset()
+
+    def get(self, name, params=None, **kwargs):
+        response = self.client.get(reverse(name, kwargs=kwargs), params or {})
+        self.assertEqual(response.status_code, 200, response.content[:300])
+        self.assertWithinQueryBudget(response)
+        return response
+
+    def test_budgeted_endpoints(self):
+        event = self.events[0]
+        first, last = EventVersion.objects.filter(event=event).order_by('version_number').values_list('pk', flat=True)[::2]
+        window = {'from': START.isoformat(), 'to': (START + timedelta(days=10)).isoformat()}
+        self.assertEqual(len(self.get('event-list-create').json()['results']), 5)
+        # The first window request materializes occurrences, later ones only read them
+        now = django_timezone.now()
+        upcoming = {'from': now.isoformat(), 'to': (now + timedelta(days=10)).isoformat()}
+        self.assertEqual(self.get('event-list-create', upcoming).budget_variant, 'window-refresh')
+        response = self.get('event-list-create', upcoming)
+        self.assertEqual(response.budget_variant, 'window')
+        self.assertTrue(response.json()['results'])
+        # Windows before the lookback are expanded without touching the table
+        self.assertEqual(self.get('event-list-create', window).budget_variant, 'window')
+        self.get('event-detail', pk=event.pk)
+        self.get('event-freebusy', {'users': ','.join(str(user.pk) for user in [self.owner, *self.others]), **window})
+        self.get('event-sync')
+        self.get('event-search', {'q': 'planning'})
+        self.get('event-rollups', {'from': START.date().isoformat(), 'to': (START + timedelta(days=10)).date().isoformat()})
+        self.assertEqual(len(self.get('list-permissions', pk=event.pk).json()), 4)
+        self.assertEqual(len(self.get('event-version-list', id=event.pk).json()['results']), 3)
+        self.get('event-version-detail', id=event.pk, version_id=last)
+        self.get('event-diff', id=event.pk, version_id1=first, version_id2=last)
+
+    def test_every_budget_is_exercised(self):
+        # A budget added to settings without a test above would go unchecked
+        budgets = {key.split()[-1] for key in settings.EVENT_QUERY_BUDGETS}
+        tested = {'event-list-create', 'event-list-create:window', 'event-list-create:window-refresh', 'event-detail',
+                  'event-freebusy', 'event-sync', 'event-search', 'event-rollups', 'list-permissions', 'event-version-list',
+                  'event-version-detail', 'event-diff'}
+        self.assertEqual(budgets, tested)
+
+    def test_budget_is_flagged_when_exceeded(self):
+        with self.settings(EVENT_QUERY_BUDGETS={'GET event-detail': 0}), self.assertLogs('core.middleware', 'WARNING'):
+            response = self.client.get(reverse('event-detail', kwargs={'pk': self.events[0].pk}))
+        self.assertEqual(response['X-Query-Budget'], '0')
+        self.assertEqual(response['X-Query-Budget-Exceeded'], '1')
+
+    def test_metric_headers(self):
+        response = self.client.get(reverse('event-detail', kwargs={'pk': self.events[0].pk}))
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertEqual(response['X-Query-Budget'], '2')
+        self.assertNotIn('X-Query-Budget-Exceeded', response)
+        for header in ['X-DB-Time-ms', 'X-Response-Time-ms']:
+            self.assertGreaterEqual(float(response[header]), 0)
+
+    def test_assert_max_queries(self):
+        with self.assertMaxQueries(1):
+            list(Event.objects.filter(created_by=self.owner))
+        with self.assertRaises(AssertionError):
+            with self.assertMaxQueries(1):
+                list(Event.objects.all())
+                list(EventVersion.objects.all())
+
+    def test_prometheus_output(self):
+        for _ in range(2):
+            self.client.get(reverse('event-detail', kwargs={'pk': self.events[0].pk}))
+        response = self.client.get(reverse('metrics'))
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE event_http_requests_total counter', body)
+        self.assertIn('event_http_requests_total{view="event-detail",method="GET"} 2', body)
+        self.assertIn('event_http_errors_total{view="event-detail",method="GET"} 0', body)
+        self.assertIn('event_http_request_duration_seconds_bucket{view="event-detail",method="GET",le="+Inf"} 2', body)
+        self.assertIn('event_http_request_duration_seconds_count{view="event-detail",method="GET"} 2', body)
+        self.assertRegex(body, r'event_db_queries_total\{view="event-detail",method="GET"\} [1-9]')
+
+    @override_settings(EVENT_METRICS_ENABLED=False)
+    def test_metrics_disabled(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+class FindConflictsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.other = User.objects.create_user('other', 'other@example.com', 'pw')
+        cls.meeting = Event.objects.create(
+            title='Meeting', description='d', start_time=START, end_time=START + timedelta(hours=1), created_by=cls.owner,
+        )
+        cls.standup = Event.objects.create(
+            title='Standup', description='d', start_time=START - timedelta(days=30, hours=2),
+            end_time=START - timedelta(days=30, hours=1, minutes=45), created_by=cls.owner,
+            is_recurring=True, recurrence='DAILY',
+        )
+
+    def hours(self, start, end):
+        return START + timedelta(hours=start), START + timedelta(hours=end)
+
+    def test_touching_intervals_do_not_conflict(self):
+        self.assertEqual(find_conflicts(self.owner, [self.hours(1, 2), self.hours(-1, 0)]), [])
+
+    def test_overlap_with_a_stored_event(self):
+        conflicts = find_conflicts(self.owner, [self.hours(1, 2), self.hours(0.5, 0.75), self.hours(-0.5, 0.25)])
+        self.assertEqual(conflicts, [{'index': 1, 'event_id': self.meeting.pk}, {'index': 2, 'event_id': self.meeting.pk}])
+
+    def test_conflicts_within_the_batch(self):
+        conflicts = find_conflicts(self.owner, [self.hours(3, 5), self.hours(4, 6), self.hours(5, 7), self.hours(8, 9)])
+        self.assertEqual(conflicts, [{'index': 0, 'other_index': 1}, {'index': 1, 'other_index': 2}])
+
+    def test_later_occurrences_of_recurring_events(self):
+        # The standup started a month ago and still runs every morning at 07:30
+        conflicts = find_conflicts(self.owner, [self.hours(-1.9, -1.8), self.hours(24 - 2, 24 - 1.5), self.hours(-1.75, -1.5)])
+        self.assertEqual(conflicts, [{'index': 0, 'event_id': self.standup.pk}, {'index': 1, 'event_id': self.standup.pk}])
+
+    def test_a_pair_is_reported_once(self):
+        # Spans three standups but is one conflict
+        conflicts = find_conflicts(self.owner, [(START - timedelta(days=3), START - timedelta(hours=3))])
+        self.assertEqual(conflicts, [{'index': 0, 'event_id': self.standup.pk}])
+
+    def test_recurring_candidates(self):
+        # Tomorrow's 10:00 meeting sits in the slot of every later occurrence of a 10:00 series
+        series = (START + timedelta(hours=1), START + timedelta(hours=1.5), 'DAILY')
+        tomorrow = START + timedelta(days=1, hours=1.25)
+        self.assertEqual(find_conflicts(self.other, [series, (tomorrow, tomorrow + timedelta(minutes=30))]), [{'index': 0, 'other_index': 1}])
+        self.assertEqual(find_conflicts(self.owner, [(START - timedelta(days=1), START - timedelta(hours=23), 'DAILY')]), [{'index': 0, 'event_id': self.meeting.pk}])
+        # A series whose occurrences overlap each other does not clash with itself
+        self.assertEqual(find_conflicts(self.other, [(START, START + timedelta(hours=25), 'DAILY')]), [])
+
+    def test_conflicts_do_not_depend_on_creation_order(self):
+        client = APIClient()
+        client.force_authenticate(self.other)
+        base = django_timezone.now().replace(microsecond=0) + timedelta(days=1)
+        series = {'title': 'Series', 'start_time': base, 'end_time': base + timedelta(hours=1), 'is_recurring': True, 'recurrence': 'DAILY'}
+        one_off = {'title': 'One-off', 'start_time': base + timedelta(days=1), 'end_time': base + timedelta(days=1, hours=1)}
+        for first, second in [(one_off, series), (series, one_off)]:
+            Event.objects.filter(created_by=self.other).delete()
+            self.assertEqual(client.post('/api/events/', first, format='json').status_code, 201)
+            self.assertEqual(client.post('/api/events/', second, format='json').status_code, 400)
+            self.assertEqual(EventBatchImporter(self.other).run([second]).response()[1], 400)
+        # Moving a stored series onto a slot it used to skip is caught too
+        event = Event.objects.get(created_by=self.other, title='Series')
+        Event.objects.create(title='Later', start_time=base + timedelta(days=1, hours=3), end_time=base + timedelta(days=1, hours=4), created_by=self.other)
+        response = client.patch(f'/api/events/{event.pk}', {'start_time': base + timedelta(hours=3), 'end_time': base + timedelta(hours=4)}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_excluded_events_and_other_users(self):
+        self.assertEqual(find_conflicts(self.owner, [self.hours(0, 1)], exclude_event_ids=[self.meeting.pk]), [])
+        self.assertEqual(find_conflicts(self.other, [self.hours(0, 1)]), [])
+        self.assertEqual(find_conflicts(self.owner, []), [])
+
+
+class OccurrenceTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def series(self, start, recurrence, hours=1):
+        return Event.objects.create(
+            title=recurrence.title(), description='d', start_time=start, end_time=start + timedelta(hours=hours),
+            created_by=self.owner, is_recurring=True, recurrence=recurrence,
+        )
+
+    def starts(self, event, window_start, window_end):
+        return [start for start, _ in event_occurrences(event, window_start, window_end)]
+
+    def test_monthly_series_clamp_to_the_end_of_the_month(self):
+        event = self.series(datetime(2026, 1, 31, 12, tzinfo=timezone.utc), 'MONTHLY')
+        starts = self.starts(event, datetime(2026, 1, 1, tzinfo=timezone.utc), datetime(2026, 6, 1, tzinfo=timezone.utc))
+        self.assertEqual([start.date().isoformat() for start in starts], ['2026-01-31', '2026-02-28', '2026-03-31', '2026-04-30', '2026-05-31'])
+        # Counted from the first occurrence, so February does not pull later months back
+        leap = self.starts(event, datetime(2028, 2, 1, tzinfo=timezone.utc), datetime(2028, 4, 1, tzinfo=timezone.utc))
+        self.assertEqual([start.day for start in leap], [29, 31])
+
+    def test_steps(self):
+        start = datetime(2026, 1, 5, 9, tzinfo=timezone.utc)
+        window = (start, start + timedelta(days=365))
+        self.assertEqual(len(self.starts(self.series(start, 'DAILY'), start, start + timedelta(days=10))), 10)
+        self.assertEqual(len(self.starts(self.series(start, 'WEEKLY'), *window)), 53)
+        biweekly = self.starts(self.series(start, 'BI-WEEKLY'), *window)
+        self.assertEqual({b - a for a, b in zip(biweekly, biweekly[1:])}, {timedelta(days=14)})
+        self.assertEqual([start.month for start in self.starts(self.series(start, 'QUARTERLY'), *window)], [1, 4, 7, 10])
+        self.assertEqual([start.month for start in self.starts(self.series(start, 'SEMI-ANNUALLY'), *window)], [1, 7])
+        self.assertEqual(len(self.starts(self.series(start, 'ANNUALLY'), *window)), 1)
+
+    def test_window_edges(self):
+        event = self.series(datetime(2026, 1, 5, 9, tzinfo=timezone.utc), 'DAILY', hours=2)
+        # An occurrence ending exactly at the window start is outside it, one still running is inside
+        self.assertEqual(self.starts(event, datetime(2026, 1, 6, 11, tzinfo=timezone.utc), datetime(2026, 1, 7, 9, tzinfo=timezone.utc)), [])
+        self.assertEqual(
+            self.starts(event, datetime(2026, 1, 6, 10, tzinfo=timezone.utc), datetime(2026, 1, 7, 9, 1, tzinfo=timezone.utc)),
+            [datetime(2026, 1, 6, 9, tzinfo=timezone.utc), datetime(2026, 1, 7, 9, tzinfo=timezone.utc)],
+        )
+
+    def test_saving_the_series_replaces_its_occurrences(self):
+        now = django_timezone.now().replace(microsecond=0)
+        event = self.series(now + timedelta(days=1), 'WEEKLY')
+        window = (now, now + timedelta(days=29))
+        self.assertEqual(len(occurrences_in_range(self.owner, *window)), 4)
+        event.start_time += timedelta(hours=3)
+        event.end_time += timedelta(hours=3)
+        event.save()
+        self.assertFalse(EventOccurrence.objects.filter(event=event).exists())
+        starts = [occurrence.start_time for occurrence in occurrences_in_range(self.owner, *window)]
+        self.assertEqual(starts[0], now + timedelta(days=1, hours=3))
+        event.recurrence = 'DAILY'
+        event.save()
+        self.assertEqual(len(occurrences_in_range(self.owner, *window)), 28)
+
+    @override_settings(EVENT_OCCURRENCE_LOOKBACK_DAYS=10, EVENT_OCCURRENCE_HORIZON_DAYS=20)
+    def test_old_series_are_materialized_from_the_lookback_only(self):
+        now = django_timezone.now()
+        event = self.series(now - timedelta(days=3 * 365), 'DAILY')
+        occurrences_in_range(self.owner, now, now + timedelta(days=1))
+        self.assertLessEqual(EventOccurrence.objects.filter(event=event).count(), 31)
+        self.assertGreaterEqual(EventOccurrence.objects.filter(event=event).earliest('start_time').start_time, now - timedelta(days=11))
+        # Windows before the lookback are expanded without touching the table
+        past = occurrences_in_range(self.owner, now - timedelta(days=400), now - timedelta(days=397))
+        self.assertIsInstance(past, list)
+        self.assertEqual(len(past), 3)
+        self.assertLessEqual(EventOccurrence.objects.filter(event=event).count(), 31)
+
+    @override_settings(EVENT_OCCURRENCE_HORIZON_DAYS=365)
+    def test_one_off_events_beyond_the_horizon_are_built_later(self):
+        now = django_timezone.now().replace(microsecond=0)
+        start = now + timedelta(days=400)
+        event = Event.objects.create(
+            title='Far', description='d', start_time=start, end_time=start + timedelta(hours=1), created_by=self.owner,
+        )
+        self.assertEqual(len(occurrences_in_range(self.owner, now, now + timedelta(days=1))), 0)
+        self.assertFalse(EventOccurrence.objects.filter(event=event).exists())
+        with override_settings(EVENT_OCCURRENCE_HORIZON_DAYS=500):
+            window = (start - timedelta(days=1), start + timedelta(days=1))
+            found = occurrences_in_range(self.owner, *window)
+            self.assertNotIsInstance(found, list)
+            self.assertEqual([occurrence.event_id for occurrence in found], [event.pk])
+            self.assertEqual(len(occurrences_in_range(self.owner, *window)), 1)
+        event.refresh_from_db()
+        self.assertEqual(event.occurrences_until, event.end_time)
+
+    def test_window_list_is_paginated(self):
+        now = django_timezone.now().replace(microsecond=0)
+        first = self.series(now + timedelta(days=1), 'DAILY')
+        second = self.series(now + timedelta(days=1), 'DAILY')
+        # Inside the horizon pages come from EventOccurrence, beyond it from a lazily expanded list
+        for window_end, page_size in [(now + timedelta(days=11), 3), (now + timedelta(days=400), 100)]:
+            params = {'from': now.isoformat(), 'to': window_end.isoformat(), 'page_size': page_size}
+            response = self.client.get('/api/events/', params)
+            seen = []
+            while True:
+                self.assertEqual(response.status_code, 200)
+                self.assertWithinQueryBudget(response)
+                body = response.json()
+                self.assertLessEqual(len(body['results']), page_size)
+                seen += [(row['start_time'], row['event']) for row in body['results']]
+                if not body['next']:
+                    break
+                response = self.client.get(body['next'])
+            expected = (window_end - now).days * 2 - 2
+            self.assertEqual(len(seen), expected)
+            self.assertEqual(len(set(seen)), expected)
+            self.assertEqual(seen, sorted(seen))
+            self.assertEqual({event for _, event in seen}, {first.pk, second.pk})
+
+
+@override_settings(EVENT_VERSION_KEYFRAME_INTERVAL=3)
+class PointInTimeTests(TestCase):
+    """EventVersion.as_of and the bulk rollback built on it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'pw')
+
+    def setUp(self):
+        # Version n of every event is dated T0 + n hours
+        self.t0 = datetime(2026, 2, 1, tzinfo=timezone.utc)
+        self.events = [self.create_event(f'Event {n}', saves=5) for n in range(3)]
+        self.late = self.create_event('Late', saves=0)
+        EventVersion.objects.filter(event=self.late).update(created_at=self.t0 + timedelta(days=30))
+        self.shared = Event.objects.create(
+            title='Shared', description='d', start_time=START, end_time=START + timedelta(hours=1), created_by=self.viewer,
+        )
+        EventPermission.objects.create(user=self.owner, event=self.shared, role='VIEWER')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def create_event(self, title, saves):
+        event = Event.objects.create(
+            title=title, description='v1', start_time=START, end_time=START + timedelta(hours=1), created_by=self.owner,
+        )
+        EventPermission.objects.create(user=self.owner, event=event, role='OWNER')
+        for number in range(2, saves + 2):
+            event.description = f'v{number}'
+            event.end_time += timedelta(hours=1)
+            event.save()
+        for version in EventVersion.objects.filter(event=event):
+            EventVersion.objects.filter(pk=version.pk).update(created_at=self.t0 + timedelta(hours=version.version_number))
+        return event
+
+    def test_as_of_picks_the_latest_version_at_or_before(self):
+        ids = [event.pk for event in self.events] + [self.late.pk]
+        states = EventVersion.as_of(ids, self.t0 + timedelta(hours=5, minutes=30))
+        self.assertEqual(set(states), {event.pk for event in self.events})
+        for event in self.events:
+            version, snapshot = states[event.pk]
+            self.assertEqual(version.version_number, 5)
+            self.assertFalse(version.is_keyframe)
+            self.assertEqual(snapshot['description'], 'v5')
+            self.assertEqual(snapshot, EventVersion.objects.get(event=event, version_number=5).snapshot)
+        # Exactly at a version's timestamp counts, and a keyframe is its own state
+        states = EventVersion.as_of(ids, self.t0 + timedelta(hours=4))
+        self.assertEqual(states[self.events[0].pk][1]['description'], 'v4')
+        self.assertEqual(EventVersion.as_of(ids, self.t0), {})
+
+    def test_as_of_endpoint_lists_visible_events_only(self):
+        response = self.client.get('/api/api/events/as-of/', {'at': (self.t0 + timedelta(hours=2)).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['event_id'] for row in response.json()], [event.pk for event in self.events])
+        self.assertEqual(response.json()[0]['data']['description'], 'v2')
+        ids = f'{self.events[1].pk},{self.viewer.pk + 1000}'
+        response = self.client.get('/api/api/events/as-of/', {'at': (self.t0 + timedelta(hours=2)).isoformat(), 'ids': ids})
+        self.assertEqual([row['event_id'] for row in response.json()], [self.events[1].pk])
+        self.assertEqual(self.client.get('/api/api/events/as-of/', {'at': self.t0.isoformat(), 'ids': 'x'}).status_code, 400)
+
+    def test_bulk_rollback(self):
+        when = self.t0 + timedelta(hours=3)
+        response = self.client.post('/api/api/events/rollback/', {'as_of': when.isoformat()}, format='json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['rolled_back'], [{'event_id': event.pk, 'version_number': 3} for event in self.events])
+        self.assertEqual(body['skipped'], [self.late.pk])
+
+        for event in self.events:
+            event.refresh_from_db()
+            self.assertEqual((event.description, event.end_time), ('v3', START + timedelta(hours=3)))
+            # The rollback is itself a new version, so it can be undone
+            self.assertEqual(event.version_counter, 7)
+            latest = EventVersion.objects.get(event=event, version_number=7)
+            self.assertEqual(latest.snapshot['description'], 'v3')
+        # Events the user may only view are untouched
+        self.shared.refresh_from_db()
+        self.assertEqual(self.shared.version_counter, 1)
+        # Side tables follow the restored state
+        self.assertEqual(UserEventStats.objects.get(user=self.owner).busy_minutes, 3 * 3 * 60 + 60)
+
+    def test_bulk_rollback_of_a_subset(self):
+        payload = {'as_of': (self.t0 + timedelta(hours=1)).isoformat(), 'event_ids': [self.events[0].pk, self.shared.pk]}
+        body = self.client.post('/api/api/events/rollback/', payload, format='json').json()
+        self.assertEqual(body['rolled_back'], [{'event_id': self.events[0].pk, 'version_number': 1}])
+        self.assertEqual(Event.objects.get(pk=self.events[0].pk).description, 'v1')
+        self.assertEqual(Event.objects.get(pk=self.events[1].pk).description, 'v6')
+
+
+class BatchImportTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+
+    def item(self, hour, hours=1, **fields):
+        start = START + timedelta(hours=hour)
+        return {'title': f'At {hour}', 'description': 'd', 'start_time': start, 'end_time': start + timedelta(hours=hours), **fields}
+
+    def items(self):
+        # Chunks of three: [0 1 2] [3 4 5] [6]; 4 is invalid, 2 overlaps 1, 5 overlaps 0 from the first chunk
+        return [
+            self.item(0), self.item(2), self.item(2.5), self.item(4), self.item(6, title=''), self.item(0.5), self.item(8),
+        ]
+
+    def test_all_or_nothing(self):
+        importer = EventBatchImporter(self.owner, chunk_size=3).run(self.items())
+        payload, status_code = importer.response()
+        self.assertEqual(status_code, 400)
+        self.assertEqual(payload['conflicts'], [{'index': 1, 'other_index': 2}])
+        self.assertEqual(importer.created, 0)
+        self.assertFalse(Event.objects.exists())
+        self.assertFalse(EventVersion.objects.exists())
+
+        # Stops at the first failing chunk, so later chunks are never written
+        items = self.items()
+        items[2] = self.item(3)
+        payload, status_code = EventBatchImporter(self.owner, chunk_size=3).run(items).response()
+        self.assertEqual([error['index'] for error in payload['errors']], [4])
+        self.assertFalse(Event.objects.exists())
+
+    def test_all_or_nothing_success(self):
+        items = [self.item(hour) for hour in range(0, 14, 2)]
+        payload, status_code = EventBatchImporter(self.owner, chunk_size=3).run(items).response()
+        self.assertEqual((status_code, payload['created']), (201, 7))
+        self.assertEqual(EventPermission.objects.filter(user=self.owner, role='OWNER').count(), 7)
+        self.assertEqual(EventVersion.objects.filter(version_number=1, is_keyframe=True).count(), 7)
+        self.assertEqual(UserEventStats.objects.get(user=self.owner).event_count, 7)
+
+    def test_partial(self):
+        payload, status_code = EventBatchImporter(self.owner, partial=True, chunk_size=3).run(self.items()).response()
+        self.assertEqual(status_code, 200)
+        self.assertEqual((payload['created'], payload['failed']), (4, 3))
+        statuses = [(result['index'], result['status']) for result in payload['results']]
+        self.assertEqual(statuses, [(0, 'created'), (1, 'created'), (2, 'conflict'), (3, 'created'), (4, 'invalid'), (5, 'conflict'), (6, 'created')])
+        self.assertIn('title', payload['results'][4]['errors'])
+        ids = [result['id'] for result in payload['results'] if result['status'] == 'created']
+        self.assertEqual(sorted(Event.objects.values_list('pk', flat=True)), sorted(ids))
+        self.assertEqual(Event.objects.get(pk=ids[0]).title, 'At 0')
+
+    def test_partial_without_created_results(self):
+        importer = EventBatchImporter(self.owner, partial=True, chunk_size=3, report_created=False).run(self.items())
+        payload, _ = importer.response()
+        self.assertEqual((payload['created'], payload['failed']), (4, 3))
+        self.assertEqual([result['index'] for result in payload['results']], [2, 4, 5])
+
+    def test_queries_do_not_grow_with_the_chunk(self):
+        def run(count, offset):
+            items = [self.item(offset + hour * 2) for hour in range(count)]
+            with self.assertMaxQueries(20) as context:
+                EventBatchImporter(self.owner, chunk_size=count).run(items)
+            return len(context)
+        self.assertEqual(run(2, 0), run(50, 1000))
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        items = [{**item, 'start_time': item['start_time'].isoformat(), 'end_time': item['end_time'].isoformat()} for item in self.items()]
+        self.assertEqual(client.post('/api/events/batch', items, format='json').status_code, 400)
+        response = client.post('/api/events/batch?partial=1', items, format='json')
+        self.assertEqual((response.status_code, response.json()['created']), (200, 4))
+        self.assertEqual(client.post('/api/events/batch', {'title': 'x'}, format='json').status_code, 400)
+
+
+class FreeBusyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.guest = User.objects.create_user('guest', 'guest@example.com', 'pw')
+        cls.host = User.objects.create_user('host', 'host@example.com', 'pw')
+        cls.stranger = User.objects.create_user('stranger', 'stranger@example.com', 'pw')
+        cls.mine = Event.objects.create(
+            title='Mine', description='d', start_time=START, end_time=START + timedelta(hours=1), created_by=cls.owner,
+        )
+        EventPermission.objects.create(user=cls.owner, event=cls.mine, role='OWNER')
+        EventPermission.objects.create(user=cls.guest, event=cls.mine, role='VIEWER')
+        # Shared the other way: host created an event and invited owner
+        cls.theirs = Event.objects.create(
+            title='Theirs', description='d', start_time=START + timedelta(hours=2), end_time=START + timedelta(hours=3),
+            created_by=cls.host,
+        )
+        EventPermission.objects.create(user=cls.owner, event=cls.theirs, role='EDITOR')
+        Event.objects.create(
+            title='Private', description='d', start_time=START + timedelta(hours=4), end_time=START + timedelta(hours=5),
+            created_by=cls.stranger,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def params(self, *users):
+        return {
+            'users': ','.join(str(user if isinstance(user, int) else user.pk) for user in users),
+            'from': START.isoformat(), 'to': (START + timedelta(hours=8)).isoformat(),
+        }
+
+    def test_self_and_users_sharing_an_event(self):
+        response = self.client.get('/api/events/freebusy/', self.params(self.owner, self.guest, self.host))
+        self.assertEqual(response.status_code, 200)
+        busy = response.json()['busy']
+        self.assertEqual(len(busy[str(self.owner.pk)]), 1)
+        self.assertEqual(busy[str(self.guest.pk)], [])
+        self.assertEqual(len(busy[str(self.host.pk)]), 1)
+        self.assertEqual(len(response.json()['free']), 2)
+
+    def test_a_user_without_events_can_query_themself(self):
+        self.client.force_authenticate(User.objects.create_user('new', 'new@example.com', 'pw'))
+        self.assertEqual(self.client.get('/api/events/freebusy/', self.params(User.objects.get(username='new'))).status_code, 200)
+
+    def test_unrelated_and_unknown_users_are_refused_alike(self):
+        for users in [(self.owner, self.stranger), (self.owner, self.stranger.pk + 1000)]:
+            response = self.client.get('/api/events/freebusy/', self.params(*users))
+            self.assertEqual(response.status_code, 403)
+            self.assertTrue(response.json()['detail'].endswith(str(users[1] if isinstance(users[1], int) else users[1].pk)))
+            self.assertNotIn('busy', response.json())
+        # The stranger cannot look the other way either
+        self.client.force_authenticate(self.stranger)
+        self.assertEqual(self.client.get('/api/events/freebusy/', self.params(self.owner)).status_code, 403)
+
+    def test_async_endpoint_is_restricted_too(self):
+        token = RefreshToken.for_user(self.stranger).access_token
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(client.get('/api/async/events/freebusy/', self.params(self.owner)).status_code, 403)
+        token = RefreshToken.for_user(self.owner).access_token
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(client.get('/api/async/events/freebusy/', self.params(self.host)).status_code, 200)
+
+
+class SyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'pw')
+
+    def setUp(self):
+        self.events = []
+        for n in range(3):
+            event = Event.objects.create(
+                title=f'Event {n}', description='d', start_time=START + timedelta(days=n),
+                end_time=START + timedelta(days=n, hours=1), created_by=self.owner,
+            )
+            EventPermission.objects.create(user=self.owner, event=event, role='OWNER')
+            EventPermission.objects.create(user=self.viewer, event=event, role='VIEWER')
+            self.events.append(event)
+        self.client = APIClient()
+
+    def sync(self, user, token=None):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/events/sync/', {'sync_token': token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def age(self, days):
+        # Move every sync row back in time, as if the token were cut `days` ago
+        moment = django_timezone.now() - timedelta(days=days)
+        Event.objects.update(updated_at=moment)
+        EventPermission.objects.update(updated_at=moment)
+        SyncTombstone.objects.update(created_at=moment)
+        PermissionTombstone.objects.update(created_at=moment)
+        return encode_sync_token(moment + timedelta(seconds=10))
+
+    def test_full_then_incremental(self):
+        full = self.sync(self.viewer)
+        self.assertTrue(full['reset'])
+        self.assertEqual([event['id'] for event in full['events']], [event.pk for event in self.events])
+        self.assertEqual({(row['user_id'], row['role']) for row in full['permissions']}, {(self.owner.pk, 'OWNER')})
+        self.assertEqual(full['deleted'], [])
+
+        token = self.age(1)
+        self.assertEqual(self.sync(self.viewer, token)['events'], [])
+        self.events[1].title = 'Renamed'
+        self.events[1].save()
+        changes = self.sync(self.viewer, token)
+        self.assertFalse(changes['reset'])
+        self.assertEqual([(event['id'], event['title']) for event in changes['events']], [(self.events[1].pk, 'Renamed')])
+        self.assertEqual(changes['permissions'], [])
+        self.assertEqual(changes['removed_permissions'], [])
+
+    def test_other_viewers_see_revocations(self):
+        third = User.objects.create_user('third', 'third@example.com', 'pw')
+        for event in self.events[:2]:
+            EventPermission.objects.create(user=third, event=event, role='EDITOR')
+        token = self.age(1)
+        self.client.force_authenticate(self.owner)
+        EventPermission.objects.get(user=third, event=self.events[0]).delete()
+        response = self.client.post('/api/events/share/bulk/revoke/', {'user_ids': [third.pk], 'event_ids': [self.events[1].pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        expected = [{'event_id': event.pk, 'user_id': third.pk} for event in self.events[:2]]
+        for user in (self.viewer, self.owner):
+            changes = self.sync(user, token)
+            self.assertEqual(changes['removed_permissions'], expected)
+            self.assertEqual(changes['permissions'], [])
+            self.assertEqual(changes['deleted'], [])
+        # The revoked user gets the events themselves as deleted instead
+        third_changes = self.sync(third, token)
+        self.assertEqual(third_changes['deleted'], [event.pk for event in self.events[:2]])
+        self.assertEqual(third_changes['removed_permissions'], [])
+
+        # Granting the role again cancels the removal
+        EventPermission.objects.create(user=third, event=self.events[0], role='VIEWER')
+        changes = self.sync(self.viewer, token)
+        self.assertEqual(changes['removed_permissions'], expected[1:])
+        self.assertEqual([(row['event_id'], row['role']) for row in changes['permissions']], [(self.events[0].pk, 'VIEWER')])
+        self.assertEqual(self.sync(self.viewer, self.age(0))['removed_permissions'], [])
+        # Full syncs list current roles only
+        self.assertNotIn('removed_permissions', [key for key, value in self.sync(self.viewer).items() if value])
+
+    def test_delete_and_revoke_leave_tombstones(self):
+        token = self.age(1)
+        deleted_id = self.events[0].pk
+        self.events[0].delete()
+        EventPermission.objects.get(user=self.viewer, event=self.events[2]).delete()
+
+        changes = self.sync(self.viewer, token)
+        self.assertEqual(changes['deleted'], sorted([deleted_id, self.events[2].pk]))
+        self.assertEqual(changes['events'], [])
+        reasons = dict(SyncTombstone.objects.filter(user=self.viewer).values_list('event_id', 'reason'))
+        self.assertEqual(reasons, {deleted_id: 'DELETED', self.events[2].pk: 'REVOKED'})
+        # The owner's clients drop the deleted event too, but still see the revoked one
+        self.assertEqual(self.sync(self.owner, token)['deleted'], [deleted_id])
+
+        # Following the new token, nothing is repeated
+        later = self.age(0)
+        self.assertEqual(self.sync(self.viewer, later)['deleted'], [])
+
+    def test_sharing_an_event_sends_it(self):
+        event = Event.objects.create(
+            title='New', description='d', start_time=START, end_time=START + timedelta(minutes=5), created_by=self.owner,
+        )
+        token = self.age(1)
+        EventPermission.objects.create(user=self.viewer, event=event, role='EDITOR')
+        changes = self.sync(self.viewer, token)
+        self.assertEqual([row['id'] for row in changes['events']], [event.pk])
+        self.assertEqual(changes['events'][0]['role'], 'EDITOR')
+
+    @override_settings(EVENT_SYNC_TOMBSTONE_DAYS=7)
+    def test_expired_tokens_reset_and_tombstones_are_pruned(self):
+        token = self.age(8)
+        self.events[0].delete()
+        SyncTombstone.objects.update(created_at=django_timezone.now() - timedelta(days=8))
+        recent_id = self.events[1].pk
+        self.events[1].delete()
+        self.assertTrue(self.sync(self.viewer, token)['reset'])
+
+        PermissionTombstone.objects.create(event=self.events[2], user_id=self.viewer.pk)
+        PermissionTombstone.objects.update(created_at=django_timezone.now() - timedelta(days=8))
+        self.assertEqual(prune_tombstones(chunk_size=1), 3)
+        self.assertFalse(PermissionTombstone.objects.exists())
+        self.assertEqual(list(SyncTombstone.objects.values_list('event_id', flat=True)), [recent_id] * 2)
+        self.assertEqual(prune_tombstones(), 0)
+
+    def test_prune_command(self):
+        self.events[0].delete()
+        SyncTombstone.objects.update(created_at=django_timezone.now() - timedelta(days=31))
+        output = StringIO()
+        call_command('prune_tombstones', stdout=output)
+        self.assertIn('Deleted 2 tombstones older than 30 days.', output.getvalue())
+        self.assertFalse(SyncTombstone.objects.exists())
+
+    def test_bad_token(self):
+        self.client.force_authenticate(self.viewer)
+        self.assertEqual(self.client.get('/api/events/sync/', {'sync_token': 'nope'}).status_code, 400)
+
+
+class AsyncViewTests(QueryBudgetMixin, TestCase):
+    """The /api/async/ endpoints answer exactly like their DRF counterparts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.stranger = User.objects.create_user('stranger', 'stranger@example.com', 'pw')
+        cls.event = Event.objects.create(
+            title='Weekly', description='d', start_time=django_timezone.now().replace(microsecond=0) + timedelta(days=1),
+            end_time=django_timezone.now().replace(microsecond=0) + timedelta(days=1, hours=1), created_by=cls.owner,
+            is_recurring=True, recurrence='WEEKLY',
+        )
+        EventPermission.objects.create(user=cls.owner, event=cls.event, role='OWNER')
+        for n in range(3):
+            cls.event.description = f'v{n + 2}'
+            cls.event.save()
+
+    def client_for(self, user):
+        return APIClient(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def assertSameAnswer(self, path, params=None, sync_path=None):
+        client = self.client_for(self.owner)
+        sync = client.get(f'/api/{sync_path or path}', params or {})
+        asynchronous = client.get(f'/api/async/{path}', params or {})
+        self.assertEqual(sync.status_code, 200)
+        self.assertEqual(asynchronous.status_code, 200)
+        if 'X-Query-Budget' in sync:
+            self.assertWithinQueryBudget(sync)
+        body = asynchronous.json()
+        if isinstance(body, dict) and body.get('next'):
+            # Same cursor, on the async route
+            self.assertEqual(body['next'].replace(f'/api/async/{path}', f'/api/{sync_path or path}'), sync.json()['next'])
+            body = {**body, 'next': sync.json()['next']}
+        self.assertEqual(body, sync.json())
+        return asynchronous.json()
+
+    def test_list(self):
+        self.assertEqual(len(self.assertSameAnswer('events/')['results']), 1)
+
+    def test_occurrence_window(self):
+        now = django_timezone.now()
+        params = {'from': now.isoformat(), 'to': (now + timedelta(days=30)).isoformat(), 'page_size': 2}
+        # The first read writes the occurrences, later ones only read them
+        response = self.client_for(self.owner).get('/api/events/', params)
+        self.assertEqual(response.budget_variant, 'window-refresh')
+        self.assertWithinQueryBudget(response)
+        body = self.assertSameAnswer('events/', params)
+        self.assertEqual([row['event'] for row in body['results']], [self.event.pk] * 2)
+        self.assertIsNotNone(body['next'])
+        response = self.client_for(self.owner).get('/api/async/events/', {'from': params['to'], 'to': params['from']})
+        self.assertEqual(response.status_code, 400)
+
+    def test_history_and_diff(self):
+        history = self.assertSameAnswer(f'events/{self.event.pk}/history/', sync_path=f'api/events/{self.event.pk}/history/')
+        self.assertEqual(len(history['results']), 4)
+        first, last = EventVersion.objects.filter(event=self.event).order_by('version_number').values_list('pk', flat=True)[::3]
+        diff = self.assertSameAnswer(f'events/{self.event.pk}/diff/{first}/{last}/')
+        self.assertIn('description', diff)
+
+    def test_permission_is_checked_before_reading(self):
+        client = self.client_for(self.stranger)
+        version = EventVersion.objects.filter(event=self.event).values_list('pk', flat=True).first()
+        self.assertEqual(client.get(f'/api/async/events/{self.event.pk}/history/').status_code, 403)
+        self.assertEqual(client.get(f'/api/async/events/{self.event.pk}/diff/{version}/{version}/').status_code, 403)
+        self.assertEqual(client.get(f'/api/async/events/{self.event.pk}').status_code, 404)
+        self.assertEqual(APIClient().get('/api/async/events/').status_code, 401)
+
+    def test_session_cookies_are_not_accepted(self):
+        client = APIClient()
+        client.force_login(self.owner)
+        for sync_path, path in [('events/', 'events/'), (f'events/{self.event.pk}', f'events/{self.event.pk}'),
+                                (f'api/events/{self.event.pk}/history/', f'events/{self.event.pk}/history/')]:
+            self.assertEqual(client.get(f'/api/{sync_path}').status_code, 401)
+            self.assertEqual(client.get(f'/api/async/{path}').status_code, 401)
+        bad_token = APIClient(HTTP_AUTHORIZATION='Bearer nope')
+        self.assertEqual(bad_token.get('/api/async/events/').status_code, 401)
+
+
+class EventIntervalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def create(self, start, end):
+        return Event.objects.create(title='E', description='d', start_time=start, end_time=end, created_by=self.owner)
+
+    def test_end_must_follow_start(self):
+        for end in [START, START - timedelta(minutes=1)]:
+            response = self.client.post('/api/events/', {
+                'title': 'E', 'description': 'd', 'start_time': START.isoformat(), 'end_time': end.isoformat(),
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['end_time'], ['Must be after start_time.'])
+        self.assertFalse(Event.objects.exists())
+
+    def test_partial_update_is_checked_against_stored_times(self):
+        event = self.create(START, START + timedelta(hours=1))
+        EventPermission.objects.create(user=self.owner, event=event, role='OWNER')
+        url = f'/api/events/{event.pk}'
+        self.assertEqual(self.client.patch(url, {'end_time': (START - timedelta(hours=1)).isoformat()}, format='json').status_code, 400)
+        self.assertEqual(self.client.patch(url, {'start_time': (START + timedelta(hours=2)).isoformat()}, format='json').status_code, 400)
+        self.assertEqual(self.client.patch(url, {'end_time': (START + timedelta(hours=2)).isoformat()}, format='json').status_code, 200)
+
+    def test_batch_items_are_checked(self):
+        items = [{'title': 'E', 'description': 'd', 'start_time': START + timedelta(hours=1), 'end_time': START}]
+        payload, status_code = EventBatchImporter(self.owner).run(items).response()
+        self.assertEqual(status_code, 400)
+        self.assertIn('end_time', payload['errors'][0]['errors'])
+
+    def test_overlap_migration_lists_offending_rows(self):
+        check = import_module('core.migrations.0008_event_no_overlap').check_existing_rows
+        editor = SimpleNamespace(connection=connection)
+        self.create(START, START + timedelta(hours=1))
+        # Touching and empty intervals are fine
+        self.create(START + timedelta(hours=1), START + timedelta(hours=2))
+        self.create(START + timedelta(minutes=30), START + timedelta(minutes=30))
+        check(editor)
+
+        overlapping = self.create(START + timedelta(minutes=90), START + timedelta(hours=3))
+        reversed_event = self.create(START + timedelta(hours=5), START + timedelta(hours=4))
+        with self.assertRaises(RuntimeError) as raised:
+            check(editor)
+        message = str(raised.exception)
+        self.assertIn(f'event {reversed_event.pk} of user {self.owner.pk} ends before it starts', message)
+        self.assertIn(f'events {overlapping.pk - 2} and {overlapping.pk} of user {self.owner.pk} overlap', message)
+        self.assertNotIn(f'events {overlapping.pk - 3} and', message)
+
+
+class BulkShareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.co_owner = User.objects.create_user('co_owner', 'co_owner@example.com', 'pw')
+        cls.users = [User.objects.create_user(f'user{n}', f'user{n}@example.com', 'pw') for n in range(3)]
+
+    def setUp(self):
+        self.events = []
+        for n in range(3):
+            event = Event.objects.create(
+                title=f'E{n}', description='d', start_time=START + timedelta(days=n),
+                end_time=START + timedelta(days=n, hours=1), created_by=self.owner,
+            )
+            EventPermission.objects.create(user=self.owner, event=event, role='OWNER')
+            EventPermission.objects.create(user=self.co_owner, event=event, role='OWNER')
+            self.events.append(event)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def share(self, users, events, role='VIEWER'):
+        return self.client.post('/api/events/share/bulk/', {
+            'user_ids': [user.pk for user in users], 'event_ids': [event.pk for event in events], 'role': role,
+        }, format='json')
+
+    def revoke(self, users, events):
+        return self.client.post('/api/events/share/bulk/revoke/', {
+            'user_ids': [user.pk for user in users], 'event_ids': [event.pk for event in events],
+        }, format='json')
+
+    def roles(self, user):
+        return dict(EventPermission.objects.filter(user=user).values_list('event_id', 'role'))
+
+    def test_share_grants_and_updates_roles(self):
+        response = self.share(self.users, self.events)
+        self.assertEqual((response.status_code, response.json()['granted']), (200, 9))
+        response = self.share(self.users[:1] + [self.owner], self.events[:1], role='EDITOR')
+        # The creator is skipped, so the batch cannot demote them
+        self.assertEqual(response.json()['granted'], 1)
+        self.assertEqual(self.roles(self.users[0])[self.events[0].pk], 'EDITOR')
+        self.assertEqual(set(self.roles(self.owner).values()), {'OWNER'})
+
+    def test_only_owners(self):
+        self.share(self.users[:1], self.events[:2], role='EDITOR')
+        self.client.force_authenticate(self.users[0])
+        for response in [self.share(self.users[1:], self.events[:2]), self.revoke([self.co_owner], self.events[:2])]:
+            self.assertEqual(response.status_code, 403)
+        self.assertFalse(EventPermission.objects.filter(user=self.users[1]).exists())
+        self.assertEqual(len(self.roles(self.co_owner)), 3)
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.revoke(self.users, [self.events[0], Event(pk=self.events[-1].pk + 100)]).status_code, 404)
+
+    @override_settings(EVENT_ROLE_CACHE_TTL=60)
+    def test_revoke_keeps_owner_rows_and_records_one_tombstone_each(self):
+        self.share(self.users, self.events)
+        role_cache.set(self.users[0].pk, self.events[0].pk, 'VIEWER')
+
+        response = self.revoke(self.users[:2] + [self.co_owner, self.owner], self.events[:2])
+        self.assertEqual((response.status_code, response.json()['revoked']), (200, 4))
+        self.assertEqual(len(self.roles(self.co_owner)), 3)
+        self.assertEqual(len(self.roles(self.owner)), 3)
+        self.assertEqual(list(self.roles(self.users[0])), [self.events[2].pk])
+        self.assertEqual(len(self.roles(self.users[2])), 3)
+        tombstones = SyncTombstone.objects.filter(reason='REVOKED').values_list('user_id', 'event_id')
+        self.assertEqual(sorted(tombstones), sorted((user.pk, event.pk) for user in self.users[:2] for event in self.events[:2]))
+        self.assertIsNone(role_cache.get(self.users[0].pk, self.events[0].pk))
+
+        # Revoking one row directly still records its own tombstone
+        EventPermission.objects.get(user=self.users[2], event=self.events[0]).delete()
+        self.assertEqual(SyncTombstone.objects.filter(reason='REVOKED').count(), 5)
+
+    @override_settings(EVENT_BULK_SHARE_MAX_PAIRS=5)
+    def test_pair_limit(self):
+        self.assertEqual(self.share(self.users, self.events[:2]).status_code, 400)
+        self.assertEqual(self.revoke(self.users, self.events[:2]).status_code, 400)
+        self.assertEqual(self.share(self.users[:2], self.events[:2]).status_code, 200)
+
+
+class ResponseEncodingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+
+    def test_orjson_output_matches_drf_for_separators(self):
+        data = {'title': 'a\u2028b\u2029c', 'emoji': '\U0001f4c5 €', 'when': START, 'n': [1, 2.5, None]}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertIn(b'\\u2028', ORJSONRenderer().render(data))
+
+    def test_auth_responses_are_not_compressed(self):
+        client = APIClient(HTTP_ACCEPT_ENCODING='gzip, br')
+        response = client.post('/api/auth/login/', {'username': 'owner', 'password': 'pw'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+        response = client.post('/api/auth/refresh/', {'refresh': response.json()['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_other_responses_are_compressed(self):
+        for n in range(5):
+            Event.objects.create(
+                title=f'Event {n}', description='x' * 100, start_time=START + timedelta(days=n),
+                end_time=START + timedelta(days=n, hours=1), created_by=self.owner,
+            )
+        client = APIClient(HTTP_ACCEPT_ENCODING='gzip')
+        client.force_authenticate(self.owner)
+        self.assertEqual(client.get('/api/events/')['Content-Encoding'], 'gzip')
+
+
+@override_settings(EVENT_VERSION_KEYFRAME_INTERVAL=3)
+class VersionCompactionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+
+    def setUp(self):
+        now = django_timezone.now()
+        old = (now - timedelta(days=400)).replace(hour=12, minute=0, second=0, microsecond=0)
+        monday = old - timedelta(days=old.weekday())
+        day = (now - timedelta(days=100)).replace(hour=10, minute=0, second=0, microsecond=0)
+        dates = [
+            # Weekly zone: two ISO weeks with two versions each
+            monday, monday + timedelta(days=1), monday + timedelta(days=7), monday + timedelta(days=9),
+            # Daily zone: two days with two versions each
+            day, day + timedelta(hours=1), day + timedelta(days=1), day + timedelta(days=1, hours=1),
+            # Recent
+            now - timedelta(days=10), now - timedelta(days=5),
+        ]
+        self.event = Event.objects.create(
+            title='T1', description='d', start_time=START, end_time=START + timedelta(hours=1), created_by=self.owner,
+        )
+        for number in range(2, len(dates) + 1):
+            self.event.title = f'T{number}'
+            if number % 4 == 0:
+                self.event.location = f'Room {number}'
+            self.event.save()
+        for number, created_at in enumerate(dates, start=1):
+            EventVersion.objects.filter(event=self.event, version_number=number).update(created_at=created_at)
+        self.snapshots = {
+            version.version_number: version.snapshot for version in EventVersion.objects.filter(event=self.event)
+        }
+
+    def compact(self, keep_last, **kwargs):
+        policy = RetentionPolicy(keep_last=keep_last, daily_after=30, weekly_after=180)
+        with self.captureOnCommitCallbacks(execute=True):
+            return VersionCompactor(policy, chunk_size=kwargs.pop('chunk_size', 1000), **kwargs).run()
+
+    def surviving(self):
+        versions = list(EventVersion.objects.filter(event=self.event).order_by('version_number'))
+        EventVersion.attach_snapshots(versions)
+        return versions
+
+    def test_checkpoints_and_keep_last(self):
+        compactor = self.compact(keep_last=3)
+        versions = self.surviving()
+        # Last of each week, last of each day, the 3 newest and everything recent
+        self.assertEqual([version.version_number for version in versions], [2, 4, 6, 8, 9, 10])
+        self.assertEqual((compactor.events, compactor.deleted), (1, 4))
+
+    def test_keep_last_protects_versions_inside_a_day(self):
+        self.compact(keep_last=4)
+        self.assertEqual([version.version_number for version in self.surviving()], [2, 4, 6, 7, 8, 9, 10])
+
+    def test_survivors_rebuild_to_the_same_snapshots(self):
+        for chunk_size in [1000, 2]:
+            self.compact(keep_last=3, chunk_size=chunk_size)
+            versions = self.surviving()
+            for version in versions:
+                self.assertEqual(version.snapshot, self.snapshots[version.version_number])
+                # Each one also rebuilds alone, through its own chain
+                fresh = EventVersion.objects.get(pk=version.pk)
+                self.assertEqual(fresh.snapshot, self.snapshots[version.version_number])
+            self.assertTrue(versions[0].is_keyframe)
+            self.assertEqual(versions[-1].snapshot['title'], Event.objects.get(pk=self.event.pk).title)
+
+        # Saving after compaction continues the history
+        self.event.title = 'T11'
+        self.event.save()
+        self.assertEqual(EventVersion.objects.get(event=self.event, version_number=11).snapshot['title'], 'T11')
+
+    def test_dry_run_and_nothing_to_do(self):
+        compactor = self.compact(keep_last=3, dry_run=True)
+        self.assertEqual(compactor.deleted, 4)
+        self.assertEqual(EventVersion.objects.filter(event=self.event).count(), 10)
+        self.assertEqual(self.compact(keep_last=10).events, 0)
+
+    def test_deleted_versions_leave_the_cache(self):
+        deleted = EventVersion.objects.get(event=self.event, version_number=1)
+        kept = EventVersion.objects.get(event=self.event, version_number=2)
+        cache = get_cache()
+        cache.set(event_version_key(self.event.pk, deleted.pk), 'stale')
+        cache.set(event_version_key(self.event.pk, kept.pk), 'stale')
+        cache.set(event_history_key(self.event.pk), 'stale')
+        self.compact(keep_last=3)
+        self.assertIsNone(cache.get(event_version_key(self.event.pk, deleted.pk)))
+        self.assertIsNone(cache.get(event_history_key(self.event.pk)))
+        # A survivor's snapshot is unchanged, so its cached payload stays valid
+        self.assertEqual(cache.get(event_version_key(self.event.pk, kept.pk)), 'stale')
+
+    def test_command(self):
+        output = StringIO()
+        call_command('compact_versions', '--keep-last', '3', stdout=output)
+        self.assertIn('Deleted 4 versions', output.getvalue())
+
+
+@override_settings(EVENT_JOB_RETRY_DELAY=30, EVENT_JOB_TIMEOUT=600)
+class JobQueueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+
+    def setUp(self):
+        self.calls = []
+        patcher = patch.dict(JOB_HANDLERS, {'flaky': self.flaky})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def flaky(self, job):
+        self.calls.append(job.attempts)
+        if len(self.calls) < job.payload.get('succeed_on', 99):
+            raise RuntimeError('boom')
+        return {'status_code': 200, 'body': {'attempt': job.attempts}}
+
+    def test_claims_never_overlap(self):
+        first = enqueue_job('flaky', self.owner, {})
+        second = enqueue_job('flaky', self.owner, {})
+        later = enqueue_job('flaky', self.owner, {})
+        Job.objects.filter(pk=later.pk).update(run_after=django_timezone.now() + timedelta(minutes=5))
+        claimed = [claim_job('a'), claim_job('b'), claim_job('c')]
+        self.assertEqual([job.pk for job in claimed[:2]], [first.pk, second.pk])
+        self.assertIsNone(claimed[2])
+        self.assertEqual((claimed[0].status, claimed[0].worker, claimed[0].attempts), ('RUNNING', 'a', 1))
+        with self.assertRaises(ValueError):
+            enqueue_job('unknown', self.owner, {})
+
+    def test_failures_back_off_then_fail(self):
+        job = enqueue_job('flaky', self.owner, {}, max_attempts=2)
+        before = django_timezone.now()
+        with self.assertLogs('core.jobs', 'ERROR'):
+            job = run_job(claim_job('a'))
+        self.assertEqual((job.status, job.attempts), ('PENDING', 1))
+        self.assertEqual(job.error, 'RuntimeError: boom')
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=30))
+        self.assertIsNone(claim_job('a'))
+
+        Job.objects.filter(pk=job.pk).update(run_after=django_timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            job = run_job(claim_job('a'))
+        self.assertEqual((job.status, job.attempts), ('FAILED', 2))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(self.calls, [1, 2])
+
+    def test_retry_after_failure(self):
+        job = enqueue_job('flaky', self.owner, {'succeed_on': 2}, max_attempts=1)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            run_job(claim_job('a'))
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.post(f'/api/jobs/{job.pk}/retry/')
+        self.assertEqual(response.status_code, 202)
+        job = run_job(claim_job('a'))
+        self.assertEqual((job.status, job.attempts, job.result), ('SUCCEEDED', 1, {'status_code': 200, 'body': {'attempt': 1}}))
+        self.assertEqual(job.error, '')
+        # Only failed jobs can be retried, and only by their owner
+        self.assertEqual(client.post(f'/api/jobs/{job.pk}/retry/').status_code, 400)
+        client.force_authenticate(User.objects.create_user('other', 'other@example.com', 'pw'))
+        self.assertEqual(client.get(f'/api/jobs/{job.pk}/').status_code, 404)
+
+    def test_stale_jobs_are_requeued(self):
+        lost = enqueue_job('flaky', self.owner, {})
+        spent = enqueue_job('flaky', self.owner, {}, max_attempts=1)
+        fresh = enqueue_job('flaky', self.owner, {})
+        for job in [lost, spent, fresh]:
+            claim_job('dead-worker')
+        long_ago = django_timezone.now() - timedelta(seconds=601)
+        Job.objects.filter(pk__in=[lost.pk, spent.pk]).update(started_at=long_ago, heartbeat_at=long_ago)
+        # Running for long is fine as long as the heartbeat keeps coming
+        Job.objects.filter(pk=fresh.pk).update(started_at=long_ago)
+
+        self.assertEqual(requeue_stale_jobs(), 2)
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {lost.pk: 'PENDING', spent.pk: 'FAILED', fresh.pk: 'RUNNING'})
+        self.assertEqual(Job.objects.get(pk=spent.pk).error, 'Timed out.')
+        job = claim_job('b')
+        self.assertEqual((job.pk, job.worker, job.attempts), (lost.pk, 'b', 2))
+
+    def test_a_requeued_job_keeps_the_new_outcome(self):
+        enqueue_job('flaky', self.owner, {'succeed_on': 1})
+        slow = claim_job('slow')
+        Job.objects.filter(pk=slow.pk).update(heartbeat_at=django_timezone.now() - timedelta(seconds=601))
+        self.assertEqual(requeue_stale_jobs(), 1)
+        Job.objects.filter(pk=slow.pk).update(payload={'succeed_on': 99})
+        retried = claim_job('fast')
+        self.assertNotEqual(retried.claim_token, slow.claim_token)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            run_job(retried)
+
+        # The first worker finishes last but no longer holds the claim
+        with self.assertLogs('core.jobs', 'WARNING') as logs:
+            job = run_job(slow)
+        self.assertIn('outcome is discarded', logs.output[0])
+        self.assertEqual((job.status, job.attempts, job.error, job.result), ('PENDING', 2, 'RuntimeError: boom', None))
+
+    def test_api_shows_the_message_not_the_traceback(self):
+        job = enqueue_job('flaky', self.owner, {}, max_attempts=1)
+        with self.assertLogs('core.jobs', 'ERROR') as logs:
+            run_job(claim_job('a'))
+        self.assertIn('Traceback', logs.output[0])
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        self.assertEqual(client.get(f'/api/jobs/{job.pk}/').json()['error'], 'RuntimeError: boom')
+
+    def test_compact_versions_job(self):
+        event = Event.objects.create(
+            title='T1', description='d', start_time=START, end_time=START + timedelta(hours=1), created_by=self.owner,
+        )
+        for number in range(2, 6):
+            event.title = f'T{number}'
+            event.save()
+        EventVersion.objects.filter(event=event).update(created_at=django_timezone.now() - timedelta(days=60))
+
+        output = StringIO()
+        call_command('compact_versions', '--keep-last', '2', '--queue', 'owner', stdout=output)
+        self.assertIn('Queued compaction as job', output.getvalue())
+        self.assertEqual(EventVersion.objects.filter(event=event).count(), 5)
+
+        job = run_job(claim_job('worker'))
+        self.assertEqual(job.kind, 'compact_versions')
+        self.assertEqual(job.status, 'SUCCEEDED')
+        self.assertEqual(job.result, {'status_code': 200, 'body': {'events': 1, 'deleted': 3, 'rewritten': 1}})
+        self.assertEqual(list(EventVersion.objects.filter(event=event).values_list('version_number', flat=True).order_by('version_number')), [4, 5])
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.other = User.objects.create_user('other', 'other@example.com', 'pw')
+
+    def setUp(self):
+        self.assertEqual(search_backend(), 'fts5')
+        self.in_title = self.create('Budget planning', 'Quarterly numbers', 'Room 1')
+        self.in_description = self.create('Weekly sync', 'Go through the budget', 'Room 2')
+        self.in_location = self.create('Offsite', 'Team day', 'Berlin office')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def create(self, title, description, location, user=None, hours=0):
+        start = START + timedelta(hours=hours or 2 * Event.objects.count())
+        return Event.objects.create(
+            title=title, description=description, location=location, start_time=start,
+            end_time=start + timedelta(hours=1), created_by=user or self.owner,
+        )
+
+    def ids(self, text='', location='', user=None):
+        return [hit['id'] for hit in search_events(user or self.owner, text, location)]
+
+    def test_title_matches_rank_first(self):
+        hits = search_events(self.owner, 'budget')
+        self.assertEqual([hit['id'] for hit in hits], [self.in_title.pk, self.in_description.pk])
+        self.assertLess(hits[0]['rank'], hits[1]['rank'])
+
+    def test_prefixes_and_every_word(self):
+        self.assertEqual(self.ids('plan'), [self.in_title.pk])
+        self.assertEqual(self.ids('budget quarterly'), [self.in_title.pk])
+        self.assertEqual(self.ids('budget berlin'), [])
+        # Query syntax typed by the user is treated as words
+        self.assertEqual(self.ids('"budget" OR plan*'), [])
+        self.assertEqual(self.ids('budget: (plan'), [self.in_title.pk])
+
+    def test_location_filter(self):
+        self.create('Berlin retro', 'Notes from Berlin', 'Room 3')
+        self.assertEqual(self.ids(location='berl'), [self.in_location.pk])
+        self.assertEqual(self.ids('team', location='berlin'), [self.in_location.pk])
+
+    def test_visible_events_only(self):
+        theirs = self.create('Budget review', 'd', 'x', user=self.other, hours=1)
+        self.assertNotIn(theirs.pk, self.ids('budget'))
+        EventPermission.objects.create(user=self.owner, event=theirs, role='VIEWER')
+        self.assertEqual(self.ids('review'), [theirs.pk])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.in_title.title = 'Forecast planning'
+        self.in_title.save()
+        self.assertEqual(self.ids('budget'), [self.in_description.pk])
+        self.assertEqual(self.ids('forecast'), [self.in_title.pk])
+        pk = self.in_description.pk
+        self.in_description.delete()
+        self.assertEqual(self.ids('budget'), [])
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {SEARCH_TABLE} WHERE rowid = %s', [pk])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_bulk_writes_are_indexed(self):
+        items = [{'title': 'Imported budget', 'description': 'd', 'start_time': START + timedelta(days=5), 'end_time': START + timedelta(days=5, hours=1)}]
+        EventBatchImporter(self.owner).run(items)
+        self.assertEqual(len(self.ids('imported')), 1)
+
+        first = EventVersion.objects.get(event=self.in_location, version_number=1)
+        EventVersion.objects.filter(pk=first.pk).update(created_at=django_timezone.now() - timedelta(days=1))
+        self.in_location.title = 'Renamed'
+        self.in_location.save()
+        self.assertEqual(self.ids('offsite'), [])
+        rollback_events(self.owner, django_timezone.now() - timedelta(hours=12), [self.in_location.pk])
+        self.assertEqual(self.ids('offsite'), [self.in_location.pk])
+
+    def test_endpoint_pages_in_rank_order(self):
+        for n in range(4):
+            self.create(f'Budget {n}', 'budget ' * n, 'x')
+        seen, response = [], self.client.get('/api/events/search/', {'q': 'budget', 'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.json()['results']]
+            if not response.json()['next']:
+                break
+            response = self.client.get(response.json()['next'])
+        self.assertEqual(seen, self.ids('budget'))
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(self.client.get('/api/events/search/', {'q': '!!'}).status_code, 400)
+
+    def test_fallback_without_fts(self):
+        with patch('core.search.search_backend', return_value=None):
+            self.assertEqual(self.ids('budget'), [self.in_title.pk, self.in_description.pk])
+            self.assertEqual(self.ids(location='berlin'), [self.in_location.pk])
+
+
+class ICalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.other = User.objects.create_user('other', 'other@example.com', 'pw')
+        cls.weekly = Event.objects.create(
+            title='Standup; daily, really', description='Line one\nLine two \\ done', location='Room 1',
+            start_time=START, end_time=START + timedelta(minutes=15), is_recurring=True, recurrence='BI-WEEKLY',
+            created_by=cls.owner,
+        )
+        cls.single = Event.objects.create(
+            title=' '.join(['Café'] * 30), start_time=START + timedelta(days=1), end_time=START + timedelta(days=1, hours=2),
+            created_by=cls.owner,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def export(self):
+        response = self.client.get('/api/events/ical/', HTTP_ACCEPT='text/calendar')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/calendar'))
+        return b''.join(response.streaming_content)
+
+    def import_body(self, body, user):
+        self.client.force_authenticate(user)
+        return self.client.post('/api/events/ical/', data=body, content_type='text/calendar')
+
+    def vevent(self, *lines):
+        return '\r\n'.join(['BEGIN:VCALENDAR', 'VERSION:2.0', 'BEGIN:VEVENT', *lines, 'END:VEVENT', 'END:VCALENDAR', ''])
+
+    def test_export(self):
+        body = self.export().decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\nVERSION:2.0\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn(f'UID:event-{self.weekly.pk}@eventmgmtsys\r\n', body)
+        self.assertIn('DTSTART:20260301T093015Z\r\n', body)
+        self.assertIn('SUMMARY:Standup\; daily\\, really\r\n', body)
+        self.assertIn('DESCRIPTION:Line one\\nLine two \\\\ done\r\n', body)
+        self.assertIn('RRULE:FREQ=WEEKLY;INTERVAL=2\r\n', body)
+        self.assertEqual(body.count('RRULE'), 1)
+
+    def test_folding(self):
+        for line in self.export().split(b'\r\n'):
+            self.assertLessEqual(len(line), 75)
+            # Folds never split a multibyte character
+            line.decode()
+        line = 'SUMMARY:' + 'é' * 100
+        folded = fold(line)
+        self.assertTrue(all(len(part) <= 75 for part in folded.split(b'\r\n')))
+        self.assertEqual(list(unfolded_lines(folded.split(b'\r\n'))), [line])
+        self.assertEqual(fold('SUMMARY:short'), b'SUMMARY:short\r\n')
+
+    def test_round_trip(self):
+        response = self.import_body(self.export(), self.other)
+        self.assertEqual(response.status_code, 201, response.content)
+        fields = ['title', 'description', 'location', 'end_time', 'is_recurring', 'recurrence']
+        for event in (self.weekly, self.single):
+            copy = Event.objects.get(created_by=self.other, start_time=event.start_time.replace(microsecond=0))
+            for field in fields:
+                expected = getattr(event, field)
+                if field == 'end_time':
+                    expected = expected.replace(microsecond=0)
+                self.assertEqual(getattr(copy, field), expected, field)
+
+    def test_bounded_rules_are_rejected(self):
+        for rule in ('FREQ=DAILY;COUNT=5', 'FREQ=WEEKLY;UNTIL=20260401T000000Z'):
+            body = self.vevent('DTSTART:20260501T090000Z', 'DTEND:20260501T100000Z', 'SUMMARY:Bounded', f'RRULE:{rule}')
+            response = self.import_body(body, self.other)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('recurrence', response.json()['errors'][0]['errors'])
+        self.assertFalse(Event.objects.filter(created_by=self.other).exists())
+        self.assertEqual(parse_rrule('FREQ=MONTHLY;INTERVAL=3;BYMONTHDAY=1'), 'QUARTERLY')
+
+    def test_errors_are_json(self):
+        response = self.client.get('/api/events/ical/', {'scope': 'nope'}, HTTP_ACCEPT='text/calendar')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('scope', response.json())
+        body = self.vevent('DTSTART:20260501T090000Z', 'SUMMARY:Instant')
+        self.client.force_authenticate(self.other)
+        response = self.client.post('/api/events/ical/', data=body, content_type='text/calendar', HTTP_ACCEPT='text/calendar')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.client.force_authenticate(None)
+        response = self.client.get('/api/events/ical/', HTTP_ACCEPT='text/calendar')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+
+class RollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+
+    def create(self, start, hours, **fields):
+        return Event.objects.create(
+            title='Rollup', start_time=start, end_time=start + timedelta(hours=hours), created_by=self.owner, **fields,
+        )
+
+    def totals(self):
+        return UserEventStats.objects.filter(user=self.owner).values_list('event_count', 'recurring_count', 'busy_minutes').first()
+
+    def days(self):
+        rows = DailyOccupancy.objects.filter(user=self.owner).exclude(event_count=0, busy_minutes=0)
+        return {day.isoformat(): (count, minutes) for day, count, minutes in rows.values_list('day', 'event_count', 'busy_minutes')}
+
+    def test_create_move_delete(self):
+        event = self.create(datetime(2026, 5, 4, 22, tzinfo=timezone.utc), 3)
+        self.create(datetime(2026, 5, 5, 9, tzinfo=timezone.utc), 1, is_recurring=True, recurrence='WEEKLY')
+        self.assertEqual(self.totals(), (2, 1, 240))
+        self.assertEqual(self.days(), {'2026-05-04': (1, 120), '2026-05-05': (2, 120)})
+
+        event.start_time = datetime(2026, 5, 7, 10, tzinfo=timezone.utc)
+        event.end_time = event.start_time + timedelta(minutes=30)
+        event.save()
+        self.assertEqual(self.totals(), (2, 1, 90))
+        self.assertEqual(self.days(), {'2026-05-05': (1, 60), '2026-05-07': (1, 30)})
+
+        # Saves that leave the interval alone change nothing
+        event.title = 'Renamed'
+        event.save()
+        self.assertEqual(self.totals(), (2, 1, 90))
+
+        event.delete()
+        self.assertEqual(self.totals(), (1, 1, 60))
+        self.assertEqual(self.days(), {'2026-05-05': (1, 60)})
+
+    @override_settings(TIME_ZONE='Europe/Berlin')
+    def test_dst_days(self):
+        zone = django_timezone.get_default_timezone()
+        # In UTC, so adding hours is not wall-clock arithmetic
+        self.create(datetime(2026, 3, 29, tzinfo=zone).astimezone(timezone.utc), 24)
+        self.create(datetime(2026, 10, 25, tzinfo=zone).astimezone(timezone.utc), 26)
+        # Local midnight to midnight is 23 hours in March and 25 in October
+        self.assertEqual(self.days(), {
+            '2026-03-29': (1, 23 * 60), '2026-03-30': (1, 60),
+            '2026-10-25': (1, 25 * 60), '2026-10-26': (1, 60),
+        })
+        self.assertEqual(day_minutes(datetime(2026, 3, 28, 23, tzinfo=timezone.utc), datetime(2026, 3, 29, 1, tzinfo=timezone.utc)), [
+            (datetime(2026, 3, 29).date(), 120),
+        ])
+
+    def test_rebuild_matches_incremental(self):
+        base = datetime(2026, 6, 1, 8, tzinfo=timezone.utc)
+        events = [self.create(base + timedelta(hours=7 * n), 2 + n % 5, is_recurring=n % 3 == 0, recurrence='DAILY' if n % 3 == 0 else 'NONE') for n in range(12)]
+        EventBatchImporter(self.owner).run([
+            {'title': 'Imported', 'start_time': base + timedelta(days=10, hours=n), 'end_time': base + timedelta(days=10, hours=n, minutes=45)}
+            for n in range(5)
+        ])
+        events[0].end_time += timedelta(days=2)
+        events[0].save()
+        events[1].delete()
+        Event.objects.filter(pk=events[2].pk).delete()
+        totals, days = self.totals(), self.days()
+
+        rebuild_rollups([self.owner.pk])
+        self.assertEqual(self.totals(), totals)
+        self.assertEqual(self.days(), days)
+        self.assertEqual(totals[0], Event.objects.filter(created_by=self.owner).count())
+
+    def test_durations_are_bounded(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        response = client.post('/api/events/', {
+            'title': 'Forever', 'start_time': start.isoformat(), 'end_time': (start + timedelta(days=400)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('end_time', response.json())
+
+        # Rows that bypass the serializer are clamped rather than counted in full
+        limit = settings.EVENT_MAX_DURATION_DAYS
+        self.create(start, 24 * 10000)
+        self.assertEqual(self.totals(), (1, 0, limit * 24 * 60))
+        self.assertEqual(len(self.days()), limit)
+
+
+@override_settings(EVENT_VERSION_KEYFRAME_INTERVAL=3)
+class ChangeLogTests(TestCase):
+    """The streamed changelog and the version range diff, across keyframes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'pw')
+        cls.stranger = User.objects.create_user('stranger', 'stranger@example.com', 'pw')
+        cls.event = Event.objects.create(
+            title='Plan', description='v1', start_time=START, end_time=START + timedelta(hours=1), created_by=cls.owner,
+        )
+        EventPermission.objects.create(user=cls.owner, event=cls.event, role='OWNER')
+        EventPermission.objects.create(user=cls.viewer, event=cls.event, role='VIEWER')
+        for number in range(2, 7):
+            cls.event.description = f'v{number}'
+            if number == 5:
+                cls.event.location = 'Room 5'
+            cls.event.save()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def changelog(self, accept):
+        response = self.client.get(f'/api/events/{self.event.pk}/changelog/', HTTP_ACCEPT=accept)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith(accept))
+        return b''.join(response.streaming_content)
+
+    def test_changelog_json_and_ndjson(self):
+        self.assertEqual(
+            list(EventVersion.objects.filter(event=self.event, is_keyframe=True).order_by('version_number').values_list('version_number', flat=True)),
+            [1, 4],
+        )
+        entries = json.loads(self.changelog('application/json'))
+        self.assertEqual([entry['version'] for entry in entries], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(entries[0]['changes']['title'], {'old': None, 'new': 'Plan'})
+        for entry in entries[1:]:
+            number = entry['version']
+            self.assertEqual(entry['changes']['description'], {'old': f'v{number - 1}', 'new': f'v{number}'})
+        self.assertEqual(entries[4]['changes']['location'], {'old': '', 'new': 'Room 5'})
+        self.assertNotIn('location', entries[3]['changes'])
+        self.assertTrue(entries[2]['summary'].startswith('Version 3 saved on '))
+
+        lines = self.changelog('application/x-ndjson').decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], entries)
+
+    def test_range_diff_across_a_keyframe(self):
+        response = self.client.get(f'/api/events/{self.event.pk}/diff/range/2/6/')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['from_version'], body['to_version']), (2, 6))
+        self.assertEqual(body['diff']['description'], {'old': 'v2', 'new': 'v6'})
+        self.assertEqual(body['diff']['location'], {'old': '', 'new': 'Room 5'})
+        self.assertEqual([step['version'] for step in body['steps']], [3, 4, 5, 6])
+        self.assertEqual(body['steps'][1]['changes']['description'], {'old': 'v3', 'new': 'v4'})
+        self.assertEqual(body['steps'][2]['changes']['location'], {'old': '', 'new': 'Room 5'})
+
+        same = self.client.get(f'/api/events/{self.event.pk}/diff/range/4/4/').json()
+        self.assertEqual((same['diff'], same['steps']), ({}, []))
+
+    def test_unknown_versions_and_access(self):
+        base = f'/api/events/{self.event.pk}'
+        self.assertEqual(self.client.get(f'{base}/diff/range/2/9/').status_code, 404)
+        self.assertEqual(self.client.get(f'{base}/diff/range/0/3/').status_code, 404)
+        self.assertEqual(self.client.get(f'{base}/diff/range/5/2/').status_code, 400)
+        self.assertEqual(self.client.get('/api/events/999999/changelog/').status_code, 404)
+        self.assertEqual(self.client.get('/api/events/999999/diff/range/1/2/').status_code, 404)
+
+        self.client.force_authenticate(self.stranger)
+        self.assertEqual(self.client.get(f'{base}/changelog/').status_code, 403)
+        self.assertEqual(self.client.get(f'{base}/diff/range/1/2/').status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(f'{base}/changelog/').status_code, 401)
+
+
+class BenchmarkTests(TestCase):
+    """A small-scale run, so the harness cannot break unnoticed."""
+
+    def test_smoke_run_and_compare(self):
+        benchmark = EventBenchmark(users=3, events_per_user=2, share_fanout=1, versions_per_event=2, iterations=2, warmup=1, batch_size=2)
+        report = benchmark.run()
+        self.assertEqual(report['scale'], {'users': 3, 'events_per_user': 2, 'share_fanout': 1, 'versions_per_event': 2, 'batch_size': 2})
+        self.assertEqual(list(report['scenarios']), EventBenchmark.scenarios)
+        for name, result in report['scenarios'].items():
+            self.assertEqual((result['requests'], result['errors']), (2, 0), name)
+            self.assertEqual(set(result['latency_ms']), {'mean', 'p50', 'p95', 'p99', 'max'})
+            self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['max'])
+            self.assertGreater(result['queries']['max'], 0)
+        self.assertEqual(report['iterations'], 2)
+        # The report is what --output writes
+        self.assertEqual(json.loads(json.dumps(report)), report)
+
+        slower = json.loads(json.dumps(report))
+        history = slower['scenarios']['history']
+        history['latency_ms'] = {key: value * 2 for key, value in history['latency_ms'].items()}
+        history['queries']['mean'] += 3
+        changes = compare_reports(report, slower)
+        self.assertEqual(changes['history'], {'p50': '+100.0%', 'p95': '+100.0%', 'p99': '+100.0%', 'queries': 3})
+        self.assertEqual(changes['list'], {'p50': '+0.0%', 'p95': '+0.0%', 'p99': '+0.0%', 'queries': 0})
+        # Scenarios missing from the baseline are skipped
+        del slower['scenarios']['diff']
+        self.assertNotIn('diff', compare_reports(slower, report))
+
+
+@override_settings(EVENT_ROLE_CACHE_TTL=60)
+class RoleResolverTests(TestCase):
+    """Roles resolved per request and kept in role_cache are dropped as soon as they change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.member = User.objects.create_user('member', 'member@example.com', 'pw')
+        cls.event = Event.objects.create(
+            title='T1', description='d', start_time=START, end_time=START + timedelta(hours=1), created_by=cls.owner,
+        )
+        EventPermission.objects.create(user=cls.owner, event=cls.event, role='OWNER')
+        cls.event.title = 'T2'
+        cls.event.save()
+
+    def setUp(self):
+        role_cache.clear()
+        self.addCleanup(role_cache.clear)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def history(self):
+        return self.client_for(self.member).get(f'/api/api/events/{self.event.pk}/history/')
+
+    def test_revoked_role_is_denied_on_the_next_request(self):
+        EventPermission.objects.create(user=self.member, event=self.event, role='VIEWER')
+        self.assertEqual(self.history().status_code, 200)
+        self.assertEqual(role_cache.get(self.member.pk, self.event.pk), 'VIEWER')
+
+        response = self.client_for(self.owner).post(
+            '/api/events/share/bulk/revoke/', {'user_ids': [self.member.pk], 'event_ids': [self.event.pk]}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(role_cache.get(self.member.pk, self.event.pk))
+        self.assertEqual(self.history().status_code, 403)
+
+    def test_demoted_editor_cannot_roll_back(self):
+        EventPermission.objects.create(user=self.member, event=self.event, role='EDITOR')
+        self.assertEqual(self.history().status_code, 200)
+        self.assertEqual(role_cache.get(self.member.pk, self.event.pk), 'EDITOR')
+
+        permission = EventPermission.objects.get(user=self.member, event=self.event)
+        permission.role = 'VIEWER'
+        permission.save()
+        first = EventVersion.objects.get(event=self.event, version_number=1)
+        response = self.client_for(self.member).post(f'/api/api/events/{self.event.pk}/rollback/{first.pk}/')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(role_cache.get(self.member.pk, self.event.pk), 'VIEWER')
+
+    def test_cached_role_skips_the_lookup(self):
+        EventPermission.objects.create(user=self.member, event=self.event, role='VIEWER')
+        first = self.history()
+        second = self.history()
+        self.assertEqual(second.json(), first.json())
+        self.assertLess(int(second['X-Query-Count']), int(first['X-Query-Count']))
@@ -1,6 +1,7 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenBlacklistView
 from .views import *
+from . import async_views
 
 urlpatterns = [
     
@@ -14,10 +15,17 @@ urlpatterns = [
     path('events/', EventListCreateView.as_view(), name='event-list-create'),
     path('events/<int:pk>', EventDetailView.as_view(), name='event-detail'),
     path('events/batch', EventBatchCreateView.as_view(), name='event-batch-create'),
+    path('events/ical/', EventICalView.as_view(), name='event-ical'),
+    path('events/freebusy/', FreeBusyView.as_view(), name='event-freebusy'),
+    path('events/sync/', EventSyncView.as_view(), name='event-sync'),
+    path('events/search/', EventSearchView.as_view(), name='event-search'),
+    path('events/rollups/', EventRollupView.as_view(), name='event-rollups'),
     path('events/<int:pk>/share/', ShareEventView.as_view(), name='share-event'),
     
     # PERMISSIONS
     path('events/<int:pk>/share/', ShareEventView.as_view(), name='share-event'),
+    path('events/share/bulk/', EventBulkShareView.as_view(), name='bulk-share-events'),
+    path('events/share/bulk/revoke/', EventBulkRevokeView.as_view(), name='bulk-revoke-events'),
     path('events/<int:pk>/permissions/', EventPermissionListView.as_view(), name='list-permissions'),
     path('events/<int:pk>/permissions/<int:user_id>/', EventPermissionUpdateView.as_view(), name='update-permission'),
     path('events/<int:pk>/permissions/<int:user_id>/', EventPermissionDeleteView.as_view(), name='remove-permission'),
@@ -28,8 +36,25 @@ urlpatterns = [
 
     # Rollback
     path('api/events/<int:id>/rollback/<int:version_id>/', EventRollbackView.as_view(), name='event-rollback'),
+    path('api/events/rollback/', EventBulkRollbackView.as_view(), name='event-bulk-rollback'),
+    path('api/events/as-of/', EventAsOfView.as_view(), name='event-as-of'),
     
+    # Async (ASGI) read path
+    path('async/events/', async_views.event_list, name='async-event-list'),
+    path('async/events/freebusy/', async_views.free_busy, name='async-event-freebusy'),
+    path('async/events/<int:pk>', async_views.event_detail, name='async-event-detail'),
+    path('async/events/<int:id>/history/', async_views.event_history, name='async-event-version-list'),
+    path('async/events/<int:id>/diff/<int:version_id1>/<int:version_id2>/', async_views.event_diff, name='async-event-diff'),
+
     path('events/<int:id>/changelog/', EventChangeLogView.as_view(), name='event-changelog'),
     path('events/<int:id>/diff/<int:version_id1>/<int:version_id2>/', EventDiffView.as_view(), name='event-diff'),
+    path('events/<int:id>/diff/range/<int:from_version>/<int:to_version>/', EventVersionRangeDiffView.as_view(), name='event-diff-range'),
+
+    # Background jobs
+    path('jobs/<int:pk>/', JobDetailView.as_view(), name='job-detail'),
+    path('jobs/<int:pk>/retry/', JobRetryView.as_view(), name='job-retry'),
+
+    # Instrumentation
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
@@ -1,25 +1,138 @@
+import heapq
+from django.db.models import Q
+from django.utils.timezone import is_naive, make_aware
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
 from .models import *
+from .recurrence import DAY_STEPS, MONTH_STEPS, expand_occurrences, occurrence_horizon
 
-def has_conflict(user, start, end, exclude_event_id=None):
-    qs = Event.objects.filter(
-        created_by=user,
-        start_time__lt=end,
-        end_time__gt=start,
-    )
-    if exclude_event_id:
-        qs = qs.exclude(id=exclude_event_id)
-    return qs.exists()
-
-def has_event_permission(user, event, required_roles):
-    if not user.is_authenticated:
-        return False
-
-    # Owner has all permissions by default
-    try:
-        perm = EventPermission.objects.get(user=user, event=event)
-        return perm.role in required_roles
-    except EventPermission.DoesNotExist:
-        return False
+def has_conflict(user, start, end, exclude_event_id=None, recurrence='NONE'):
+    exclude = [exclude_event_id] if exclude_event_id else ()
+    return bool(find_conflicts(user, [(start, end, recurrence)], exclude))
+
+def candidate_recurrence(data, instance=None):
+    """The recurrence a validated create/update payload gives the event, or 'NONE'."""
+    recurring = data.get('is_recurring', getattr(instance, 'is_recurring', False))
+    return data.get('recurrence', getattr(instance, 'recurrence', 'NONE')) if recurring else 'NONE'
+
+def find_conflicts(user, intervals, exclude_event_ids=()):
+    """
+    Check many candidate (start, end) or (start, end, recurrence) intervals at once.
+
+    Loads every stored event of the user overlapping the batch window in a
+    single range query, then sweeps stored and candidate intervals together.
+    A recurring candidate widens the window to occurrence_horizon(), and its
+    occurrences are swept like those of stored series, so the outcome does
+    not depend on which of two clashing events was created first.
+    Returns one entry per conflicting pair: {'index': i, 'event_id': id} for a
+    clash with a stored event, {'index': i, 'other_index': j} for a clash
+    between two candidates.
+    """
+    intervals = [(interval[0], interval[1], interval[2] if len(interval) > 2 else 'NONE') for interval in intervals]
+    if not intervals:
+        return []
+
+    window_start = min(start for start, _, _ in intervals)
+    window_end = max(end for _, end, _ in intervals)
+    if any(recurrence in DAY_STEPS or recurrence in MONTH_STEPS for _, _, recurrence in intervals):
+        window_end = max(window_end, occurrence_horizon())
+    # Recurring events may repeat into the window long after their first occurrence
+    stored = Event.objects.filter(created_by=user, start_time__lt=window_end).filter(
+        Q(end_time__gt=window_start) | (Q(is_recurring=True) & ~Q(recurrence='NONE'))
+    ).exclude(id__in=exclude_event_ids).values_list('id', 'start_time', 'end_time', 'is_recurring', 'recurrence')
+
+    # (start, end, is_candidate, ref) - ref is the candidate index or the event id
+    items = []
+    for event_id, start, end, recurring, recurrence in stored:
+        occurrences = expand_occurrences(start, end, recurrence if recurring else 'NONE', window_start, window_end)
+        items.extend((occurrence_start, occurrence_end, False, event_id) for occurrence_start, occurrence_end in occurrences)
+    for index, (start, end, recurrence) in enumerate(intervals):
+        occurrences = expand_occurrences(start, end, recurrence, window_start, window_end)
+        items.extend((occurrence_start, occurrence_end, True, index) for occurrence_start, occurrence_end in occurrences)
+    items.sort(key=lambda item: (item[0], item[1]))
+
+    conflicts = set()
+    active = []  # heap of (end, is_candidate, ref)
+    for start, end, is_candidate, ref in items:
+        # Intervals touching at an edge do not overlap
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for _, other_is_candidate, other_ref in active:
+            if is_candidate and other_is_candidate:
+                # Occurrences of one long series may overlap each other
+                if ref != other_ref:
+                        conflicts.add((min(ref, other_ref), 'other_index', max(ref, other_ref)))
+            elif is_candidate:
+                conflicts.add((ref, 'event_id', other_ref))
+            elif other_is_candidate:
+                conflicts.add((other_ref, 'event_id', ref))
+        heapq.heappush(active, (end, is_candidate, ref))
+
+    # A recurring event can clash with a candidate more than once; report the pair once
+    return [{'index': index, key: value} for index, key, value in sorted(conflicts)]
+
+def merge_intervals(intervals):
+    """Merge overlapping or touching (start, end) intervals, sorted by start."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+def free_slots(busy, window_start, window_end, min_duration=None):
+    """Gaps of the window not covered by the merged, sorted `busy` intervals."""
+    slots = []
+    cursor = window_start
+    for start, end in busy:
+        if start > cursor:
+            slots.append((cursor, min(start, window_end)))
+        cursor = max(cursor, end)
+        if cursor >= window_end:
+            break
+    if cursor < window_end:
+        slots.append((cursor, window_end))
+    if min_duration:
+        slots = [(start, end) for start, end in slots if end - start >= min_duration]
+    return slots
+
+def busy_rows(user_ids, window_start, window_end):
+    """One range query over every event of the users that may touch the window."""
+    return Event.objects.filter(created_by_id__in=user_ids, start_time__lt=window_end).filter(
+        Q(end_time__gt=window_start) | (Q(is_recurring=True) & ~Q(recurrence='NONE'))
+    ).values_list('created_by_id', 'start_time', 'end_time', 'is_recurring', 'recurrence')
+
+def busy_intervals(user_ids, window_start, window_end, rows=None):
+    """
+    Merged busy intervals per user inside the window, clipped to it.
+
+    Recurring events are expanded lazily over the window only. `rows` may be
+    passed in when busy_rows was already evaluated (e.g. asynchronously).
+    """
+    if rows is None:
+        rows = busy_rows(user_ids, window_start, window_end)
+
+    per_user = {user_id: [] for user_id in user_ids}
+    for user_id, start, end, recurring, recurrence in rows:
+        occurrences = expand_occurrences(start, end, recurrence if recurring else 'NONE', window_start, window_end)
+        per_user[user_id].extend(
+            (max(occurrence_start, window_start), min(occurrence_end, window_end))
+            for occurrence_start, occurrence_end in occurrences
+        )
+    return {user_id: merge_intervals(intervals) for user_id, intervals in per_user.items()}
+
+# Event fields a version snapshot restores; created_by and timestamps are kept
+RESTORED_FIELDS = ['title', 'description', 'start_time', 'end_time', 'location', 'is_recurring', 'recurrence']
+
+def restore_event_fields(event, data):
+    for field in RESTORED_FIELDS:
+        value = data.get(field)
+        if field in ('start_time', 'end_time'):
+            value = parse_datetime(value)
+        setattr(event, field, value)
+    return event
 
 def compute_diff(data1, data2):
     diff = {}
@@ -30,3 +143,38 @@ def compute_diff(data1, data2):
         if val1 != val2:
             diff[key] = {"old": val1, "new": val2}
     return diff
+
+def stream_json_array(encoded_items):
+    """Wrap already-encoded JSON items into a streamed JSON array body."""
+    yield b'['
+    for index, item in enumerate(encoded_items):
+        yield b',' + item if index else item
+    yield b']'
+
+def parse_date_param(params, name, default):
+    value = params.get(name)
+    if not value:
+        return default
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Enter a valid date (YYYY-MM-DD)."})
+    return parsed
+
+def parse_datetime_param(params, name, required=True):
+    value = params.get(name)
+    if not value:
+        if required:
+            raise ValidationError({name: "This query parameter is required."})
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Enter a valid ISO 8601 datetime."})
+    if is_naive(parsed):
+        parsed = make_aware(parsed)
+    return parsed
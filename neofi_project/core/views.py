@@ -1,11 +1,38 @@
+from datetime import timedelta
+from django.db import transaction
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone as django_timezone
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from rest_framework.exceptions import ValidationError, PermissionDenied
+from rest_framework.exceptions import NotFound, ValidationError, PermissionDenied
 from rest_framework.views import APIView
 from .serializers import *
-from .models import Event, EventPermission
-from .utils import compute_diff, has_conflict, has_event_permission
+from .batch import EventBatchImporter, rollback_events
+from .jobs import enqueue_job, retry_job
+from .metrics import request_metrics
+from .concurrency import claim_version, expected_versions, version_etag
+from .cache import (
+    cached_payload, conditional_response, event_detail_key, event_history_key, event_version_key, make_etag,
+)
+from .access import (
+    ALL_ROLES, calendar_peers, check_event_role, events_with_role, get_event_with_role, memoized_event,
+    resolve_event_access, role_cache, with_user_role,
+)
+from .models import DailyOccupancy, Event, EventPermission, EventVersion, Job, PermissionTombstone, SyncTombstone, UserEventStats
+from .pagination import EventCursorPagination, OccurrencePagination, SearchPagination, VersionCursorPagination
+from .recurrence import occurrence_window
+from .ical import export_calendar, parse_calendar
+from .renderers import ICalendarRenderer, NDJSONRenderer, ORJSONRenderer, render_json
+from .search import search_events, tokens as search_tokens
+from .signals import done_in_bulk, record_revocation_tombstone
+from .sync import collect_changes
+from .utils import (
+    busy_intervals, candidate_recurrence, compute_diff, free_slots, has_conflict, merge_intervals, parse_date_param,
+    parse_datetime_param, restore_event_fields, stream_json_array,
+)
 from django.contrib.auth.models import User
 from rest_framework.permissions import AllowAny
 
@@ -18,12 +45,89 @@ class RegisterView(generics.CreateAPIView):
 class EventListCreateView(generics.ListCreateAPIView):
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = EventCursorPagination
+
+    def is_shared_scope(self):
+        # ?scope=all lists every event the user holds a role on, owned or shared
+        scope = self.request.query_params.get('scope', 'owned')
+        if scope not in ('owned', 'all'):
+            raise ValidationError({'scope': "Must be 'owned' or 'all'."})
+        return self.request.method == 'GET' and scope == 'all'
+
+    def get_serializer_class(self):
+        if self.is_shared_scope():
+            return SharedEventSerializer
+        return EventSerializer
+
+    def get_projection(self):
+        # ?fields=id,title,start_time limits both the columns read and the output
+        if self.request.method != 'GET' or 'fields' not in self.request.query_params:
+            return None
+        requested = [name.strip() for name in self.request.query_params['fields'].split(',') if name.strip()]
+        available = self.get_serializer_class()().fields
+        unknown = [name for name in requested if name not in available]
+        if unknown or not requested:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields given."})
+        return requested
 
     def get_queryset(self):
-        return Event.objects.filter(created_by=self.request.user)
+        user = self.request.user
+        if self.is_shared_scope():
+            queryset = events_with_role(user)
+        else:
+            queryset = Event.objects.filter(created_by=user)
+        params = self.request.query_params
+        start_after = parse_datetime_param(params, 'start_after', required=False)
+        if start_after:
+            queryset = queryset.filter(start_time__gte=start_after)
+        start_before = parse_datetime_param(params, 'start_before', required=False)
+        if start_before:
+            queryset = queryset.filter(start_time__lt=start_before)
+
+        fields = self.get_projection()
+        if fields:
+            # The cursor is built from start_time and id, so always load them
+            queryset = queryset.only(*({'id', 'start_time'} | set(fields) - {'role'}))
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if 'fields' not in kwargs:
+            kwargs['fields'] = self.get_projection()
+        return super().get_serializer(*args, **kwargs)
+
+    def get_rows(self):
+        # Rows come straight from .values(); the cursor needs id and start_time too
+        rows = ValuesRowSerializer(self.get_serializer())
+        return rows, self.get_queryset().values(*dict.fromkeys(rows.columns + ['id', 'start_time']))
+
+    def is_occurrence_window(self):
+        # Calendar views ask for a window; they get expanded occurrences
+        return 'from' in self.request.query_params or 'to' in self.request.query_params
+
+    def occurrence_page(self):
+        window_start = parse_datetime_param(self.request.query_params, 'from')
+        window_end = parse_datetime_param(self.request.query_params, 'to')
+        if window_start >= window_end:
+            raise ValidationError({'to': "Must be after 'from'."})
+        paginator = OccurrencePagination()
+        occurrences, self.topped_up = occurrence_window(self.request.user, window_start, window_end)
+        page = paginator.paginate_queryset(occurrences, self.request)
+        return paginator.get_paginated_data(EventOccurrenceSerializer(page, many=True).data)
+
+    def list(self, request, *args, **kwargs):
+        if self.is_occurrence_window():
+            response = Response(self.occurrence_page())
+            # Window reads that first write stale occurrences are budgeted apart
+            response.budget_variant = 'window-refresh' if self.topped_up else 'window'
+            return response
+
+        rows, queryset = self.get_rows()
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(rows.render(page))
 
     def perform_create(self, serializer):
-        if has_conflict(self.request.user, serializer.validated_data['start_time'], serializer.validated_data['end_time']):
+        data = serializer.validated_data
+        if has_conflict(self.request.user, data['start_time'], data['end_time'], recurrence=candidate_recurrence(data)):
             raise ValidationError("Event conflicts with existing event.")
         event = serializer.save(created_by=self.request.user)
         EventPermission.objects.create(user=self.request.user, event=event, role='OWNER')
@@ -36,42 +140,221 @@ class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return Event.objects.filter(created_by=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        event = self.get_object()
+        _, payload = cached_payload(
+            event_detail_key(event.pk), event.updated_at.isoformat(), lambda: self.get_serializer(event).data,
+        )
+        # The version is the validator, so this ETag also works for If-Match
+        return conditional_response(request, version_etag(event.version_counter), payload)
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        response['ETag'] = version_etag(response.data['version'])
+        return response
+
     def perform_update(self, serializer):
-        if has_conflict(self.request.user, serializer.validated_data['start_time'], serializer.validated_data['end_time'], self.get_object().id):
+        # PATCH may leave either bound out; check the interval the event will have
+        data, event = serializer.validated_data, serializer.instance
+        if has_conflict(
+            self.request.user, data.get('start_time', event.start_time), data.get('end_time', event.end_time), event.id,
+            candidate_recurrence(data, event),
+        ):
             raise ValidationError("Event conflicts with existing event.")
-        serializer.save()
+        versions = expected_versions(self.request)
+        with transaction.atomic():
+            claim_version(serializer.instance, versions)
+            serializer.save()
+
+def run_in_background(request):
+    # ?async=true hands the work to the job queue instead of doing it inline
+    return request.query_params.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def job_accepted(request, job):
+    url = request.build_absolute_uri(reverse('job-detail', args=[job.pk]))
+    return Response({'job_id': job.pk, 'status': job.status, 'status_url': url}, status=status.HTTP_202_ACCEPTED, headers={'Location': url})
+
 
 class EventBatchCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        serializer = EventSerializer(data=request.data, many=True)
-        if serializer.is_valid():
-            validated_data = serializer.validated_data
-            for data in validated_data:
-                if has_conflict(request.user, data['start_time'], data['end_time']):
-                    return Response({'detail': 'One or more events conflict with existing ones.'}, status=400)
-            Event.objects.bulk_create([Event(**data, created_by=request.user) for data in validated_data])
-            return Response({'detail': 'Batch created successfully'}, status=201)
-        return Response(serializer.errors, status=400)
-    
+        if not isinstance(request.data, list):
+            return Response({'detail': 'Expected a list of events.'}, status=400)
+        partial = request.query_params.get('partial', '').lower() in ('1', 'true', 'yes')
+
+        if run_in_background(request):
+            # Partial imports commit chunk by chunk, so they are not retried
+            job = enqueue_job('batch_import', request.user, {'items': request.data, 'partial': partial}, max_attempts=1 if partial else None)
+            return job_accepted(request, job)
+        importer = EventBatchImporter(request.user, partial=partial).run(request.data)
+        payload, status_code = importer.response()
+        return Response(payload, status=status_code)
+
+
+class EventICalView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [ORJSONRenderer, ICalendarRenderer]
+
+    def get(self, request):
+        # ?scope=all also exports events shared with the user
+        scope = request.query_params.get('scope', 'owned')
+        if scope not in ('owned', 'all'):
+            raise ValidationError({'scope': "Must be 'owned' or 'all'."})
+        events = events_with_role(request.user) if scope == 'all' else Event.objects.filter(created_by=request.user)
+        response = StreamingHttpResponse(export_calendar(events), content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="events.ics"'
+        return response
+
+    def post(self, request):
+        # The body is parsed line by line as it is read, never loaded whole
+        partial = request.query_params.get('partial', '').lower() in ('1', 'true', 'yes')
+        importer = EventBatchImporter(request.user, partial=partial).run(parse_calendar(request.stream or []))
+        payload, status_code = importer.response()
+        return Response(payload, status=status_code)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Only the export is a calendar; errors and import results are JSON
+        # even when the client asked for text/calendar
+        if isinstance(response, Response) and isinstance(getattr(request, 'accepted_renderer', None), ICalendarRenderer):
+            request.accepted_renderer = ORJSONRenderer()
+            request.accepted_media_type = ORJSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class EventRollupView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    max_days = 366
+
+    def get(self, request):
+        # ?from=YYYY-MM-DD&to=YYYY-MM-DD, both inclusive; defaults to the last 30 days
+        last = parse_date_param(request.query_params, 'to', django_timezone.localdate())
+        first = parse_date_param(request.query_params, 'from', last - timedelta(days=29))
+        if first > last:
+            raise ValidationError({'to': "Must not be before 'from'."})
+        if (last - first).days >= self.max_days:
+            raise ValidationError({'from': f"At most {self.max_days} days at a time."})
+
+        totals = UserEventStats.objects.filter(user=request.user).values('event_count', 'recurring_count', 'busy_minutes').first()
+        stored = {
+            row['day']: row for row in DailyOccupancy.objects.filter(
+                user=request.user, day__gte=first, day__lte=last,
+            ).values('day', 'event_count', 'busy_minutes')
+        }
+        days = []
+        for offset in range((last - first).days + 1):
+            day = first + timedelta(days=offset)
+            row = stored.get(day)
+            days.append({
+                'day': day.isoformat(),
+                'event_count': row['event_count'] if row else 0,
+                'busy_minutes': row['busy_minutes'] if row else 0,
+            })
+        return Response({**(totals or {'event_count': 0, 'recurring_count': 0, 'busy_minutes': 0}), 'days': days})
+
+
+class FreeBusyView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    max_users = 200
+
+    @classmethod
+    def parse_params(cls, params):
+        # ?users=1,2,3&from=...&to=...[&min_minutes=30]; only times are exposed
+        window_start = parse_datetime_param(params, 'from')
+        window_end = parse_datetime_param(params, 'to')
+        if window_start >= window_end:
+            raise ValidationError({'to': "Must be after 'from'."})
+        try:
+            user_ids = sorted({int(value) for value in params.get('users', '').split(',') if value.strip()})
+            min_minutes = int(params.get('min_minutes', 0))
+        except ValueError:
+            raise ValidationError("'users' must be a comma separated list of ids and 'min_minutes' an integer.")
+        if not user_ids or len(user_ids) > cls.max_users:
+            raise ValidationError({'users': f"Give between 1 and {cls.max_users} user ids."})
+        return window_start, window_end, user_ids, timedelta(minutes=min_minutes) if min_minutes else None
+
+    @staticmethod
+    def check_users(user, user_ids, peer_ids):
+        # Unknown and unrelated users get the same answer, so ids cannot be probed
+        hidden = set(user_ids) - set(peer_ids) - {user.pk}
+        if hidden:
+            raise PermissionDenied(
+                f"You can only see the availability of users you share events with: {', '.join(map(str, sorted(hidden)))}"
+            )
+
+    @staticmethod
+    def build_payload(busy, window_start, window_end, min_duration):
+        everyone = merge_intervals(interval for intervals in busy.values() for interval in intervals)
+        free = free_slots(everyone, window_start, window_end, min_duration)
+
+        def as_json(intervals):
+            return [{'start': start, 'end': end} for start, end in intervals]
+
+        return {
+            'from': window_start,
+            'to': window_end,
+            'busy': {str(user_id): as_json(intervals) for user_id, intervals in busy.items()},
+            'free': as_json(free),
+        }
+
+    def get(self, request):
+        window_start, window_end, user_ids, min_duration = self.parse_params(request.query_params)
+        self.check_users(request.user, user_ids, calendar_peers(request.user, user_ids))
+        busy = busy_intervals(user_ids, window_start, window_end)
+        return Response(self.build_payload(busy, window_start, window_end, min_duration))
+
+
+class EventSyncView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # Without ?sync_token= (or with an expired one) this is a full sync
+        changes = collect_changes(request.user, request.query_params.get('sync_token'))
+        return Response({
+            'reset': changes['reset'],
+            'events': SharedEventSerializer(changes['events'], many=True).data,
+            'permissions': list(changes['permissions']),
+            'removed_permissions': list(changes['removed_permissions']),
+            'deleted': changes['deleted'],
+            'sync_token': changes['sync_token'],
+        })
+
+
+class EventSearchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # ?q= matches title, description and location; ?location= only the location
+        text = request.query_params.get('q', '')
+        location = request.query_params.get('location', '')
+        if not search_tokens(text) and not search_tokens(location):
+            raise ValidationError({'q': "Give words to search for in 'q' or 'location'."})
+
+        paginator = SearchPagination()
+        hits = paginator.paginate_search(
+            request, lambda after, limit: search_events(request.user, text, location, after, limit),
+        )
+        rows = ValuesRowSerializer(SharedEventSerializer())
+        found = events_with_role(request.user).filter(pk__in=[hit['id'] for hit in hits]).values(*rows.columns)
+        by_id = {row['id']: row for row in found}
+        return paginator.get_paginated_response(rows.render([by_id[hit['id']] for hit in hits if hit['id'] in by_id]))
+
+
 class ShareEventView(generics.GenericAPIView):
     serializer_class = EventShareSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            event = Event.objects.get(pk=pk)
-        except Event.DoesNotExist:
+        event, role = resolve_event_access(request, pk)
+        if event is None:
             return Response({"detail": "Event not found."}, status=status.HTTP_404_NOT_FOUND)
 
         # Check if the user has permission to share (must be owner)
-        try:
-            permission = EventPermission.objects.get(user=request.user, event=event)
-            if permission.role != 'OWNER':
-                return Response({"detail": "Only owners can share this event."}, status=status.HTTP_403_FORBIDDEN)
-        except EventPermission.DoesNotExist:
+        if role is None:
             return Response({"detail": "You don't have access to this event."}, status=status.HTTP_403_FORBIDDEN)
+        if role != 'OWNER':
+            return Response({"detail": "Only owners can share this event."}, status=status.HTTP_403_FORBIDDEN)
 
         serializer = self.get_serializer(data=request.data, context={'event': event})
         serializer.is_valid(raise_exception=True)
@@ -79,22 +362,100 @@ class ShareEventView(generics.GenericAPIView):
 
         return Response({"detail": "Event shared successfully."}, status=status.HTTP_200_OK)
 
+def owned_events(request, event_ids, message):
+    """Creator id of each requested event, after checking the user owns all of them."""
+    rows = with_user_role(Event.objects.filter(pk__in=event_ids), request.user).values_list('pk', 'created_by_id', 'user_role')
+    creators, roles = {}, {}
+    for pk, created_by_id, role in rows:
+        creators[pk] = created_by_id
+        roles[pk] = role
+    missing = [event_id for event_id in event_ids if event_id not in creators]
+    if missing:
+        raise NotFound(f"Events not found: {', '.join(map(str, missing))}.")
+    forbidden = [event_id for event_id in event_ids if roles[event_id] != 'OWNER']
+    if forbidden:
+        raise PermissionDenied(f"{message} Not an owner of: {', '.join(map(str, forbidden))}.")
+    return creators
+
+
+class EventBulkShareView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = EventBulkShareSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = serializer.validated_data['user_ids']
+        role = serializer.validated_data['role']
+        creators = owned_events(request, serializer.validated_data['event_ids'], "Only owners can share events.")
+
+        # An event's creator keeps their OWNER row whatever the batch says
+        grants = [
+            EventPermission(user_id=user_id, event_id=event_id, role=role)
+            for event_id, created_by_id in creators.items()
+            for user_id in user_ids
+            if user_id != created_by_id
+        ]
+        with transaction.atomic():
+            EventPermission.objects.bulk_create(
+                grants,
+                update_conflicts=True,
+                unique_fields=['user', 'event'],
+                update_fields=['role', 'updated_at'],
+                batch_size=getattr(settings, 'EVENT_BATCH_CHUNK_SIZE', 1000),
+            )
+        # bulk_create skips the permission signals
+        for user_id in user_ids:
+            role_cache.invalidate_user(user_id)
+
+        return Response({"detail": "Events shared successfully.", "granted": len(grants)}, status=status.HTTP_200_OK)
+
+
+class EventBulkRevokeView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = EventBulkRevokeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = serializer.validated_data['user_ids']
+        event_ids = list(owned_events(request, serializer.validated_data['event_ids'], "Only owners can remove users."))
+
+        # OWNER rows are never revoked in bulk, so no event is left without an owner
+        revoked = EventPermission.objects.filter(event_id__in=event_ids, user_id__in=user_ids).exclude(role='OWNER')
+        chunk_size = getattr(settings, 'EVENT_BATCH_CHUNK_SIZE', 1000)
+        with transaction.atomic():
+            rows = list(revoked.select_for_update().values_list('pk', 'user_id', 'event_id'))
+            SyncTombstone.objects.bulk_create(
+                [SyncTombstone(user_id=user_id, event_id=event_id, reason='REVOKED') for _, user_id, event_id in rows],
+                batch_size=chunk_size,
+            )
+            PermissionTombstone.objects.bulk_create(
+                [PermissionTombstone(event_id=event_id, user_id=user_id) for _, user_id, event_id in rows],
+                batch_size=chunk_size,
+            )
+            # The delete signals still clear the role cache; tombstones are written above
+            with done_in_bulk(record_revocation_tombstone):
+                for offset in range(0, len(rows), chunk_size):
+                    EventPermission.objects.filter(pk__in=[pk for pk, _, _ in rows[offset:offset + chunk_size]]).delete()
+
+        return Response({"detail": "Users removed successfully.", "revoked": len(rows)}, status=status.HTTP_200_OK)
+
+
 class EventPermissionListView(generics.ListAPIView):
     serializer_class = EventPermissionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        event_id = self.kwargs['pk']
-        try:
-            event = Event.objects.get(pk=event_id)
-        except Event.DoesNotExist:
-            return EventPermission.objects.none()
+        event, role = resolve_event_access(self.request, self.kwargs['pk'])
 
         # Only users with any role on the event can view permissions
-        if not EventPermission.objects.filter(user=self.request.user, event=event).exists():
+        if role is None:
             return EventPermission.objects.none()
 
-        return EventPermission.objects.filter(event=event)
+        return EventPermission.objects.filter(event=event).select_related('user')
+
+    def list(self, request, *args, **kwargs):
+        rows = ValuesRowSerializer(self.get_serializer())
+        return Response(rows.render(self.get_queryset().values(*rows.columns)))
     
 class EventPermissionUpdateView(generics.UpdateAPIView):
     serializer_class = EventShareSerializer  # same as share
@@ -104,11 +465,8 @@ class EventPermissionUpdateView(generics.UpdateAPIView):
         event_id = self.kwargs['pk']
         user_id = self.kwargs['user_id']
 
-        event = get_object_or_404(Event, pk=event_id)
-
         # Only Owner can update roles
-        if not EventPermission.objects.filter(user=self.request.user, event=event, role='OWNER').exists():
-            raise PermissionDenied("Only owners can update permissions.")
+        event = get_event_with_role(self.request, event_id, ['OWNER'], "Only owners can update permissions.")
 
         return get_object_or_404(EventPermission, user_id=user_id, event=event)
 
@@ -119,24 +477,46 @@ class EventPermissionDeleteView(generics.DestroyAPIView):
         event_id = self.kwargs['pk']
         user_id = self.kwargs['user_id']
 
-        event = get_object_or_404(Event, pk=event_id)
-
         # Only Owner can remove users
-        if not EventPermission.objects.filter(user=self.request.user, event=event, role='OWNER').exists():
-            raise PermissionDenied("Only owners can remove users.")
+        event = get_event_with_role(self.request, event_id, ['OWNER'], "Only owners can remove users.")
 
         return get_object_or_404(EventPermission, user_id=user_id, event=event)
     
 class EventVersionList(generics.ListAPIView):
     serializer_class = EventVersionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = VersionCursorPagination
+    row_fields = ['id', 'version_number', 'data', 'is_keyframe', 'created_at']
 
     def get_queryset(self):
         event_id = self.kwargs['id']
-        event = get_object_or_404(Event, id=event_id)
-        if not has_event_permission(self.request.user, event, ['OWNER', 'EDITOR', 'VIEWER']):
-            raise PermissionDenied("You do not have permission to view this event's versions.")
-        return EventVersion.objects.filter(event=event).order_by('-version_number')
+        check_event_role(self.request, event_id, ALL_ROLES, "You do not have permission to view this event's versions.")
+        return EventVersion.objects.filter(event_id=event_id)
+
+    def build(self):
+        # One page, newest first; its snapshots replay from the page itself
+        # when it starts at a keyframe, otherwise from one chain query
+        rows = self.paginate_queryset(self.get_queryset().values(*self.row_fields))
+        EventVersion.attach_row_snapshots(rows, EventVersion.row_chain(self.kwargs['id'], rows))
+        return self.paginator.get_paginated_data(ValuesRowSerializer(self.get_serializer()).render(rows))
+
+    def list(self, request, *args, **kwargs):
+        event_id = self.kwargs['id']
+        check_event_role(request, event_id, ALL_ROLES, "You do not have permission to view this event's versions.")
+        paginator = self.paginator
+        if paginator.cursor_query_param in request.query_params or paginator.page_size_query_param in request.query_params:
+            payload = self.build()
+            return conditional_response(request, make_etag(payload), payload)
+
+        # The first page is what clients poll. Every new version bumps the
+        # counter, so it stamps the cached page
+        event = memoized_event(request, event_id)
+        if event is not None:
+            counter = event.version_counter
+        else:
+            counter = Event.objects.filter(pk=event_id).values_list('version_counter', flat=True).first()
+        etag, payload = cached_payload(event_history_key(event_id), counter, self.build)
+        return conditional_response(request, etag, payload)
 
 
 class EventVersionDetail(generics.RetrieveAPIView):
@@ -146,66 +526,172 @@ class EventVersionDetail(generics.RetrieveAPIView):
     def get_object(self):
         event_id = self.kwargs['id']
         version_id = self.kwargs['version_id']
-        event = get_object_or_404(Event, id=event_id)
-        if not has_event_permission(self.request.user, event, ['OWNER', 'EDITOR', 'VIEWER']):
-            raise PermissionDenied("You do not have permission to view this event version.")
-        version = get_object_or_404(EventVersion, id=version_id, event=event)
+        check_event_role(self.request, event_id, ALL_ROLES, "You do not have permission to view this event version.")
+        version = get_object_or_404(EventVersion, id=version_id, event_id=event_id)
         return version
 
+    def retrieve(self, request, *args, **kwargs):
+        # Versions never change once written, so they are cached without expiry
+        event_id, version_id = self.kwargs['id'], self.kwargs['version_id']
+        check_event_role(request, event_id, ALL_ROLES, "You do not have permission to view this event version.")
+        etag, payload = cached_payload(
+            event_version_key(event_id, version_id), None, lambda: self.get_serializer(self.get_object()).data, timeout=None,
+        )
+        return conditional_response(request, etag, payload)
+
 
 class EventRollbackView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, id, version_id):
-        event = get_object_or_404(Event, id=id)
-        if not has_event_permission(request.user, event, ['OWNER', 'EDITOR']):
-            raise PermissionDenied("You do not have permission to rollback this event.")
+        event = get_event_with_role(request, id, ['OWNER', 'EDITOR'], "You do not have permission to rollback this event.")
 
         version = get_object_or_404(EventVersion, id=version_id, event=event)
-        # Rollback: update event fields to the version's snapshot
-        data = version.data
-        event.title = data.get('title')
-        event.description = data.get('description')
-        event.start_time = data.get('start_time')
-        event.end_time = data.get('end_time')
-        event.location = data.get('location')
-        event.is_recurring = data.get('is_recurring')
-        event.recurrence = data.get('recurrence')
-        # Note: We won't rollback created_by or timestamps
-        event.save()  # This will also create a new EventVersion per our model save override
-
-        return Response({"detail": f"Event rolled back to version {version.version_number}"}, status=status.HTTP_200_OK)
+        versions = expected_versions(request)
+        with transaction.atomic():
+            claim_version(event, versions)
+            # Rollback: update event fields to the version's snapshot
+            # Note: We won't rollback created_by or timestamps
+            restore_event_fields(event, version.snapshot)
+            event.save()  # This will also create a new EventVersion per our model save override
+
+        return Response(
+            {"detail": f"Event rolled back to version {version.version_number}", "version": event.version_counter},
+            status=status.HTTP_200_OK, headers={'ETag': version_etag(event.version_counter)},
+        )
     
 
-class EventChangeLogView(APIView):
-    def get(self, request, id):
-        event = get_object_or_404(Event, id=id)
-        if not has_event_permission(request.user, event, ['OWNER', 'EDITOR', 'VIEWER']):
-            raise PermissionDenied("You do not have permission to view this event's changelog.")
+class EventAsOfView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
 
-        versions = EventVersion.objects.filter(event=event).order_by('version_number')
+    def get(self, request):
+        # Point-in-time state of many events: ?at=<timestamp>[&ids=1,2,3]
+        when = parse_datetime_param(request.query_params, 'at')
+        events = events_with_role(request.user).values_list('pk', flat=True)
+        if request.query_params.get('ids'):
+            try:
+                ids = [int(value) for value in request.query_params['ids'].split(',')]
+            except ValueError:
+                raise ValidationError({'ids': "Must be a comma separated list of event ids."})
+            events = events.filter(pk__in=ids)
+
+        states = EventVersion.as_of(events, when)
+        return Response([
+            {'event_id': event_id, 'version_number': version.version_number, 'data': snapshot}
+            for event_id, (version, snapshot) in sorted(states.items())
+        ])
+
+
+class EventBulkRollbackView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
 
-        changelog = []
-        for v in versions:
-            changelog.append({
+    def post(self, request):
+        serializer = EventBulkRollbackSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        when = serializer.validated_data['as_of']
+        event_ids = serializer.validated_data.get('event_ids')
+
+        if run_in_background(request):
+            job = enqueue_job('bulk_rollback', request.user, {'as_of': when.isoformat(), 'event_ids': event_ids})
+            return job_accepted(request, job)
+        return Response(rollback_events(request.user, when, event_ids), status=status.HTTP_200_OK)
+
+
+class EventChangeLogView(APIView):
+    renderer_classes = [ORJSONRenderer, NDJSONRenderer]
+    chunk_size = 500
+
+    def entries(self, event_id):
+        # Streams the history: only the current snapshot is held in memory
+        versions = EventVersion.objects.filter(event_id=event_id).order_by('version_number').iterator(chunk_size=self.chunk_size)
+        previous = {}
+        for v, snapshot in EventVersion.replay(versions):
+            yield {
                 "version": v.version_number,
-                "changed_at": v.timestamp,
-                "changed_by": v.changed_by.username if v.changed_by else "Unknown",
-                "summary": f"Version {v.version_number} saved on {v.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
-                # You can customize summary or add more metadata here
-            })
+                "changed_at": v.created_at,
+                "summary": f"Version {v.version_number} saved on {v.created_at.strftime('%Y-%m-%d %H:%M:%S')}",
+                "changes": compute_diff(previous, snapshot),
+            }
+            previous = snapshot
+
+    def get(self, request, id):
+        check_event_role(request, id, ALL_ROLES, "You do not have permission to view this event's changelog.")
 
-        return Response(changelog)
+        encode = render_json
+        if request.accepted_renderer.format == 'ndjson':
+            body = (encode(entry) + b'\n' for entry in self.entries(id))
+        else:
+            body = stream_json_array(encode(entry) for entry in self.entries(id))
+        return StreamingHttpResponse(body, content_type=request.accepted_renderer.media_type)
 
 class EventDiffView(APIView):
     def get(self, request, id, version_id1, version_id2):
-        event = get_object_or_404(Event, id=id)
-        if not has_event_permission(request.user, event, ['OWNER', 'EDITOR', 'VIEWER']):
-            raise PermissionDenied("You do not have permission to view diffs for this event.")
+        check_event_role(request, id, ALL_ROLES, "You do not have permission to view diffs for this event.")
+
+        versions = EventVersion.objects.in_bulk([version_id1, version_id2])
+        v1, v2 = versions.get(version_id1), versions.get(version_id2)
+        if v1 is None or v2 is None or v1.event_id != id or v2.event_id != id:
+            raise NotFound("Version not found.")
+
+        EventVersion.attach_snapshots([v1, v2])
+        diff = compute_diff(v1.snapshot, v2.snapshot)
+
+        return Response(diff)
+
+
+class EventVersionRangeDiffView(APIView):
+    def get(self, request, id, from_version, to_version):
+        check_event_role(request, id, ALL_ROLES, "You do not have permission to view diffs for this event.")
+        if from_version > to_version:
+            raise ValidationError("from_version must not be greater than to_version.")
+
+        # One query reads the range plus the keyframe it builds on
+        start, previous, last_number, steps = None, None, None, []
+        for v, snapshot in EventVersion.replay(EventVersion.chain(id, from_version, to_version)):
+            if v.version_number == from_version:
+                start = snapshot
+            elif v.version_number > from_version:
+                if start is None:
+                    # from_version does not exist
+                    break
+                steps.append({"version": v.version_number, "changes": compute_diff(previous, snapshot)})
+            previous, last_number = snapshot, v.version_number
+        if start is None or last_number != to_version:
+            raise NotFound("Version not found.")
+
+        return Response({
+            "from_version": from_version,
+            "to_version": to_version,
+            "diff": compute_diff(start, previous),
+            "steps": steps,
+        })
+
+
+class MetricsView(APIView):
+    """Per-view request, query and latency totals in Prometheus text format."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        if not getattr(settings, 'EVENT_METRICS_ENABLED', False):
+            raise NotFound()
+        return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
-        v1 = get_object_or_404(EventVersion, id=version_id1, event=event)
-        v2 = get_object_or_404(EventVersion, id=version_id2, event=event)
 
-        diff = compute_diff(v1.data, v2.data)
+class JobDetailView(generics.RetrieveAPIView):
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(created_by=self.request.user)
 
-        return Response(diff)
\ No newline at end of file
+
+class JobRetryView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        job = get_object_or_404(Job, pk=pk, created_by=request.user)
+        if job.status != 'FAILED':
+            raise ValidationError("Only failed jobs can be retried.")
+        retry_job(job)
+        return job_accepted(request, job)
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,15 +47,27 @@ INSTALLED_APPS = [
 ]
 
 REST_FRAMEWORK = {
+    'EXCEPTION_HANDLER': 'core.exceptions.exception_handler',
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# MessagePack is opt-in per request (Accept: application/msgpack) and needs
+# the msgpack package
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(1, 'core.renderers.MessagePackRenderer')
+
 MIDDLEWARE = [
+    'core.middleware.QueryMetricsMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,13 +100,67 @@ WSGI_APPLICATION = 'neofi_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# Selected with DJANGO_DB_PROFILE: 'sqlite' (default) or 'postgres'
+
+DB_PROFILE = os.environ.get('DJANGO_DB_PROFILE', 'sqlite')
+
+if DB_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'neofi'),
+            'USER': os.environ.get('POSTGRES_USER', 'neofi'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('DJANGO_DB_POOL', '0') == '1':
+        # psycopg 3 connection pool; Django requires CONN_MAX_AGE = 0 with it
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DJANGO_DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('DJANGO_DB_POOL_MAX', 20)),
+        }
+    else:
+        # Persistent connections, reused across requests by each worker
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DJANGO_CONN_MAX_AGE', 60))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 60)),
+            'OPTIONS': {
+                # WAL lets readers run alongside the single writer; NORMAL is
+                # durable across application crashes in WAL mode
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+                # Take the write lock at BEGIN so writers queue on the busy
+                # timeout instead of failing with "database is locked"
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+            },
+        }
+    }
+
+
+# Cache
+# Local memory by default; point DJANGO_CACHE_BACKEND at e.g.
+# django.core.cache.backends.redis.RedisCache to share it between processes
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'neofi-events'),
+        'TIMEOUT': int(os.environ.get('DJANGO_CACHE_TIMEOUT', 3600)),
     }
 }
 
+# Cache used for event detail and version history payloads
+EVENT_CACHE_ALIAS = 'default'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,3 +202,70 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Event app tuning
+
+# How far ahead of now recurring events are materialized into EventOccurrence
+EVENT_OCCURRENCE_HORIZON_DAYS = 365
+# ...and this far back; windows starting earlier are expanded on each request
+EVENT_OCCURRENCE_LOOKBACK_DAYS = 30
+
+# Seconds a user's event roles stay in the process-wide cache; 0 disables it
+EVENT_ROLE_CACHE_TTL = 0
+EVENT_ROLE_CACHE_MAX_USERS = 10000
+
+# Every Nth EventVersion stores a full snapshot; the others store field deltas
+EVENT_VERSION_KEYFRAME_INTERVAL = 20
+
+# Events validated, conflict-checked and inserted per round trip by batch imports
+EVENT_BATCH_CHUNK_SIZE = 1000
+
+# Events may last at most this many days; rollups also count no more than
+# this of any stored event, so older or restored rows cannot blow them up
+EVENT_MAX_DURATION_DAYS = 366
+
+# Bulk share and revoke requests are refused above this many user x event pairs
+EVENT_BULK_SHARE_MAX_PAIRS = 100000
+
+# Incremental sync: tokens older than the tombstone retention force a full
+# resync, and each sync re-reads a small overlap before its token
+EVENT_SYNC_TOMBSTONE_DAYS = 30
+EVENT_SYNC_OVERLAP_SECONDS = 2
+
+# Request instrumentation: /api/metrics/ serves Prometheus text when enabled,
+# and requests to a URL name ('METHOD url-name' for a single method, and
+# 'url-name:variant' for one mode of a view) listed here may run at most
+# that many queries, authentication included
+EVENT_METRICS_ENABLED = os.environ.get('EVENT_METRICS_ENABLED', '0') == '1'
+EVENT_QUERY_BUDGETS = {
+    'GET event-list-create': 2,
+    # ?from=&to= reads, and those that first top up stale occurrences in one
+    # transaction (SQLite inserts about 250 occurrence rows per statement)
+    'GET event-list-create:window': 3,
+    'GET event-list-create:window-refresh': 12,
+    'GET event-detail': 2,
+    'GET event-freebusy': 3,
+    'GET event-sync': 4,
+    'GET event-search': 3,
+    'GET event-rollups': 3,
+    'GET list-permissions': 3,
+    'GET event-version-list': 4,
+    'GET event-version-detail': 4,
+    'GET event-diff': 4,
+}
+
+# Responses of these URL names are never gzip/brotli compressed (BREACH):
+# they carry tokens alongside data the client controls
+EVENT_UNCOMPRESSED_VIEWS = ['token_obtain_pair', 'token_refresh', 'token_blacklist', 'register']
+
+# Background jobs (manage.py run_jobs): attempts per job, base retry delay in
+# seconds (doubled per attempt), and how long a running job's heartbeat may
+# stay quiet before it is assumed lost and handed to another worker
+EVENT_JOB_MAX_ATTEMPTS = 3
+EVENT_JOB_RETRY_DELAY = 30
+EVENT_JOB_TIMEOUT = 600
+
+# Optimistic concurrency: when True, event updates and rollbacks without an
+# If-Match header or `version` field are refused with 428
+EVENT_REQUIRE_IF_MATCH = os.environ.get('EVENT_REQUIRE_IF_MATCH', '0') == '1'